@@ -1,10 +1,12 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
 import os
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+# SQL-side KPI layer (it puts the ETL scripts on sys.path for the connection pool)
+import kpi_queries
+
 # Set page config
 st.set_page_config(page_title="Juvenile Services Dashboard", layout="wide")
 
@@ -18,55 +20,53 @@ This dashboard simulates an agency-style reporting system. It includes:
 """)
 
 # Load Data
+# Only the filter choices are read up front; every number on the page comes
+# from a GROUP BY in SQLite (kpi_queries.py), cached per filter combination
+# and data version, so a new ETL load is picked up on the next rerun.
+DB_PATH = kpi_queries.DB_PATH
+
+
 @st.cache_data
-def load_data():
-    db_path = 'juvenile_justice.db'
-    if not os.path.exists(db_path):
-        return None, None, None
-    
-    conn = sqlite3.connect(db_path)
-    events = pd.read_sql("SELECT * FROM Events", conn)
-    clients = pd.read_sql("SELECT * FROM Clients", conn)
-    programs = pd.read_sql("SELECT * FROM Programs", conn)
-    conn.close()
-    
-    # Pre-processing
-    events['StartDate'] = pd.to_datetime(events['StartDate'])
-    events['EndDate'] = pd.to_datetime(events['EndDate'])
-    
-    # Merge
-    merged = events.merge(programs, on='ProgramID', how='left')
-    merged = merged.merge(clients, on='ClientID', how='left')
-    
-    return events, clients, programs, merged
+def load_filter_options(version):
+    return kpi_queries.filter_options(DB_PATH)
 
-events_df, clients_df, programs_df, merged_df = load_data()
 
-if events_df is None:
+@st.cache_data(max_entries=256)
+def load_kpis(version, programs, statuses):
+    return kpi_queries.program_kpis(programs, statuses, DB_PATH)
+
+
+@st.cache_data
+def load_monthly_trend(version):
+    return kpi_queries.monthly_enrollments(DB_PATH)
+
+
+if not os.path.exists(DB_PATH):
     st.error("Database not found. Please run the data generation and DB creation scripts first.")
     st.stop()
 
+version = kpi_queries.data_version(DB_PATH)
+program_options, status_options = load_filter_options(version)
+
 # Sidebar Filters
 st.sidebar.header("Filters")
-program_filter = st.sidebar.multiselect("Select Program", programs_df['ProgramName'].unique(), default=programs_df['ProgramName'].unique())
-status_filter = st.sidebar.multiselect("Select Status", events_df['Status'].unique(), default=events_df['Status'].unique())
+program_filter = st.sidebar.multiselect("Select Program", program_options, default=program_options)
+status_filter = st.sidebar.multiselect("Select Status", status_options, default=status_options)
 
-filtered_df = merged_df[merged_df['ProgramName'].isin(program_filter) & merged_df['Status'].isin(status_filter)]
+# Sorted tuples: the same selection in any click order is one cache entry
+kpis = load_kpis(version, tuple(sorted(program_filter, key=str)), tuple(sorted(status_filter, key=str)))
 
 # 1. KPI Cards
 # ------------
 st.header("Key Performance Indicators")
 col1, col2, col3, col4 = st.columns(4)
 
-total_clients = filtered_df['ClientID'].nunique()
-total_enrollments = len(filtered_df)
-completion_rate = len(filtered_df[filtered_df['Status'] == 'Completed']) / len(filtered_df) * 100 if len(filtered_df) > 0 else 0
-avg_time_in_program = (filtered_df['EndDate'] - filtered_df['StartDate']).dt.days.mean()
+avg_time_in_program = kpis['avg_days_in_program']
 
-col1.metric("Total Clients Served", total_clients)
-col2.metric("Total Enrollments", total_enrollments)
-col3.metric("Completion Rate", f"{completion_rate:.1f}%")
-col4.metric("Avg Days in Program", f"{avg_time_in_program:.1f}")
+col1.metric("Total Clients Served", kpis['total_clients'])
+col2.metric("Total Enrollments", kpis['total_enrollments'])
+col3.metric("Completion Rate", f"{kpis['completion_rate']:.1f}%")
+col4.metric("Avg Days in Program", f"{avg_time_in_program:.1f}" if avg_time_in_program is not None else "n/a")
 
 # 2. Charts
 # ---------
@@ -76,18 +76,15 @@ c1, c2 = st.columns(2)
 
 with c1:
     st.subheader("Enrollments by Program")
-    prog_counts = filtered_df['ProgramName'].value_counts()
-    st.bar_chart(prog_counts)
+    st.bar_chart(kpis['by_program'])
 
 with c2:
     st.subheader("Enrollment Status Distribution")
-    status_counts = filtered_df['Status'].value_counts()
-    st.bar_chart(status_counts)
+    st.bar_chart(kpis['by_status'])
 
 # Monthly Trend
 st.subheader("Monthly Enrollment Trend")
-events_df['Month'] = events_df['StartDate'].dt.to_period('M')
-monthly_counts = events_df.groupby('Month').size()
+monthly_counts = load_monthly_trend(version)
 st.line_chart(monthly_counts.astype(int)) # Streamlit handles Series index as x-axis
 
 # 3. Data Integrity Report
@@ -0,0 +1,437 @@
+import os
+import sys
+import sqlite3
+import threading
+from functools import lru_cache, wraps
+
+import pandas as pd
+
+DB_PATH = 'juvenile_justice.db'
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts')
+
+# Where the fact queries read from:
+# - 'snapshot' (default): the memory-mapped Arrow snapshot of the joined fact
+#   view written by the ETL (rebuilt here if it is missing or stale), with
+#   SQLite as the fallback when it cannot be opened
+# - 'sqlite': every query goes to SQLite
+# - 'columnar': the Parquet/Arrow store written by `etl_pipeline.py --columnar`
+STORAGE = os.environ.get('TJJD_STORAGE', 'snapshot')
+COLUMNAR_DIR = os.environ.get('TJJD_COLUMNAR_DIR', os.path.join('data', 'columnar'))
+SNAPSHOT_PATH = os.environ.get('TJJD_SNAPSHOT_PATH', os.path.join('data', 'snapshots', 'fact_view.arrow'))
+
+# Columns of the joined County/Year fact view that pages may select or rank by.
+# Anything interpolated into SQL (ORDER BY, SELECT list) must come from here.
+FACT_VIEW_COLUMNS = [
+    'CountyID', 'YearID', 'Year', 'County', 'Region', 'Juv_Pop',
+    'Violent_Felony', 'Other_Felony', 'Misd', 'VOP', 'Status_Offense', 'CINS',
+    'Total_Referrals', 'Referral_Rate', 'Unique_Youth'
+]
+OFFENSE_COLUMNS = ['Violent_Felony', 'Other_Felony', 'Misd', 'VOP', 'Status_Offense', 'CINS']
+# Series the forecasting models are fitted to
+FORECAST_MEASURES = ['Total_Referrals'] + OFFENSE_COLUMNS
+ROLLUP_TABLES = ['Agg_State_Year', 'Agg_Region_Year', 'Agg_County_Volatility']
+
+FACT_VIEW = """
+    FROM Fact_Referrals f
+    JOIN Dim_County c ON f.CountyID = c.CountyID
+    JOIN Dim_Time t ON f.YearID = t.YearID
+"""
+# Qualified names so the joined columns are unambiguous
+_QUALIFIED = {'County': 'c.County', 'Region': 'c.Region', 'Year': 't.Year'}
+
+
+def _qualify(column):
+    if column not in FACT_VIEW_COLUMNS:
+        raise ValueError(f"Unknown fact column: {column}")
+    return _QUALIFIED.get(column, f"f.{column}")
+
+
+def _select_list(columns):
+    return ", ".join(f"{_qualify(col)} AS {col}" for col in columns)
+
+
+def _scripts_module(name):
+    """Modules shared with the ETL (connection pool, storage readers, forecasting, analytics) live in scripts/ and are imported on first use."""
+    if SCRIPTS_DIR not in sys.path:
+        sys.path.insert(0, SCRIPTS_DIR)
+    return __import__(name)
+
+
+def instrumentation():
+    """scripts/instrumentation.py: spans recorded to the shared metrics file."""
+    return _scripts_module('instrumentation')
+
+
+def _columnar():
+    return _scripts_module('columnar_store')
+
+
+def _compact(rows):
+    """
+    Fact view rows in the shared compact format (see compact_facts):
+    County/Region as categoricals over Dim_County, downcast counts. The
+    cached results are held by every session, so this is what they cost.
+    """
+    return _scripts_module('compact_facts').compact_fact_view(rows, fetch_dim_county())
+
+
+# The OLAP cube of the current data version, shared by every session of this process
+_cube = {'version': None, 'cube': None}
+_cube_lock = threading.Lock()
+
+
+def cube():
+    """
+    scripts/olap.py's Cube over the fact view: the pages' Year/Region/County/
+    Offense slices are roll-ups of its cached cuboids. A new one (with an
+    empty cache) replaces it when the data changes.
+    """
+    version = data_version()
+    with _cube_lock:
+        if _cube['version'] != version:
+            _cube.update(version=version, cube=_scripts_module('olap').Cube(_cuboid_partials))
+        return _cube['cube']
+
+
+# The mapped snapshot, shared by every session of this process
+_snapshot = {'version': None, 'table': None}
+_snapshot_lock = threading.Lock()
+
+
+def _snapshot_table():
+    """
+    The fact view snapshot as a memory-mapped Arrow Table, re-checked when
+    the database changes. None if it cannot be opened, e.g. on a read-only
+    deployment without a prebuilt snapshot; queries then go to SQLite.
+    """
+    version = data_version()
+    with _snapshot_lock:
+        if _snapshot['version'] != version:
+            try:
+                table = _scripts_module('fact_snapshot').open_snapshot(DB_PATH, SNAPSHOT_PATH)
+            except (ImportError, OSError, sqlite3.Error):
+                table = None
+            _snapshot.update(version=version, table=table)
+        return _snapshot['table']
+
+
+def _view_storage():
+    """'columnar' or 'snapshot' when the fact view is read as Arrow data, None for SQLite."""
+    if STORAGE == 'columnar':
+        return 'columnar'
+    if STORAGE == 'snapshot' and _snapshot_table() is not None:
+        return 'snapshot'
+    return None
+
+
+def data_version(db_path=None):
+    """Changes whenever the database (or its WAL) is written, e.g. by an ETL run."""
+    db_path = db_path or DB_PATH
+    if STORAGE == 'columnar':
+        # The store is swapped in whole, with a fresh manifest
+        paths = (os.path.join(COLUMNAR_DIR, 'manifest.json'),)
+    else:
+        paths = (db_path, db_path + '-wal')
+    version = []
+    for path in paths:
+        if os.path.exists(path):
+            stat = os.stat(path)
+            version.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(version)
+
+
+def _query(sql, params=()):
+    # Pooled read-only connection: never blocks, or is blocked by, an ETL load
+    with _scripts_module('database').read_connection(DB_PATH) as conn:
+        return pd.read_sql(sql, conn, params=params)
+
+
+def _query_view(sql, params=()):
+    """_query() for a FACT_VIEW select, compacted like the Arrow reads."""
+    return _compact(_query(sql, params))
+
+
+def cached_query(func):
+    """
+    Cache a query result per parameter tuple and data version, so a new ETL
+    load invalidates it. Callers get a copy and may modify it freely.
+    Concurrent calls with the same key (a page and the background prefetcher)
+    compute it once: later callers wait for the first one's result.
+    """
+    @lru_cache(maxsize=256)
+    def cached(version, *args):
+        # Only cache misses reach the database, so only they are recorded
+        with instrumentation().span(f"dashboard.{func.__name__}") as load:
+            result = func(*args)
+            load.rows = len(result) if hasattr(result, '__len__') else None
+        return result
+
+    in_flight = {}
+    guard = threading.Lock()
+
+    @wraps(func)
+    def wrapper(*args):
+        # Lists (e.g. column selections) become tuples so they can be part of the key
+        key = (data_version(),) + tuple(tuple(arg) if isinstance(arg, list) else arg for arg in args)
+        with guard:
+            lock = in_flight.setdefault(key, threading.Lock())
+        with lock:
+            try:
+                result = cached(*key)
+            finally:
+                with guard:
+                    in_flight.pop(key, None)
+        return result.copy() if hasattr(result, 'copy') else result
+
+    wrapper.cache_clear = cached.cache_clear
+    return wrapper
+
+
+def _read_view(columns, years=None):
+    """Arrow counterpart of a FACT_VIEW select: only `columns`, only the `years` rows/partitions."""
+    columns = list(dict.fromkeys(columns))
+    for col in columns:
+        _qualify(col)
+    if _view_storage() == 'columnar':
+        return _compact(_columnar().read_fact_view(columns, years, COLUMNAR_DIR))
+    import pyarrow.compute as pc
+    table = _snapshot_table()
+    if years is not None:
+        table = table.filter(pc.field('Year').isin([int(y) for y in years]))
+    return _compact(table.select(columns).to_pandas())
+
+
+def _cuboid_partials(cuboid, filters):
+    """
+    The cube's loader: one cuboid's partial aggregates, cut to `filters`.
+    Cuboids without County are read from the Agg_State_Year /
+    Agg_Region_Year rollups; the others are grouped by the configured
+    storage (GROUP BY in SQLite, group_by on the Arrow data, Year partitions
+    pruned in the columnar store), so only the cuboid's cells reach pandas.
+    """
+    olap = _scripts_module('olap')
+    table = olap.rollup_table(cuboid)
+    if table:
+        rollup = fetch_rollup(table) if _has_rollup(table) else None
+        partials = olap.rollup_partials(cuboid, rollup, fetch_dim_time(), filters)
+        if partials is not None:
+            return _compact(partials)
+    storage = _view_storage()
+    if storage == 'columnar':
+        table = _columnar().fact_view_table(olap.BASE_COLUMNS, filters.get('Year'), COLUMNAR_DIR)
+    elif storage == 'snapshot':
+        table = _snapshot_table().select(olap.BASE_COLUMNS)
+    else:
+        return _query_view(*olap.partials_sql(cuboid, filters))
+    return _compact(olap.arrow_partials(table, cuboid, filters))
+
+
+def _split_columns(columns):
+    """
+    Fact view columns as (dimensions and their attributes, measures). At
+    County x Year grain the cube's Referral_Rate is the county's own rate.
+    """
+    olap = _scripts_module('olap')
+    by = [col for col in columns if col in olap.DIMENSIONS or col in olap.ATTRIBUTES]
+    return by, [col for col in columns if col not in by]
+
+
+@cached_query
+def _fetch_slice(measures, by, filter_items, order_by, limit):
+    filters = {dim: list(values) for dim, values in filter_items}
+    return cube().query(list(measures), list(by), filters, order_by=order_by, limit=limit)
+
+
+def fetch_slice(measures, by=(), filters=None, order_by=None, limit=None):
+    """
+    Aggregated measures grouped by dimensions (Year, Region, County, Offense)
+    with filters, e.g. fetch_slice(['Count'], ['Year', 'Offense']); see
+    olap.Cube.query. Cached per argument set and data version.
+    """
+    filter_items = tuple(sorted(
+        (dim, tuple(values) if isinstance(values, (list, tuple, set)) else (values,))
+        for dim, values in (filters or {}).items()
+    ))
+    return _fetch_slice(tuple(measures), tuple(by), filter_items, order_by, limit)
+
+
+@cached_query
+def fetch_dim_county():
+    """County members, the categories of the compact fact view's County and Region."""
+    if _view_storage() == 'columnar':
+        return _columnar().read_table('Dim_County', ['CountyID', 'County', 'Region'],
+                                      store_dir=COLUMNAR_DIR).to_pandas()
+    return _query("SELECT CountyID, County, Region FROM Dim_County")
+
+
+@cached_query
+def fetch_dim_time():
+    """Year keys, joined onto the rollup tables that serve as cube cuboids."""
+    if _view_storage() == 'columnar':
+        return _columnar().read_table('Dim_Time', ['YearID', 'Year'], store_dir=COLUMNAR_DIR).to_pandas()
+    return _query("SELECT YearID, Year FROM Dim_Time")
+
+
+@cached_query
+def fetch_years():
+    if _view_storage() == 'columnar':
+        return sorted(_columnar().read_table('Dim_Time', ['Year'], store_dir=COLUMNAR_DIR)['Year'].to_pylist())
+    return _query("SELECT Year FROM Dim_Time ORDER BY Year")['Year'].tolist()
+
+
+@cached_query
+def fetch_record_count():
+    storage = _view_storage()
+    if storage == 'columnar':
+        return _columnar().dataset('Fact_Referrals', COLUMNAR_DIR).count_rows()
+    if storage == 'snapshot':
+        return _snapshot_table().num_rows
+    return int(_query("SELECT COUNT(*) AS n FROM Fact_Referrals")['n'].iloc[0])
+
+
+@cached_query
+def _has_rollup(table):
+    """Whether the ETL has built `table`; the shipped database predates the rollups."""
+    if _view_storage() == 'columnar':
+        return table in _columnar().read_manifest(COLUMNAR_DIR)['tables']
+    return not _query("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).empty
+
+
+@cached_query
+def fetch_rollup(table):
+    """
+    One of the ETL's rollup tables. Until the ETL has built it, the same rows
+    are computed from the fact view: the state and region rollups with
+    rollups.py's own SELECT, the volatility scores from fetch_risk_scores().
+    """
+    if table not in ROLLUP_TABLES:
+        raise ValueError(f"Unknown rollup table: {table}")
+    if not _has_rollup(table):
+        if table == 'Agg_County_Volatility':
+            return fetch_risk_scores().volatility_frame()
+        return _query(_scripts_module('rollups').year_rollup_sql(table))
+    if _view_storage() == 'columnar':
+        return _columnar().read_table(table, store_dir=COLUMNAR_DIR).to_pandas()
+    return _query(f"SELECT * FROM {table}")
+
+
+@cached_query
+def fetch_year_rows(year, columns):
+    """All counties for one year, only the requested columns."""
+    for col in columns:
+        _qualify(col)
+    by, measures = _split_columns(list(dict.fromkeys(['County'] + list(columns))))
+    return cube().query(measures, by, {'Year': int(year)})[list(columns)]
+
+
+@cached_query
+def fetch_top_n(year, by, n, columns):
+    """Top-n counties for one year ranked by `by`, from the cube's County x Year cuboid."""
+    for col in list(columns) + [by]:
+        _qualify(col)
+    dims, measures = _split_columns(list(dict.fromkeys(['County'] + list(columns) + [by])))
+    return cube().query(measures, dims, {'Year': int(year)}, order_by=by, limit=n)[list(columns)]
+
+
+@cached_query
+def fetch_region_totals(year, measure='Total_Referrals'):
+    _qualify(measure)
+    return cube().query([measure], ['Region'], {'Year': int(year)})
+
+
+@cached_query
+def fetch_offense_mismatches(columns):
+    """Rows whose offense categories do not add up to Total_Referrals, with the computed sum as Calc_Total."""
+    if _view_storage():
+        rows = _read_view(list(columns) + OFFENSE_COLUMNS + ['Total_Referrals', 'Year', 'County'])
+        rows['Calc_Total'] = rows[OFFENSE_COLUMNS].sum(axis=1, min_count=len(OFFENSE_COLUMNS))
+        # Same NULL semantics as the SQL: a missing side is not a mismatch
+        mismatch = rows['Calc_Total'].notna() & rows['Total_Referrals'].notna() & \
+            (rows['Calc_Total'] != rows['Total_Referrals'])
+        rows = rows[mismatch].sort_values(['Year', 'County'], kind='stable')
+        return rows[list(columns) + ['Calc_Total']].reset_index(drop=True)
+    calc_total = " + ".join(f"f.{col}" for col in OFFENSE_COLUMNS)
+    return _query_view(
+        f"SELECT {_select_list(columns)}, ({calc_total}) AS Calc_Total {FACT_VIEW} "
+        f"WHERE ({calc_total}) != f.Total_Referrals ORDER BY t.Year, c.County"
+    )
+
+
+RISK_COLUMNS = ['CountyID', 'County', 'Region', 'Year', 'Total_Referrals', 'Referral_Rate']
+
+
+@cached_query
+def fetch_risk_scores():
+    """
+    YoY change, volatility, regional z-scores and MAD outlier flags for every
+    county and year, computed once per data version (see analytics.risk_scores).
+    """
+    if _view_storage():
+        rows = _read_view(RISK_COLUMNS)
+    else:
+        rows = _query_view(f"SELECT {_select_list(RISK_COLUMNS)} {FACT_VIEW}")
+    return _scripts_module('analytics').risk_scores(rows)
+
+
+@cached_query
+def fetch_year_scores(year):
+    """Every county's risk scores for one year, sliced from fetch_risk_scores()."""
+    return fetch_risk_scores().year_frame(year)
+
+
+@cached_query
+def fetch_series(level, entity, measure):
+    """
+    Yearly totals of one measure for the state, one region or one county;
+    the history the forecasting models were fitted to.
+    """
+    _qualify(measure)
+    filters = {'State': None, 'Region': 'Region', 'County': 'County'}
+    if level not in filters:
+        raise ValueError(f"Unknown forecast level: {level}")
+    column = filters[level]
+    return cube().query([measure], ['Year'], {column: entity} if column else None)
+
+
+@cached_query
+def fetch_forecast_models():
+    """Fitted forecast parameters for every State/Region/County x measure series of the latest ETL run."""
+    return _scripts_module('forecasting').load_models(DB_PATH)
+
+
+def fetch_forecast(level, entity, measure, method, years):
+    """Point forecasts and prediction intervals for one series, projected from the cached model parameters."""
+    models = fetch_forecast_models()
+    series = models[(models['Level'] == level) & (models['Entity'] == entity) &
+                    (models['Measure'] == measure) & (models['Method'] == method)]
+    return _scripts_module('forecasting').project(series.reset_index(drop=True), years)
+
+
+@cached_query
+def fetch_fact_footprint():
+    """Per-column memory of the full fact view as read from storage and in the compact format."""
+    storage = _view_storage()
+    if storage == 'columnar':
+        wide = _columnar().read_fact_view(FACT_VIEW_COLUMNS, store_dir=COLUMNAR_DIR)
+    elif storage == 'snapshot':
+        wide = _snapshot_table().select(FACT_VIEW_COLUMNS).to_pandas()
+    else:
+        wide = _query(f"SELECT {_select_list(FACT_VIEW_COLUMNS)} {FACT_VIEW}")
+    return _scripts_module('compact_facts').footprint_report(wide, _compact(wide))
+
+
+@lru_cache(maxsize=1)
+def _load_metrics(path, version):
+    return instrumentation().load_metrics(path)
+
+
+def fetch_metrics():
+    """Spans recorded by scripts/instrumentation.py, re-read whenever the metrics file changes."""
+    path = instrumentation().METRICS_PATH
+    version = (os.stat(path).st_mtime_ns, os.stat(path).st_size) if os.path.exists(path) else None
+    return _load_metrics(path, version).copy()
+
+
+def summarize_metrics(metrics, last_runs=None):
+    """Per-span run counts and last/median/max durations (see instrumentation.summarize)."""
+    return instrumentation().summarize(metrics, last_runs)
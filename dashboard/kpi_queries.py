@@ -0,0 +1,154 @@
+import os
+import sys
+from functools import lru_cache
+
+import pandas as pd
+
+# The shared connection pool and the schema version live with the ETL scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+import database
+import instrumentation
+import migrate_schema
+
+DB_PATH = 'juvenile_justice.db'
+
+# The program dashboard's numbers, computed inside SQLite so the page never
+# loads Events into pandas. Counts are GROUP BYs over (ProgramID, Status),
+# which the migrated schema answers from idx_events_program_status; dates are
+# ISO text on create_db.py's schema and YYYYMMDD integers once migrated.
+
+
+def data_version(db_path=DB_PATH):
+    """Changes whenever the database (or its WAL) is written; part of every cache key."""
+    version = []
+    for path in (db_path, db_path + '-wal'):
+        if os.path.exists(path):
+            stat = os.stat(path)
+            version.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(version)
+
+
+def _integer_dates(conn):
+    return migrate_schema.schema_version(conn) >= migrate_schema.SCHEMA_VERSION
+
+
+def _day_number(column, integer_dates):
+    """
+    SQL for a date's day number; only differences are meaningful. YYYYMMDD
+    integers are converted with integer arithmetic (days from a March-based
+    civil calendar), several times faster than formatting them for julianday().
+    """
+    if not integer_dates:
+        return f"julianday({column})"
+    year = f"({column} / 10000 - ({column} / 100 % 100 <= 2))"
+    month = f"(({column} / 100 % 100 + 9) % 12)"
+    return (f"(365 * {year} + {year} / 4 - {year} / 100 + {year} / 400 "
+            f"+ (153 * {month} + 2) / 5 + {column} % 100 - 1)")
+
+
+def _month(column, integer_dates):
+    """SQL for a date's month key: YYYYMM (integer dates, straight off the index) or 'YYYY-MM'."""
+    if integer_dates:
+        return f"{column} / 100"
+    return f"substr({column}, 1, 7)"
+
+
+def _in_list(column, values):
+    """`column IN (?, ...)` and its parameters. NULL is matched explicitly (IN never matches it)."""
+    values = list(values)
+    known = [value for value in values if value is not None and not pd.isna(value)]
+    clauses = []
+    if known:
+        clauses.append(f"{column} IN ({', '.join('?' * len(known))})")
+    if len(known) < len(values):
+        clauses.append(f"{column} IS NULL")
+    return f"({' OR '.join(clauses) or '0'})", known
+
+
+@instrumentation.timed('dashboard.filter_options')
+def filter_options(db_path=DB_PATH):
+    """Sidebar choices: every program name and every enrollment status, in first-seen order."""
+    with database.read_connection(db_path) as conn:
+        programs = [row[0] for row in conn.execute(
+            "SELECT ProgramName FROM Programs GROUP BY ProgramName ORDER BY MIN(rowid)")]
+    # Cells are in first-row order, so each status first appears at its earliest row
+    statuses = list(_enrollment_cells(db_path, data_version(db_path))['Status'].unique())
+    return programs, statuses
+
+
+@lru_cache(maxsize=4)
+@instrumentation.timed('dashboard.enrollment_cells', rows=len)
+def _enrollment_cells(db_path, version):
+    """
+    Enrollments and summed stay lengths per (program, status), a few dozen
+    rows. Every filter combination is a subset of these cells, so one pass
+    per data version serves the counts and averages of all of them.
+    """
+    with database.read_connection(db_path) as conn:
+        integer_dates = _integer_dates(conn)
+        days = f"{_day_number('EndDate', integer_dates)} - {_day_number('StartDate', integer_dates)}"
+        return pd.read_sql(f"""
+            SELECT cells.ProgramID, p.ProgramName, cells.Status, cells.Enrollments, cells.Days, cells.Stays
+            FROM (SELECT ProgramID, Status, COUNT(*) AS Enrollments, SUM({days}) AS Days, COUNT({days}) AS Stays,
+                         MIN(rowid) AS FirstRow
+                  FROM Events GROUP BY ProgramID, Status) cells
+            LEFT JOIN Programs p ON p.ProgramID = cells.ProgramID
+            ORDER BY cells.FirstRow
+        """, conn)
+
+
+@instrumentation.timed('dashboard.program_kpis', rows=lambda kpis: kpis['total_enrollments'])
+def program_kpis(programs, statuses, db_path=DB_PATH):
+    """
+    KPI cards, enrollments per program and per status for the selected
+    programs and statuses. Enrollments are Events rows (a client listed
+    twice in Clients does not count an enrollment twice).
+
+    Everything but distinct clients comes from the per-(program, status)
+    cells; that one count reads the selected Events rows, with no WHERE
+    clause at all (so straight off the ClientID index) when the selection
+    covers every row.
+    """
+    cells = _enrollment_cells(db_path, data_version(db_path))
+    selected = cells[cells['ProgramName'].isin(list(programs)) & cells['Status'].isin(list(statuses))]
+    enrollments = int(selected['Enrollments'].sum())
+
+    clients = 0
+    if not selected.empty:
+        if enrollments == cells['Enrollments'].sum():
+            where, params = '1', []
+        else:
+            id_clause, id_params = _in_list('ProgramID', selected['ProgramID'].unique())
+            status_clause, status_params = _in_list('Status', selected['Status'].unique())
+            where, params = f"{id_clause} AND {status_clause}", id_params + status_params
+        with database.read_connection(db_path) as conn:
+            clients = conn.execute(f"SELECT COUNT(DISTINCT ClientID) FROM Events WHERE {where}", params).fetchone()[0]
+
+    stays = selected['Stays'].sum()
+    completed = selected.loc[selected['Status'] == 'Completed', 'Enrollments'].sum()
+    by_program = selected.groupby('ProgramName', sort=False)['Enrollments'].sum()
+    by_status = selected.groupby('Status', sort=False)['Enrollments'].sum()
+    return {
+        'total_clients': clients,
+        'total_enrollments': enrollments,
+        'completion_rate': (completed / enrollments * 100) if enrollments else 0,
+        'avg_days_in_program': selected['Days'].sum() / stays if stays else None,
+        'by_program': by_program.sort_values(ascending=False, kind='stable').rename('count'),
+        'by_status': by_status.sort_values(ascending=False, kind='stable').rename('count'),
+    }
+
+
+@instrumentation.timed('dashboard.monthly_enrollments', rows=len)
+def monthly_enrollments(db_path=DB_PATH):
+    """Enrollments per start month (all programs and statuses), indexed by month."""
+    with database.read_connection(db_path) as conn:
+        integer_dates = _integer_dates(conn)
+        trend = pd.read_sql(f"""
+            SELECT {_month('StartDate', integer_dates)} AS Month, COUNT(*) AS count FROM Events
+            WHERE StartDate IS NOT NULL GROUP BY Month ORDER BY Month
+        """, conn)
+    if integer_dates:
+        months = pd.PeriodIndex.from_fields(year=trend['Month'] // 100, month=trend['Month'] % 100, freq='M')
+    else:
+        months = pd.PeriodIndex(trend['Month'], freq='M')
+    return trend.set_index(months.rename('Month'))['count']
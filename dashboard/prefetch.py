@@ -0,0 +1,62 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import data_access as dal
+import views
+
+# After a page renders, the queries of every page (each year option
+# included) are run on a small background pool. Results land in the same
+# bounded per-query caches data_access serves pages from, so switching page
+# or year afterwards is a cache hit. TJJD_PREFETCH=0 turns this off.
+ENABLED = os.environ.get('TJJD_PREFETCH', '1') != '0'
+WORKERS = int(os.environ.get('TJJD_PREFETCH_WORKERS', '2'))
+
+# Page label -> 'queued', 'warm (N queries, S s)' or the error that stopped it
+STATUS = {}
+
+_executor = None
+_lock = threading.Lock()
+# Page label -> data version it was last queued for
+_queued = {}
+
+
+def _warm(label):
+    start = time.perf_counter()
+    try:
+        with dal.instrumentation().span(f"dashboard.prefetch.{views.PAGES[label].split('.')[-1]}") as warm:
+            # Importing the page here also takes its import cost off the foreground
+            tasks = list(views.load_page(label).prefetch())
+            for func, *args in tasks:
+                func(*args)
+            warm.rows = len(tasks)
+    except Exception as exc:
+        # Nothing is lost: the page computes its data in the foreground as before
+        STATUS[label] = f"failed: {exc}"
+        with _lock:
+            _queued.pop(label, None)
+        return
+    STATUS[label] = f"warm ({len(tasks)} queries, {time.perf_counter() - start:.2f}s)"
+
+
+def prefetch_pages(current):
+    """
+    Queue the data of every page for the background pool, the current one
+    first (its other year options are the likeliest next request). Each
+    page is queued once per data version, so reruns add no work.
+    """
+    global _executor
+    if not ENABLED:
+        return
+    version = dal.data_version()
+    labels = [current] + [label for label in views.PAGES if label != current]
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='prefetch')
+        for label in labels:
+            if _queued.get(label) == version:
+                continue
+            _queued[label] = version
+            STATUS[label] = 'queued'
+            _executor.submit(_warm, label)
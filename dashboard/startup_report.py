@@ -0,0 +1,81 @@
+import argparse
+import os
+import subprocess
+import sys
+
+import pandas as pd
+
+DASHBOARD_DIR = os.path.dirname(os.path.abspath(__file__))
+REPORT_PATH = os.path.join('docs', 'startup_import_times.csv')
+
+# What every session imports before any page renders (app_v2.py's own imports)
+STARTUP_IMPORTS = ['streamlit', 'pandas', 'data_access', 'prefetch', 'views']
+
+
+def import_times(statement, preload=()):
+    """
+    Run `statement` in a fresh interpreter under `python -X importtime` and
+    return (module, depth, self_us, cumulative_us) for every module it
+    imported. Modules in `preload` are imported first and not counted.
+    """
+    code = "".join(f"import {name}\n" for name in preload) + statement
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                          capture_output=True, text=True, check=True, cwd=DASHBOARD_DIR)
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        entries.append((name.strip(), (len(name) - len(name.lstrip()) - 1) // 2, int(self_us), int(cumulative_us)))
+    if preload:
+        # Everything up to the last preloaded module belongs to the preload
+        marker = max(i for i, entry in enumerate(entries) if entry[1] == 0 and entry[0] in preload)
+        entries = entries[marker + 1:]
+    return entries
+
+
+def startup_report(top=5):
+    """
+    Import cost of the app's startup path and of each page module on top of
+    it, with the heaviest modules each one pulls in. Times are cumulative
+    milliseconds from a fresh interpreter, so they are comparable run to run.
+    """
+    sys.path.insert(0, DASHBOARD_DIR)
+    import views
+
+    rows = []
+    targets = [('startup', "\n".join(f"import {name}" for name in STARTUP_IMPORTS), ())]
+    targets += [(module, f"import {module}", STARTUP_IMPORTS) for module in views.PAGES.values()]
+    for target, statement, preload in targets:
+        entries = import_times(statement, preload)
+        top_level = [e for e in entries if e[1] == 0]
+        rows.append({'Target': target, 'Module': '(total)', 'Cumulative_ms': sum(e[3] for e in top_level) / 1000})
+        # Heaviest modules pulled in, whatever their depth
+        pulled_in = [e for e in entries if e[0] != target]
+        for name, depth, self_us, cumulative_us in sorted(pulled_in, key=lambda e: -e[3])[:top]:
+            rows.append({'Target': target, 'Module': name, 'Cumulative_ms': cumulative_us / 1000})
+    report = pd.DataFrame(rows)
+    report['Cumulative_ms'] = report['Cumulative_ms'].round(1)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-module import times of the dashboard's startup path and pages.")
+    parser.add_argument('--top', type=int, default=5, help="Heaviest imported modules to list per target.")
+    parser.add_argument('--output', default=REPORT_PATH)
+    parser.add_argument('--baseline', help="An earlier report to compare the totals against.")
+    args = parser.parse_args()
+
+    report = startup_report(args.top)
+    print(report.to_string(index=False))
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    report.to_csv(args.output, index=False)
+    print(f"\nReport saved to {args.output}")
+
+    if args.baseline:
+        baseline = pd.read_csv(args.baseline)
+        totals = report[report['Module'] == '(total)'].merge(
+            baseline[baseline['Module'] == '(total)'], on=['Target', 'Module'], suffixes=('', '_Baseline'))
+        totals['Change_ms'] = (totals['Cumulative_ms'] - totals['Cumulative_ms_Baseline']).round(1)
+        print("\nChange vs baseline:")
+        print(totals[['Target', 'Cumulative_ms_Baseline', 'Cumulative_ms', 'Change_ms']].to_string(index=False))
@@ -0,0 +1,32 @@
+import importlib
+import sys
+import time
+
+# Sidebar label -> page module. A page module is only imported when it is
+# selected, so its heavy dependencies (plotly, SciPy) stay off the
+# startup path of the other pages.
+PAGES = {
+    "Executive Dashboard": "views.executive",
+    "Risk & Hotspots": "views.risk",
+    "Data Quality Audit": "views.data_quality",
+    "Forecast Model": "views.forecast",
+    "County Comparisons": "views.county_comparisons",
+    "Performance Metrics": "views.metrics",
+}
+
+# Seconds spent on the first import of each module in this server process
+IMPORT_TIMES = {}
+
+
+def record_import_time(name, seconds):
+    IMPORT_TIMES.setdefault(name, seconds)
+
+
+def load_page(label):
+    """Import (once per process) and return the module that renders `label`."""
+    module_name = PAGES[label]
+    if module_name not in sys.modules:
+        start = time.perf_counter()
+        importlib.import_module(module_name)
+        record_import_time(module_name, time.perf_counter() - start)
+    return sys.modules[module_name]
@@ -0,0 +1,43 @@
+import streamlit as st
+import plotly.express as px
+
+import data_access as dal
+
+RANK_COLUMNS = ['County', 'Referral_Rate']
+
+
+def prefetch():
+    """The ranking render() makes for every year option, as (function, *args) tuples."""
+    for year in dal.fetch_years():
+        yield (dal.fetch_top_n, year, 'Referral_Rate', 10, RANK_COLUMNS)
+
+
+# --------------------------
+# Page 5: County Comparisons
+# --------------------------
+def render():
+    st.title("County Comparisons")
+    st.markdown("### 1. Top Counties by Referral Rate")
+    
+    # Year Selection
+    years = sorted(dal.fetch_years(), reverse=True)
+    selected_year = st.selectbox("Select Year for Ranking", years)
+    
+    # Filter Data
+    ranked_df = dal.fetch_top_n(selected_year, 'Referral_Rate', 10, RANK_COLUMNS)
+    
+    # Create Bar Chart
+    fig = px.bar(
+        ranked_df,
+        x='County',
+        y='Referral_Rate',
+        color='Referral_Rate',
+        color_continuous_scale='Reds',
+        title=f"Top 10 Counties by Referral Rate ({selected_year})",
+        labels={'Referral_Rate': 'Rate per 1,000'},
+        text='Referral_Rate'
+    )
+    fig.update_traces(texttemplate='%{text:.1f}', textposition='outside')
+    fig.update_layout(xaxis_title="County", yaxis_title="Rate per 1,000")
+    
+    st.plotly_chart(fig, use_container_width=True)
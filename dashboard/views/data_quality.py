@@ -0,0 +1,57 @@
+import streamlit as st
+import pandas as pd
+
+import data_access as dal
+
+
+@st.cache_data
+def load_dq_report():
+    try:
+        return pd.read_csv('docs/data_quality_report.csv')
+    except:
+        return pd.DataFrame()
+
+
+MISMATCH_COLUMNS = ['Year', 'County', 'Total_Referrals', 'Violent_Felony', 'Misd']
+
+
+def prefetch():
+    """The inspection query render() makes, as (function, *args) tuples for the background prefetcher."""
+    yield (dal.fetch_offense_mismatches, MISMATCH_COLUMNS)
+
+
+# --------------------------
+# Page 3: Data Quality Audit
+# --------------------------
+def render():
+    dq_df = load_dq_report()
+
+    st.title("🛡️ Data Integrity Hub")
+    
+    # Summary Cards
+    col1, col2, col3 = st.columns(3)
+    
+    total_checks = 4 # Completeness, Uniqueness, Logic, Outliers
+    failed_rows = dq_df['Failed_Rows'].sum() if not dq_df.empty else 0
+    risk_score = 100 - min(100, (failed_rows / 100)) # Arbitrary gaming score
+    
+    col1.metric("Health Score", f"{risk_score:.0f}/100")
+    col2.metric("Total Issues Found", f"{failed_rows}")
+    col3.metric("Critical Failures", f"{len(dq_df[dq_df['Severity']=='Critical']) if not dq_df.empty else 0}")
+    
+    st.markdown("### Audit Report")
+    if not dq_df.empty:
+        st.dataframe(dq_df.style.applymap(lambda v: 'color: red;' if v == 'Critical' else None, subset=['Severity']), use_container_width=True)
+    else:
+        st.success("No issues found in the latest audit run.")
+        
+    # Deep dive into "Logic"
+    with st.expander("Inspection Tool: Math Mismatches"):
+        # Re-calc (inside SQLite, only mismatching rows come back)
+        mismatches = dal.fetch_offense_mismatches(MISMATCH_COLUMNS)
+        
+        if not mismatches.empty:
+            st.warning(f"{len(mismatches)} rows have discrepancies between Total Referrals and Offense Sum.")
+            st.dataframe(mismatches[['Year', 'County', 'Total_Referrals', 'Calc_Total', 'Violent_Felony', 'Misd']])
+        else:
+            st.success("✅ All rows passed Summation Logic Check.")
@@ -0,0 +1,90 @@
+import streamlit as st
+import plotly.express as px
+
+import data_access as dal
+
+TOP_COLUMNS = ['County', 'Total_Referrals', 'Referral_Rate']
+KPI_MEASURES = ['Total_Referrals', 'Referral_Rate', 'Violent_Felony', 'Unique_Youth']
+TREND_OFFENSES = ['Violent_Felony', 'Other_Felony', 'Misd', 'VOP', 'Status_Offense']
+
+
+def prefetch():
+    """The queries render() makes, as (function, *args) tuples for the background prefetcher."""
+    latest_year = dal.fetch_rollup('Agg_State_Year')['Year'].max()
+    yield from [(dal.fetch_slice, KPI_MEASURES, ['Year']),
+                (dal.fetch_slice, ['Count'], ['Year', 'Offense'], {'Offense': TREND_OFFENSES}),
+                (dal.fetch_region_totals, latest_year),
+                (dal.fetch_top_n, latest_year, 'Total_Referrals', 10, TOP_COLUMNS)]
+
+
+# --------------------------
+# Page 1: Executive Dashboard
+# --------------------------
+def render():
+    # Statewide totals per year; Referral_Rate is the mean of the county rates
+    state_year = dal.fetch_slice(KPI_MEASURES, ['Year'])
+
+    st.title("📊 Executive Dashboard: State of Juvenile Justice")
+    st.markdown("High-level overview of referral trends, offense severity, and regional performance.")
+    
+    # KPIs
+    # Latest Year vs Previous
+    latest_year = state_year['Year'].max()
+    curr_agg = state_year[state_year['Year'] == latest_year].iloc[0]
+    prev_agg = state_year[state_year['Year'] == (latest_year - 1)].iloc[0]
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    curr_vol = curr_agg['Total_Referrals']
+    prev_vol = prev_agg['Total_Referrals']
+    vol_delta = calc_delta = ((curr_vol - prev_vol) / prev_vol) * 100
+    
+    curr_rate = curr_agg['Referral_Rate']
+    prev_rate = prev_agg['Referral_Rate']
+    rate_delta = ((curr_rate - prev_rate) / prev_rate) * 100
+    
+    violent_share = (curr_agg['Violent_Felony'] / curr_vol) * 100
+    prev_violent_share = (prev_agg['Violent_Felony'] / prev_vol) * 100
+    violent_delta = violent_share - prev_violent_share
+    
+    col1.metric("Total Referrals (FY21)", f"{curr_vol:,.0f}", f"{vol_delta:.1f}%", delta_color="inverse")
+    col2.metric("Avg Referral Rate (per 1k)", f"{curr_rate:.2f}", f"{rate_delta:.1f}%", delta_color="inverse")
+    col3.metric("Violent Felony Share", f"{violent_share:.1f}%", f"{violent_delta:.1f} pts", delta_color="inverse")
+    col4.metric("Unique Youth Served", f"{curr_agg['Unique_Youth']:,.0f}", "Active Population")
+    
+    st.markdown("---")
+    
+    # Row 2: Trends and Composition
+    c1, c2 = st.columns((2, 1))
+    
+    with c1:
+        st.subheader("Offense Severity Evolution")
+        # Year x Offense cells of the cube, already long format for the stacked area
+        trend_melt = dal.fetch_slice(['Count'], ['Year', 'Offense'], {'Offense': TREND_OFFENSES})
+        trend_melt = trend_melt.rename(columns={'Offense': 'Offense Type'})
+        
+        fig_area = px.area(trend_melt, x='Year', y='Count', color='Offense Type',
+                           color_discrete_sequence=px.colors.qualitative.Safe,
+                           title="Volume by Offense Category (Stacked)")
+        fig_area.update_layout(xaxis=dict(tickmode='linear'), hovermode="x unified")
+        st.plotly_chart(fig_area, use_container_width=True)
+        
+    with c2:
+        st.subheader("Regional Distribution")
+        reg_agg = dal.fetch_region_totals(latest_year)
+        fig_pie = px.pie(reg_agg, values='Total_Referrals', names='Region', hole=0.4,
+                           title=f"Referrals by Region (FY {latest_year})")
+        fig_pie.update_traces(textposition='inside', textinfo='percent+label')
+        fig_pie.update_layout(showlegend=False)
+        st.plotly_chart(fig_pie, use_container_width=True)
+
+    # Row 3: County Leaderboard
+    st.subheader(f"Top 10 Counties by Volume (FY {latest_year})")
+    top_counties = dal.fetch_top_n(latest_year, 'Total_Referrals', 10, TOP_COLUMNS)
+    fig_bar = px.bar(top_counties, x='County', y='Total_Referrals', color='Referral_Rate',
+                     color_continuous_scale='Reds',
+                     text='Total_Referrals',
+                     labels={'Referral_Rate': 'Rate/1k'},
+                     title="Volume vs Intensity (Color)")
+    fig_bar.update_traces(texttemplate='%{text:.2s}', textposition='outside')
+    st.plotly_chart(fig_bar, use_container_width=True)
@@ -0,0 +1,95 @@
+import streamlit as st
+import pandas as pd
+import plotly.graph_objects as go
+
+import data_access as dal
+
+FORECAST_YEARS = [2022, 2023, 2024, 2025]
+METHOD_LABELS = {'linear': 'Linear trend', 'holt': "Holt's exponential smoothing"}
+
+
+def prefetch():
+    """The fitted models and the statewide history of every measure, as (function, *args) tuples."""
+    yield (dal.fetch_forecast_models,)
+    for measure in dal.FORECAST_MEASURES:
+        yield (dal.fetch_series, 'State', 'Texas', measure)
+
+
+# --------------------------
+# Page 4: Forecast Model
+# --------------------------
+def render():
+    models = dal.fetch_forecast_models()
+
+    st.title("🔮 Predictive Modeling")
+    st.markdown("Trend projections for every county, region and offense category, with 95% prediction intervals.")
+
+    # Every series is fitted in one batch after each ETL run; here we only pick one and project it
+    col1, col2, col3, col4 = st.columns(4)
+    level = col1.selectbox("Level", ['State', 'Region', 'County'])
+    entity = col2.selectbox(level, sorted(models.loc[models['Level'] == level, 'Entity'].unique()))
+    measure = col3.selectbox("Measure", dal.FORECAST_MEASURES)
+    method = col4.selectbox("Method", list(METHOD_LABELS), format_func=METHOD_LABELS.get)
+
+    history = dal.fetch_series(level, entity, measure)
+    forecast = dal.fetch_forecast(level, entity, measure, method, FORECAST_YEARS)
+    if history.empty or forecast.empty:
+        st.warning(f"Not enough history to forecast {measure} for {entity}.")
+        return
+
+    # Connect the lines: the forecast starts from the last historical point
+    last = history.iloc[-1]
+    bridge = pd.DataFrame({'Year': [last['Year']], 'Forecast': [last[measure]],
+                           'Lower': [last[measure]], 'Upper': [last[measure]]})
+    projected = pd.concat([bridge, forecast[['Year', 'Forecast', 'Lower', 'Upper']]], ignore_index=True)
+
+    fig_proj = go.Figure([
+        go.Scatter(x=projected['Year'], y=projected['Upper'], line=dict(width=0), showlegend=False, hoverinfo='skip'),
+        go.Scatter(x=projected['Year'], y=projected['Lower'], line=dict(width=0), fill='tonexty',
+                   fillcolor='rgba(99, 110, 250, 0.2)', name='95% interval'),
+        go.Scatter(x=history['Year'], y=history[measure], mode='lines+markers', name='Historical'),
+        go.Scatter(x=projected['Year'], y=projected['Forecast'], mode='lines+markers', name='Forecast',
+                   line=dict(dash='dash')),
+    ])
+    fig_proj.update_layout(title=f"{entity} {measure.replace('_', ' ')} Forecast "
+                                 f"({int(history['Year'].min())}-{FORECAST_YEARS[-1]})",
+                           xaxis_title='Year', yaxis_title=measure, showlegend=True)
+    st.plotly_chart(fig_proj, use_container_width=True)
+
+    model = models[(models['Level'] == level) & (models['Entity'] == entity) &
+                   (models['Measure'] == measure) & (models['Method'] == method)].iloc[0]
+    change = model['Slope'] if method == 'linear' else model['Trend']
+    direction = 'fewer' if change < 0 else 'more'
+    st.info(f"**Model Insight:** The model projects a continued trend of roughly {abs(change):.0f} {direction} "
+            f"{measure.replace('_', ' ')} per year for {entity}.")
+
+    st.markdown(f"### 📉 Why is the forecast trending {'down' if change < 0 else 'up'}?")
+    with st.expander("Show Model explanation"):
+        if method == 'linear':
+            st.write(f"""
+            The forecast is a **linear regression** of the {int(model['N_Obs'])} historical years. The band is the
+            95% prediction interval, which widens the further the year is from the centre of the data.
+            """)
+        else:
+            st.write(f"""
+            The forecast uses **Holt's linear trend** exponential smoothing (alpha = {model['Alpha']:.2f},
+            beta = {model['Beta']:.2f}, chosen by one-step-ahead error), which weights recent years more heavily.
+            The band widens with the horizon as the smoothed level and trend become less certain.
+            """)
+
+        # Calculate simple stats for explanation
+        start_vol = history.iloc[0][measure]
+        end_vol = history.iloc[-1][measure]
+        pct_change = ((end_vol - start_vol) / start_vol) * 100 if start_vol else 0.0
+        first_year, last_year = int(history['Year'].min()), int(history['Year'].max())
+
+        st.metric(f"Historical Change ({first_year}-{last_year})", f"{pct_change:.1f}%", delta_color="inverse")
+
+        st.write(f"""
+        - **Historical Trend:** From {first_year} to {last_year}, {measure.replace('_', ' ')} changed by **{pct_change:.1f}%**.
+        - **Model Logic:** The model estimates a trend of `{change:.1f}` per year and projects it forward.
+        - **Forecast {FORECAST_YEARS[-1]}:** {forecast.iloc[-1]['Forecast']:,.0f}
+          (95% interval {forecast.iloc[-1]['Lower']:,.0f} to {forecast.iloc[-1]['Upper']:,.0f}).
+        """)
+
+        st.warning("Note: These models assume past trends will continue and do not account for external factors like policy changes or population growth.")
@@ -0,0 +1,81 @@
+import streamlit as st
+import plotly.express as px
+
+import data_access as dal
+
+TREND_SPANS = 6
+
+
+def prefetch():
+    """The reads render() makes, as (function, *args) tuples for the background prefetcher."""
+    yield (dal.fetch_metrics,)
+    yield (dal.fetch_fact_footprint,)
+
+
+# --------------------------
+# Page 6: Performance Metrics
+# --------------------------
+def render():
+    st.title("⏱️ Performance Metrics")
+    st.markdown("Durations, row counts and memory growth of the instrumented ETL stages, "
+                "data quality scans and rules, and dashboard loaders, run over run.")
+
+    metrics = dal.fetch_metrics()
+    if metrics.empty:
+        st.info("No metrics recorded yet. Run the ETL, the checks or a dashboard page "
+                "(recording is on unless `TJJD_METRICS=0`).")
+        return
+
+    c1, c2 = st.columns(2)
+    components = sorted(metrics['Component'].dropna().unique())
+    component = c1.selectbox("Component", components,
+                             index=components.index('etl') if 'etl' in components else 0)
+    run_count = metrics['Run'].nunique()
+    last_runs = c2.slider("Most recent runs", 1, run_count, min(20, run_count)) if run_count > 1 else 1
+
+    scoped = metrics[metrics['Component'] == component]
+    summary = dal.summarize_metrics(scoped, last_runs)
+    runs = scoped.drop_duplicates('Run', keep='last')['Run'].tail(last_runs)
+    scoped = scoped[scoped['Run'].isin(runs)]
+
+    # 1. Duration per run of the slowest spans
+    st.subheader("Duration by Run")
+    spans = st.multiselect("Spans", list(summary['Span']), default=list(summary['Span'].head(TREND_SPANS)))
+    # One point per span and run (loaders called several times in a run are summed)
+    trend = (scoped[scoped['Span'].isin(spans)]
+             .groupby(['Run', 'Span'], as_index=False)
+             .agg(Started_At=('Started_At', 'min'), Seconds=('Seconds', 'sum'), Rows=('Rows', 'sum')))
+    fig_trend = px.line(trend.sort_values('Started_At'), x='Started_At', y='Seconds', color='Span',
+                        markers=True, hover_data=['Run', 'Rows'], template="plotly_white")
+    fig_trend.update_layout(xaxis_title="Run started", yaxis_title="Seconds")
+    st.plotly_chart(fig_trend, use_container_width=True)
+
+    # 2. Where the latest run spent its time and memory
+    latest = scoped[scoped['Run'] == runs.iloc[-1]]
+    st.subheader(f"Latest Run ({latest['Program'].iloc[0]}, {latest['Started_At'].min():%Y-%m-%d %H:%M})")
+    c1, c2 = st.columns(2)
+    with c1:
+        by_span = latest.groupby('Span', as_index=False)['Seconds'].sum().sort_values('Seconds')
+        fig_time = px.bar(by_span, x='Seconds', y='Span', orientation='h', title="Time per span")
+        st.plotly_chart(fig_time, use_container_width=True)
+    with c2:
+        by_memory = latest.groupby('Span', as_index=False)['RSS_Delta_MB'].max().dropna().sort_values('RSS_Delta_MB')
+        fig_memory = px.bar(by_memory, x='RSS_Delta_MB', y='Span', orientation='h',
+                            title="RSS growth per span (MB)")
+        st.plotly_chart(fig_memory, use_container_width=True)
+
+    profiles = latest['Profile'].dropna()
+    if not profiles.empty:
+        st.caption("Profiles (TJJD_PROFILE): " + "; ".join(profiles))
+
+    # 3. Summary table
+    st.subheader("Summary")
+    st.dataframe(summary.round(4), hide_index=True, use_container_width=True)
+
+    # 4. What one copy of the fact view costs each session's cached results
+    st.subheader("In-memory Fact View")
+    footprint = dal.fetch_fact_footprint()
+    total = footprint.iloc[-1]
+    st.caption(f"County/Region as categoricals over Dim_County and downcast counts: "
+               f"{total['Compact_KB']:,.1f} KB instead of {total['Wide_KB']:,.1f} KB as read.")
+    st.dataframe(footprint, hide_index=True, use_container_width=True)
@@ -0,0 +1,75 @@
+import streamlit as st
+import plotly.express as px
+
+import data_access as dal
+
+BUBBLE_COLUMNS = ['County', 'Region', 'Juv_Pop', 'Referral_Rate', 'Total_Referrals']
+
+
+def prefetch():
+    """The queries render() makes for every slider position, as (function, *args) tuples."""
+    yield (dal.fetch_rollup, 'Agg_County_Volatility')
+    for year in dal.fetch_years():
+        yield (dal.fetch_year_rows, year, BUBBLE_COLUMNS)
+        yield (dal.fetch_year_scores, year)
+
+
+# --------------------------
+# Page 2: Risk & Hotspots
+# --------------------------
+def render():
+    st.title("🚨 Strategic Risk Analysis")
+    st.markdown("Identify counties that are statistically anomalous or trending negatively.")
+    
+    # 1. Bubble Chart: volume vs Rate vs Population
+    st.subheader("Outlier Detection: Volume vs. Intensity")
+    year_select = st.select_slider("Select Year", options=dal.fetch_years())
+    
+    bubble_df = dal.fetch_year_rows(year_select, BUBBLE_COLUMNS)
+    # Log scale for pop to make it readable
+    
+    fig_scatter = px.scatter(bubble_df, x="Juv_Pop", y="Referral_Rate",
+                             size="Total_Referrals", color="Region",
+                             hover_name="County", log_x=True,
+                             size_max=60, template="plotly_white",
+                             title=f"Referral Rate vs. Population Size ({year_select})")
+    
+    # Add reference lines
+    avg_rate_yr = bubble_df['Referral_Rate'].mean()
+    fig_scatter.add_hline(y=avg_rate_yr, line_dash="dash", annotation_text="State Avg Rate")
+    
+    st.plotly_chart(fig_scatter, use_container_width=True)
+    
+    # 2. Volatility Analysis
+    st.subheader("High Volatility Counties")
+    st.markdown("Counties with the most drastic year-over-year changes (Potential Stability Issues).")
+    
+    # Scores for every county and year are computed once per data version; the slider only slices them
+    year_scores = dal.fetch_year_scores(year_select)
+    window = st.radio("Volatility window", ["All years", f"Trailing {dal.fetch_risk_scores().window} years"], horizontal=True)
+    if window == "All years":
+        # Volatility (Std Dev of YoY % Change) is precomputed per county by the ETL
+        volatility = dal.fetch_rollup('Agg_County_Volatility')
+        title = "Top 10 Most Volatile Counties (Std Dev of YoY Change)"
+    else:
+        volatility = year_scores.rename(columns={'Rolling_Volatility': 'Volatility_Score'})
+        title = f"Top 10 Most Volatile Counties, {window} to {year_select}"
+    top_volatile = volatility.nlargest(10, 'Volatility_Score')
+    
+    fig_vol = px.bar(top_volatile, x='Volatility_Score', y='County', orientation='h', color='Region',
+                     title=title)
+    st.plotly_chart(fig_vol, use_container_width=True)
+
+    # 3. Anomalies
+    st.subheader(f"Anomalous Changes ({year_select})")
+    st.markdown("Year-over-year changes that are robust outliers (MAD score) against all counties, "
+                "with each county's referral rate compared to its regional peers (z-score).")
+    anomalies = year_scores[year_scores['Outlier']].sort_values('Robust_Z', key=abs, ascending=False)
+    if anomalies.empty:
+        st.success(f"No county shows an outlying change in {year_select}.")
+    else:
+        st.dataframe(
+            anomalies[['County', 'Region', 'Total_Referrals', 'YoY_Change', 'Robust_Z', 'Referral_Rate', 'Region_Z']]
+            .style.format({'YoY_Change': '{:+.0%}', 'Robust_Z': '{:.1f}', 'Referral_Rate': '{:.1f}', 'Region_Z': '{:+.1f}'}),
+            use_container_width=True, hide_index=True
+        )
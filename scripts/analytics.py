@@ -0,0 +1,207 @@
+import warnings
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+# Flag thresholds shared by the Risk & Hotspots page and the DQ rules
+YOY_THRESHOLD = 0.5      # |YoY change| worth investigating
+MIN_PREV_VOLUME = 10     # ignore YoY swings of counties below this prior-year volume
+ROLLING_WINDOW = 3       # years of YoY change in the rolling volatility
+MAD_THRESHOLD = 3.5      # robust z-score above which a change is an outlier
+MAD_SCALE = 0.6745       # makes the MAD-based score comparable to a normal z-score
+
+
+@dataclass
+class CountyYearMatrix:
+    """
+    Long County/Year rows as dense (county, year) arrays, one per measure,
+    with NaN where a county has no row for a year. `rows` holds each input
+    row's (county, year) cell, so per-cell results map straight back onto
+    the rows. Duplicate County/Year rows share one cell (the last one wins).
+    `years` fixes the year axis (sorted, covering every row's year), so a
+    batch of counties lines up with a matrix of the whole table.
+    """
+    keys: np.ndarray
+    years: np.ndarray
+    values: dict
+    rows: tuple
+    regions: np.ndarray = None
+    names: np.ndarray = None
+
+    @classmethod
+    def from_frame(cls, df, measures, key='County', years=None):
+        keys, key_idx = np.unique(df[key].to_numpy(), return_inverse=True)
+        if years is None:
+            years, year_idx = np.unique(df['Year'].to_numpy(), return_inverse=True)
+        else:
+            years = np.asarray(years)
+            year_idx = np.searchsorted(years, df['Year'].to_numpy())
+        values = {}
+        for measure in measures:
+            matrix = np.full((len(keys), len(years)), np.nan)
+            matrix[key_idx, year_idx] = df[measure].to_numpy(dtype=float)
+            values[measure] = matrix
+        first = pd.DataFrame({'idx': key_idx}).drop_duplicates('idx', keep='last')
+        lookup = {}
+        for column in ('Region', 'County'):
+            if column in df and column != key:
+                column_values = np.empty(len(keys), dtype=object)
+                column_values[first['idx'].to_numpy()] = df[column].to_numpy()[first.index.to_numpy()]
+                lookup[column] = column_values
+        return cls(keys, years, values, (key_idx, year_idx), lookup.get('Region'), lookup.get('County'))
+
+    def to_rows(self, matrix):
+        """Per-cell results back in input row order."""
+        return matrix[self.rows]
+
+
+def previous_year(matrix):
+    """Each cell's value for the calendar year before (NaN for the first year or a missing year)."""
+    shifted = np.full_like(matrix, np.nan)
+    shifted[:, 1:] = matrix[:, :-1]
+    return shifted
+
+
+def previous_observed(matrix):
+    """Each cell's most recent earlier non-missing value, skipping gaps (as LAG over a county's rows does)."""
+    idx = np.where(np.isnan(matrix), 0, np.arange(matrix.shape[1]))
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    filled = matrix[np.arange(len(matrix))[:, None], idx]
+    return previous_year(filled)
+
+
+def yoy_change(current, previous):
+    """Relative change; inf for a rise from 0, NaN for 0 -> 0 or a missing side."""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (current - previous) / previous
+
+
+def nan_std(values, axis=-1):
+    """
+    Sample std dev (ddof=1) skipping NaN, NaN with fewer than two values.
+    An infinite value leaves the result undefined (NaN), as pandas does.
+    """
+    valid = ~np.isnan(values)
+    count = valid.sum(axis=axis, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(valid, values, 0).sum(axis=axis, keepdims=True) / count
+        sq = np.where(valid, (values - mean) ** 2, 0).sum(axis=axis, keepdims=True)
+        std = np.sqrt(sq / (count - 1))
+    return np.squeeze(np.where(count >= 2, std, np.nan), axis=axis)
+
+
+def rolling_std(matrix, window=ROLLING_WINDOW):
+    """Std dev over each cell's trailing `window` years (itself included)."""
+    padded = np.concatenate([np.full((len(matrix), window - 1), np.nan), matrix], axis=1)
+    return nan_std(np.lib.stride_tricks.sliding_window_view(padded, window, axis=1))
+
+
+def peer_zscores(matrix, groups):
+    """z-score of every cell against the other counties in its group for the same year."""
+    labels, group_idx = np.unique(groups.astype(str), return_inverse=True)
+    one_hot = np.zeros((len(groups), len(labels)))
+    one_hot[np.arange(len(groups)), group_idx] = 1
+    valid = ~np.isnan(matrix)
+    x = np.where(valid, matrix, 0)
+    count = one_hot.T @ valid
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = (one_hot.T @ x) / count
+        sq = one_hot.T @ np.where(valid, (matrix - mean[group_idx]) ** 2, 0)
+        std = np.sqrt(sq / (count - 1))
+        z = (matrix - mean[group_idx]) / std[group_idx]
+    return np.where(std[group_idx] > 0, z, np.nan)
+
+
+def robust_zscores(matrix, eligible=None):
+    """
+    MAD-based z-score of every cell against all counties for the same year.
+    Only `eligible` cells (finite ones by default) set the median and MAD.
+    """
+    eligible = np.isfinite(matrix) if eligible is None else eligible & np.isfinite(matrix)
+    sample = np.where(eligible, matrix, np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+        # Years where no county is eligible have no median
+        warnings.simplefilter('ignore', RuntimeWarning)
+        median = np.nanmedian(sample, axis=0)
+        mad = np.nanmedian(np.abs(sample - median), axis=0)
+        z = MAD_SCALE * (matrix - median) / mad
+    return np.where(eligible & (mad > 0), z, np.nan)
+
+
+def yoy_flags(matrix, threshold=YOY_THRESHOLD, min_prev=MIN_PREV_VOLUME):
+    """Cells whose change from the previous observed year exceeds `threshold`, on a prior volume above `min_prev`."""
+    previous = previous_observed(matrix)
+    with np.errstate(invalid='ignore'):
+        return (np.abs(yoy_change(matrix, previous)) > threshold) & (previous > min_prev)
+
+
+@dataclass
+class RiskScores:
+    """
+    Every score of every county for every year, computed once from the
+    County x Year matrix; year_frame() and volatility_frame() only slice it.
+    """
+    matrix: CountyYearMatrix
+    yoy: np.ndarray
+    volatility: np.ndarray
+    rolling_volatility: np.ndarray
+    region_z: np.ndarray
+    robust_z: np.ndarray
+    outlier: np.ndarray
+    window: int = ROLLING_WINDOW
+    _year_pos: dict = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._year_pos = {int(year): i for i, year in enumerate(self.matrix.years)}
+
+    def _counties(self):
+        return pd.DataFrame({'CountyID': self.matrix.keys, 'County': self.matrix.names, 'Region': self.matrix.regions})
+
+    def year_frame(self, year):
+        """One row per county for `year`: volume, rate, YoY change and every score."""
+        i = self._year_pos[int(year)]
+        frame = self._counties()
+        for measure, matrix in self.matrix.values.items():
+            frame[measure] = matrix[:, i]
+        frame['YoY_Change'] = self.yoy[:, i]
+        frame['Rolling_Volatility'] = self.rolling_volatility[:, i]
+        frame['Region_Z'] = self.region_z[:, i]
+        frame['Robust_Z'] = self.robust_z[:, i]
+        frame['Outlier'] = self.outlier[:, i]
+        # Counties without a row that year are left out
+        return frame[~np.isnan(self.matrix.values['Total_Referrals'][:, i])].reset_index(drop=True)
+
+    def volatility_frame(self):
+        """Std dev of each county's YoY % change over all years (Agg_County_Volatility's score)."""
+        return self._counties().assign(Volatility_Score=self.volatility)
+
+
+def risk_scores(df, window=ROLLING_WINDOW):
+    """
+    Score long County/Year rows (CountyID, County, Region, Year,
+    Total_Referrals, Referral_Rate) in one pass over the dense matrix:
+
+    - YoY_Change: % change in Total_Referrals vs the previous year
+    - Volatility / Rolling_Volatility: std dev of YoY change, all years / trailing `window`
+    - Region_Z: Referral_Rate z-score against the county's regional peers that year
+    - Robust_Z / Outlier: MAD-based score of YoY change against all counties that
+      year (prior volume above MIN_PREV_VOLUME), flagged above MAD_THRESHOLD
+    """
+    matrix = CountyYearMatrix.from_frame(df, ['Total_Referrals', 'Referral_Rate'], key='CountyID')
+    volume = matrix.values['Total_Referrals']
+    previous = previous_year(volume)
+    yoy = yoy_change(volume, previous)
+    with np.errstate(invalid='ignore'):
+        robust_z = robust_zscores(yoy, eligible=previous > MIN_PREV_VOLUME)
+        outlier = np.abs(robust_z) > MAD_THRESHOLD
+    return RiskScores(
+        matrix=matrix,
+        yoy=yoy,
+        volatility=nan_std(yoy, axis=1),
+        rolling_volatility=rolling_std(yoy, window),
+        region_z=peer_zscores(matrix.values['Referral_Rate'], matrix.regions),
+        robust_z=robust_z,
+        outlier=outlier,
+        window=window,
+    )
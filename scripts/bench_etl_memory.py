@@ -0,0 +1,75 @@
+import pandas as pd
+import subprocess
+import tempfile
+import argparse
+import json
+import time
+import sys
+import os
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPTS_DIR)
+
+from etl_pipeline import SOURCE_CSV
+
+# Run each load in a fresh interpreter so ru_maxrss is the peak of that load alone
+CHILD_CODE = """
+import json, sys
+sys.path.insert(0, {scripts!r})
+import etl_stream
+stats = etl_stream.etl_stream({source!r}, {db!r}, {budget})
+print('RESULT ' + json.dumps(stats))
+"""
+
+
+def write_scaled_extract(path, scale):
+    """Replicate the TJJD extract `scale` times under renamed counties, one replica at a time."""
+    base = pd.read_csv(SOURCE_CSV)
+    for k in range(scale):
+        replica = base.copy()
+        if k:
+            replica['County'] = replica['County'] + f"_{k}"
+        replica.to_csv(path, mode='a' if k else 'w', header=(k == 0), index=False)
+    return len(base) * scale
+
+
+def run_load(source, db_path, budget):
+    code = CHILD_CODE.format(scripts=SCRIPTS_DIR, source=source, db=db_path, budget=budget)
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    elapsed = time.perf_counter() - start
+    stats = json.loads(next(line for line in out.splitlines() if line.startswith('RESULT '))[7:])
+    stats['seconds'] = elapsed
+    return stats
+
+
+def bench(scales, budget):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in scales:
+            source = os.path.join(tmp, f"referrals_x{scale}.csv")
+            db_path = os.path.join(tmp, f"bench_x{scale}.db")
+            rows = write_scaled_extract(source, scale)
+            stats = run_load(source, db_path, budget)
+            results.append({
+                'Scale': scale,
+                'Rows': rows,
+                'CSV_MB': round(os.path.getsize(source) / (1024 * 1024), 1),
+                'Peak_RSS_MB': round(stats['peak_rss_mb'], 1),
+                'Seconds': round(stats['seconds'], 2),
+                'Rows_Per_Sec': int(rows / stats['seconds']),
+            })
+            os.remove(source)
+            os.remove(db_path)
+    return pd.DataFrame(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show that streaming ETL memory stays flat as the input grows.")
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--memory-budget-mb', type=int, default=256)
+    args = parser.parse_args()
+
+    print(f"Streaming ETL memory benchmark (budget {args.memory_budget_mb} MB)")
+    report = bench(args.scales, args.memory_budget_mb)
+    print(report.to_string(index=False))
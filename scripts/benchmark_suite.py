@@ -0,0 +1,281 @@
+import pandas as pd
+import subprocess
+import tempfile
+import argparse
+import platform
+import json
+import time
+import sys
+import os
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SCRIPTS_DIR)
+DASHBOARD_DIR = os.path.join(ROOT_DIR, 'dashboard')
+sys.path.insert(0, SCRIPTS_DIR)
+
+RESULTS_PATH = os.path.join('docs', 'benchmark_results.json')
+BASELINE_PATH = os.path.join('docs', 'benchmark_baseline.json')
+
+# Stages in pipeline order; each one reads what the previous ones wrote
+STAGES = ['generate', 'create_db', 'etl', 'checks', 'dashboard']
+# Volume of the shipped data at scale 1
+BASE_CLIENTS = 500
+BASE_EVENTS = 800
+# Metrics compared against the baseline, and how much worse they may get
+COMPARED_METRICS = ['Seconds', 'Peak_RSS_MB']
+DEFAULT_TOLERANCE = 0.25
+
+# Each stage runs in a fresh interpreter so ru_maxrss and /proc/self/io
+# cover that stage alone
+CHILD_CODE = """
+import json, sys
+sys.path.insert(0, {scripts!r})
+import benchmark_suite
+stats = benchmark_suite.run_stage({stage!r}, {scale}, {workdir!r}, {bulk})
+print('RESULT ' + json.dumps(stats))
+"""
+
+
+def io_counters():
+    """
+    Bytes moved by this process (Linux /proc/self/io). rchar/wchar count every
+    read()/write() syscall, which is where SQLite's page reads and writes go;
+    read_bytes/write_bytes are what actually reached the block device.
+    """
+    try:
+        with open('/proc/self/io') as f:
+            return {key: int(value) for key, value in (line.split(': ') for line in f.read().splitlines())}
+    except OSError:
+        return {}
+
+
+def sqlite_page_size(db_path):
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("PRAGMA page_size").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _stage_paths(workdir):
+    return {
+        'data_dir': os.path.join(workdir, 'data'),
+        'db': os.path.join(workdir, 'bench.db'),
+        'source': os.path.join(workdir, 'referrals.csv'),
+        'docs': os.path.join(workdir, 'docs'),
+        'snapshot': os.path.join(workdir, 'snapshots', 'fact_view.arrow'),
+        'columnar': os.path.join(workdir, 'columnar'),
+    }
+
+
+def _child_env(workdir):
+    """
+    Environment of a stage's interpreter. It runs in the repo (for data/ and
+    the scripts), so every default output path is pointed into the scratch
+    directory instead: metrics, profiles, the fact snapshot, the columnar store.
+    """
+    paths = _stage_paths(workdir)
+    return dict(os.environ,
+                TJJD_METRICS_PATH=os.path.join(paths['docs'], 'metrics.jsonl'),
+                TJJD_PROFILE_DIR=os.path.join(paths['docs'], 'profiles'),
+                TJJD_SNAPSHOT_PATH=paths['snapshot'],
+                TJJD_COLUMNAR_DIR=paths['columnar'])
+
+
+def _generate(scale, paths, bulk):
+    import generate_data
+    totals = generate_data.generate_data_scaled(BASE_CLIENTS * scale, BASE_EVENTS * scale,
+                                                output_dir=paths['data_dir'])
+    return sum(totals.values())
+
+
+def _create_db(scale, paths, bulk):
+    import create_db
+    if bulk:
+        return create_db.bulk_load_database(paths['db'], paths['data_dir'])[0]
+    create_db.create_database(paths['db'], paths['data_dir'])
+    return _table_rows(paths['db'], ['Programs', 'Clients', 'Events'])
+
+
+def _etl(scale, paths, bulk):
+    import etl_pipeline
+    etl_pipeline.etl_process(paths['source'], paths['db'])
+    return _table_rows(paths['db'], ['Fact_Referrals'])
+
+
+def _checks(scale, paths, bulk):
+    import run_checks
+    run_checks.run_checks(paths['db'], output_dir=paths['docs'])
+    return _table_rows(paths['db'], ['Fact_Referrals', 'Programs', 'Clients', 'Events'])
+
+
+def _dashboard(scale, paths, bulk):
+    """Every query the app_v2 pages make, for every year option, uncached."""
+    sys.path.insert(0, DASHBOARD_DIR)
+    import data_access as dal
+    dal.DB_PATH = paths['db']
+    dal.SNAPSHOT_PATH = paths['snapshot']
+    dal.COLUMNAR_DIR = paths['columnar']
+    frames = [dal.fetch_rollup(table) for table in dal.ROLLUP_TABLES]
+    rows = sum(len(df) for df in frames) + 1
+    dal.fetch_record_count()
+    for year in dal.fetch_years():
+        rows += len(dal.fetch_top_n(year, 'Total_Referrals', 10, ['County', 'Total_Referrals', 'Referral_Rate']))
+        rows += len(dal.fetch_top_n(year, 'Referral_Rate', 10, ['County', 'Referral_Rate']))
+        rows += len(dal.fetch_year_rows(year, ['County', 'Region', 'Juv_Pop', 'Referral_Rate', 'Total_Referrals']))
+    rows += len(dal.fetch_offense_mismatches(['Year', 'County', 'Total_Referrals', 'Violent_Felony', 'Misd']))
+    return rows
+
+
+STAGE_FUNCTIONS = {
+    'generate': _generate,
+    'create_db': _create_db,
+    'etl': _etl,
+    'checks': _checks,
+    'dashboard': _dashboard,
+}
+
+
+def _table_rows(db_path, tables):
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    try:
+        return sum(conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in tables)
+    finally:
+        conn.close()
+
+
+def run_stage(stage, scale, workdir, bulk=False):
+    """Child side: run one stage and report its wall time, I/O and peak RSS."""
+    import resource
+    paths = _stage_paths(workdir)
+    # Stage output goes to stderr so stdout only carries the RESULT line
+    stdout, sys.stdout = sys.stdout, sys.stderr
+    try:
+        io_before = io_counters()
+        start = time.perf_counter()
+        rows = STAGE_FUNCTIONS[stage](scale, paths, bulk)
+        elapsed = time.perf_counter() - start
+        io_after = io_counters()
+    finally:
+        sys.stdout = stdout
+
+    io_delta = {key: io_after.get(key, 0) - io_before.get(key, 0) for key in io_after}
+    page_size = sqlite_page_size(paths['db']) if os.path.exists(paths['db']) else 4096
+    return {
+        'rows': rows,
+        'seconds': elapsed,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'read_bytes': io_delta.get('rchar', 0),
+        'write_bytes': io_delta.get('wchar', 0),
+        'disk_read_bytes': io_delta.get('read_bytes', 0),
+        'disk_write_bytes': io_delta.get('write_bytes', 0),
+        'page_size': page_size,
+    }
+
+
+def _run_child(stage, scale, workdir, bulk):
+    code = CHILD_CODE.format(scripts=SCRIPTS_DIR, stage=stage, scale=scale, workdir=workdir, bulk=bulk)
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                         cwd=ROOT_DIR, env=_child_env(workdir)).stdout
+    return json.loads(next(line for line in out.splitlines() if line.startswith('RESULT '))[7:])
+
+
+def bench(scales, stages=STAGES, bulk=False):
+    """Run the pipeline stages at each scale in a scratch directory, one child interpreter per stage."""
+    from bench_etl_memory import write_scaled_extract
+
+    # Earlier stages are prerequisites of later ones: run them all, report the selected ones
+    pipeline = STAGES[:max(STAGES.index(stage) for stage in stages) + 1]
+    results = []
+    for scale in scales:
+        with tempfile.TemporaryDirectory() as workdir:
+            # The referral extract is an input, not a measured stage
+            write_scaled_extract(_stage_paths(workdir)['source'], scale)
+            for stage in pipeline:
+                stats = _run_child(stage, scale, workdir, bulk)
+                if stage not in stages:
+                    continue
+                mb = 1024 * 1024
+                results.append({
+                    'Stage': stage,
+                    'Scale': scale,
+                    'Rows': stats['rows'],
+                    'Seconds': round(stats['seconds'], 3),
+                    'Rows_Per_Sec': int(stats['rows'] / max(stats['seconds'], 1e-9)),
+                    'Peak_RSS_MB': round(stats['peak_rss_mb'], 1),
+                    'Read_MB': round(stats['read_bytes'] / mb, 1),
+                    'Write_MB': round(stats['write_bytes'] / mb, 1),
+                    'Disk_Read_MB': round(stats['disk_read_bytes'] / mb, 1),
+                    'Disk_Write_MB': round(stats['disk_write_bytes'] / mb, 1),
+                    'Pages_Read': stats['read_bytes'] // stats['page_size'],
+                    'Pages_Written': stats['write_bytes'] // stats['page_size'],
+                })
+                print(f"  {stage:<10} x{scale:<5} {stats['seconds']:8.2f}s  {stats['peak_rss_mb']:7.1f} MB")
+    return pd.DataFrame(results)
+
+
+def write_results(report, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    payload = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'results': report.to_dict(orient='records'),
+    }
+    with open(path, 'w') as f:
+        json.dump(payload, f, indent=2)
+
+
+def load_results(path):
+    with open(path) as f:
+        return pd.DataFrame(json.load(f)['results'])
+
+
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Stage/scale pairs present in both runs, with the ratio current/baseline
+    of each compared metric. A ratio above 1 + tolerance is a regression.
+    """
+    merged = report.merge(baseline, on=['Stage', 'Scale'], suffixes=('', '_Baseline'))
+    columns = ['Stage', 'Scale']
+    merged['Regression'] = False
+    for metric in COMPARED_METRICS:
+        ratio = merged[metric] / merged[f'{metric}_Baseline'].where(merged[f'{metric}_Baseline'] > 0)
+        merged[f'{metric}_Ratio'] = ratio.round(2)
+        merged['Regression'] |= ratio > 1 + tolerance
+        columns += [f'{metric}_Baseline', metric, f'{metric}_Ratio']
+    return merged[columns + ['Regression']]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark generation, DB creation, ETL, checks and dashboard queries.")
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10],
+                        help="Multiples of the shipped data volume (e.g. 1 10 100 1000).")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--bulk', action='store_true', help="Use create_db.py's bulk loader for the create_db stage.")
+    parser.add_argument('--output', default=RESULTS_PATH)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help="Store this run as the new baseline.")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown/memory growth vs the baseline before a stage counts as a regression.")
+    args = parser.parse_args()
+
+    print(f"Benchmarking {', '.join(args.stages)} at scales {args.scales}...")
+    report = bench(args.scales, args.stages, args.bulk)
+    print(report.to_string(index=False))
+    write_results(report, args.output)
+    print(f"\nResults saved to {args.output}")
+
+    if args.save_baseline:
+        write_results(report, args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        comparison = compare(report, load_results(args.baseline), args.tolerance)
+        print("\nComparison with baseline:")
+        print(comparison.to_string(index=False))
+        if comparison['Regression'].any():
+            print(f"\n{int(comparison['Regression'].sum())} stage(s) regressed by more than {args.tolerance:.0%}.")
+            sys.exit(1)
@@ -0,0 +1,192 @@
+import json
+import os
+import shutil
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs
+
+import database
+
+STORE_DIR = os.path.join('data', 'columnar')
+DB_PATH = 'juvenile_justice.db'
+FORMATS = ['parquet', 'arrow']
+MANIFEST = 'manifest.json'
+EXPORT_CHUNK_ROWS = 250_000
+
+# Column types of the star schema (INTEGER -> int64, REAL -> float64, TEXT -> string),
+# declared up front so every exported chunk has the same schema.
+_INT = pa.int64()
+SCHEMAS = {
+    'Dim_Time': pa.schema([('Year', _INT), ('YearID', _INT)]),
+    'Dim_County': pa.schema([('County', pa.string()), ('Region', pa.string()), ('State', pa.string()),
+                             ('CountyID', _INT)]),
+    # Year is carried on the facts as the partition column
+    'Fact_Referrals': pa.schema(
+        [('CountyID', _INT), ('YearID', _INT), ('Juv_Pop', _INT), ('Violent_Felony', _INT),
+         ('Other_Felony', _INT), ('Misd', _INT), ('VOP', _INT), ('Status_Offense', _INT), ('CINS', _INT),
+         ('Total_Referrals', _INT), ('Referral_Rate', pa.float64()), ('Unique_Youth', _INT), ('Year', _INT)]
+    ),
+}
+EXPORT_SQL = {
+    'Dim_Time': "SELECT Year, YearID FROM Dim_Time",
+    'Dim_County': "SELECT County, Region, State, CountyID FROM Dim_County",
+    'Fact_Referrals': """
+        SELECT f.*, t.Year FROM Fact_Referrals f
+        JOIN Dim_Time t ON f.YearID = t.YearID
+        ORDER BY t.Year, f.CountyID
+    """,
+}
+# The small dashboard rollups travel with the star schema so the dashboard can run off the store alone
+ROLLUP_TABLES = ['Agg_State_Year', 'Agg_Region_Year', 'Agg_County_Volatility']
+PARTITIONED_TABLES = {'Fact_Referrals': ['Year']}
+
+
+def _file_format(fmt):
+    # Arrow IPC files are written uncompressed so readers can memory-map them without a decode step
+    return ds.IpcFileFormat() if fmt == 'arrow' else ds.ParquetFileFormat()
+
+
+def _batches(conn, table, chunk_rows):
+    schema = SCHEMAS.get(table)
+    for chunk in pd.read_sql(EXPORT_SQL.get(table, f"SELECT * FROM {table}"), conn, chunksize=chunk_rows):
+        yield pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False)
+
+
+def _write_table(conn, table, path, fmt, chunk_rows):
+    """
+    Stream one table out of SQLite chunk by chunk, one file per chunk (and
+    Year partition, for the facts), so memory stays bounded by a chunk.
+    Chunks are written from this thread: the SQLite cursor cannot be handed
+    to Arrow's writer threads.
+    """
+    partition_columns = PARTITIONED_TABLES.get(table)
+    rows = 0
+    chunk = -1
+    for chunk, batch in enumerate(_batches(conn, table, chunk_rows)):
+        rows += batch.num_rows
+        ds.write_dataset(
+            batch, path, format=_file_format(fmt), basename_template=f"part-{chunk:05d}-{{i}}.{fmt}",
+            partitioning=partition_columns, partitioning_flavor='hive' if partition_columns else None,
+            existing_data_behavior='overwrite_or_ignore',
+        )
+    if chunk < 0 and table in SCHEMAS:
+        # Keep empty tables readable
+        ds.write_dataset(pa.table({name: [] for name in SCHEMAS[table].names}, schema=SCHEMAS[table]), path,
+                         format=_file_format(fmt), existing_data_behavior='overwrite_or_ignore')
+    return rows
+
+
+def _table_exists(conn, table):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone() is not None
+
+
+def export_star_schema(db_path=DB_PATH, store_dir=STORE_DIR, fmt='parquet', chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Write Dim_Time, Dim_County, Fact_Referrals (partitioned by Year) and the
+    rollup tables as Parquet or Arrow IPC datasets, streamed from SQLite in
+    chunks. The store is written next to the old one and swapped in, so
+    readers never see a half-written store; manifest.json records the
+    format, the ETL run it was exported from and the row counts.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown columnar format: {fmt}")
+    print(f"Exporting star schema to {store_dir} ({fmt})...")
+
+    staging_dir = store_dir.rstrip(os.sep) + '.tmp'
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(staging_dir)
+
+    with database.read_connection(db_path) as conn:
+        tables = ['Dim_Time', 'Dim_County', 'Fact_Referrals'] + [t for t in ROLLUP_TABLES if _table_exists(conn, t)]
+        row_counts = {table: _write_table(conn, table, os.path.join(staging_dir, table), fmt, chunk_rows)
+                      for table in tables}
+        run = conn.execute("SELECT MAX(RunID) FROM ETL_Runs").fetchone() if _table_exists(conn, 'ETL_Runs') else None
+
+    with open(os.path.join(staging_dir, MANIFEST), 'w') as f:
+        json.dump({
+            'format': fmt,
+            'run_id': run[0] if run else None,
+            'exported_at': datetime.now().isoformat(timespec='seconds'),
+            'tables': row_counts,
+        }, f, indent=2)
+
+    shutil.rmtree(store_dir, ignore_errors=True)
+    os.replace(staging_dir, store_dir)
+    print(f"Exported {row_counts['Fact_Referrals']:,} facts in {len(row_counts)} tables.")
+    return row_counts
+
+
+def read_manifest(store_dir=STORE_DIR):
+    with open(os.path.join(store_dir, MANIFEST)) as f:
+        return json.load(f)
+
+
+def store_exists(store_dir=STORE_DIR):
+    return os.path.exists(os.path.join(store_dir, MANIFEST))
+
+
+def dataset(table, store_dir=STORE_DIR):
+    """
+    A lazy dataset over one exported table. Arrow IPC files are opened
+    through a memory-mapping filesystem, so reads are zero-copy views of the
+    page cache.
+    """
+    manifest = read_manifest(store_dir)
+    partition_columns = PARTITIONED_TABLES.get(table)
+    return ds.dataset(
+        os.path.join(store_dir, table), format=_file_format(manifest['format']),
+        partitioning=ds.partitioning(pa.schema([SCHEMAS[table].field(c) for c in partition_columns]), flavor='hive')
+        if partition_columns else None,
+        filesystem=pyarrow.fs.LocalFileSystem(use_mmap=(manifest['format'] == 'arrow')),
+    )
+
+
+def read_table(table, columns=None, years=None, store_dir=STORE_DIR):
+    """
+    One table as an Arrow Table, reading only `columns`; for the facts,
+    `years` prunes whole Year partitions before any file is opened.
+    """
+    filter_expr = None
+    if years is not None:
+        filter_expr = pc.field('Year').isin([int(y) for y in years])
+    return dataset(table, store_dir).to_table(columns=columns, filter=filter_expr)
+
+
+def _view_columns(columns):
+    """Fact view `columns` as (Fact_Referrals columns, Dim_County columns), with CountyID to join them."""
+    dim_columns = [c for c in columns if c in ('County', 'Region')]
+    fact_columns = [c for c in columns if c not in dim_columns]
+    if dim_columns and 'CountyID' not in fact_columns:
+        fact_columns.append('CountyID')
+    return fact_columns, dim_columns
+
+
+def fact_view_table(columns, years=None, store_dir=STORE_DIR):
+    """
+    read_fact_view as an Arrow Table, for callers that aggregate it before
+    converting (rows come in no particular order).
+    """
+    fact_columns, dim_columns = _view_columns(columns)
+    facts = read_table('Fact_Referrals', fact_columns, years, store_dir)
+    if dim_columns:
+        counties = read_table('Dim_County', ['CountyID'] + dim_columns, store_dir=store_dir)
+        facts = facts.join(counties, 'CountyID', join_type='left outer')
+    return facts.select(list(columns))
+
+
+def read_fact_view(columns, years=None, store_dir=STORE_DIR):
+    """
+    The joined County/Year fact view (Fact_Referrals + County/Region/Year)
+    as a DataFrame, projected to `columns` and pruned to `years`. County
+    and Region come from Dim_County; everything else from the fact files.
+    """
+    fact_columns, dim_columns = _view_columns(columns)
+    facts = read_table('Fact_Referrals', fact_columns, years, store_dir).to_pandas()
+    if dim_columns:
+        counties = read_table('Dim_County', ['CountyID'] + dim_columns, store_dir=store_dir).to_pandas()
+        facts = facts.merge(counties, on='CountyID', how='left')
+    return facts[list(columns)]
@@ -0,0 +1,110 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import database
+from fact_snapshot import VIEW_SQL
+
+DB_PATH = 'juvenile_justice.db'
+
+# The in-memory format of the joined County/Year fact view shared by the
+# dashboard and the DQ checks. County and Region are categoricals whose
+# categories are the Dim_County members (sorted, so ordering and comparisons
+# behave as on the strings), every count is the smallest integer type that
+# holds its values, and Year/CountyID/YearID are small integers. Columns
+# with missing values become nullable integers (Int8 ... Int64).
+CATEGORY_COLUMNS = ['County', 'Region']
+KEY_COLUMNS = ['CountyID', 'YearID', 'Year']
+COUNT_COLUMNS = ['Juv_Pop', 'Violent_Felony', 'Other_Felony', 'Misd', 'VOP', 'Status_Offense', 'CINS',
+                 'Total_Referrals', 'Unique_Youth']
+INT_TYPES = [np.int8, np.int16, np.int32, np.int64]
+
+
+def read_dim_county(conn):
+    return pd.read_sql("SELECT CountyID, County, Region FROM Dim_County", conn)
+
+
+def category_types(dim_county):
+    """County and Region categorical dtypes built from the Dim_County table."""
+    return {column: pd.CategoricalDtype(sorted(dim_county[column].dropna().unique()))
+            for column in CATEGORY_COLUMNS}
+
+
+def smallest_int(values):
+    """
+    The smallest integer dtype holding every value of `values` (a nullable
+    one if any are missing), or None if they are not whole numbers.
+    """
+    known = values.dropna()
+    if not pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+        return None
+    if known.empty:
+        return pd.Int8Dtype() if len(values) else np.dtype(np.int8)
+    if pd.api.types.is_float_dtype(known) and not (known == np.floor(known)).all():
+        return None
+    low, high = known.min(), known.max()
+    for int_type in INT_TYPES:
+        info = np.iinfo(int_type)
+        if info.min <= low and high <= info.max:
+            if len(known) < len(values):
+                return pd.api.types.pandas_dtype(np.dtype(int_type).name.capitalize())
+            return np.dtype(int_type)
+    return None
+
+
+def compact_fact_view(df, dim_county=None):
+    """
+    A compact copy of fact view rows (any subset of its columns). Without
+    `dim_county` the categories are the values present in `df`. Other
+    columns (Referral_Rate, computed scores) are left as they are.
+
+    Sums over the downcast columns (`sum`, `groupby().sum()`) widen to int64
+    by themselves; element-wise arithmetic such as `a + b` does not, so cast
+    first where a result could exceed the column type.
+    """
+    compact = df.copy()
+    types = category_types(dim_county if dim_county is not None else df)
+    for column in CATEGORY_COLUMNS:
+        if column in compact.columns:
+            compact[column] = compact[column].astype(types[column])
+    for column in KEY_COLUMNS + COUNT_COLUMNS:
+        if column in compact.columns:
+            int_type = smallest_int(compact[column])
+            if int_type is not None:
+                compact[column] = compact[column].astype(int_type)
+    return compact
+
+
+def footprint(df):
+    """Bytes held by a frame, counting the strings of object columns."""
+    return int(df.memory_usage(deep=True, index=False).sum())
+
+
+def footprint_report(wide, compact):
+    """Per-column dtype and kilobytes before and after compaction, with a Total row."""
+    report = pd.DataFrame({
+        'Column': list(wide.columns),
+        'Wide_Type': [str(dtype) for dtype in wide.dtypes],
+        'Compact_Type': [str(dtype) for dtype in compact.dtypes],
+        'Wide_KB': wide.memory_usage(deep=True, index=False).to_numpy() / 1024,
+        'Compact_KB': compact.memory_usage(deep=True, index=False).to_numpy() / 1024,
+    })
+    total = pd.DataFrame([{'Column': 'Total', 'Wide_Type': '', 'Compact_Type': '',
+                           'Wide_KB': report['Wide_KB'].sum(), 'Compact_KB': report['Compact_KB'].sum()}])
+    return pd.concat([report, total], ignore_index=True).round(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the memory footprint of the fact view as read "
+                                                 "from SQLite with its compact in-memory form.")
+    parser.add_argument('--db', default=DB_PATH)
+    args = parser.parse_args()
+
+    with database.read_connection(args.db) as conn:
+        wide = pd.read_sql(VIEW_SQL, conn)
+        dim_county = read_dim_county(conn)
+    compact = compact_fact_view(wide, dim_county)
+    print(footprint_report(wide, compact).to_string(index=False))
+    print(f"\n{len(wide):,} rows: {footprint(wide) / 1024:,.1f} KB as read, {footprint(compact) / 1024:,.1f} KB compact "
+          f"({footprint(compact) / max(footprint(wide), 1):.1%}).")
@@ -1,31 +1,76 @@
-import sqlite3
 import pandas as pd
 import os
 import traceback
+import csv
+import glob
+import time
+import argparse
 
-def create_database():
+import database
+import instrumentation
+
+DB_PATH = 'juvenile_justice.db'
+DATA_DIR = 'data'
+
+TABLE_DDL = {
+    'Programs': "CREATE TABLE Programs (ProgramID TEXT PRIMARY KEY, ProgramName TEXT, ProgramType TEXT, Capacity INTEGER)",
+    'Clients': "CREATE TABLE Clients (ClientID TEXT, LastName TEXT, FirstName TEXT, Gender TEXT, Race TEXT, DOB TEXT)",
+    'Events': "CREATE TABLE Events (EventID TEXT PRIMARY KEY, ClientID TEXT, ProgramID TEXT, StartDate TEXT, Status TEXT, EndDate TEXT)",
+}
+TABLE_FILES = {'Programs': 'programs.csv', 'Clients': 'clients.csv', 'Events': 'events.csv'}
+
+# Secondary indexes, built by the bulk loader once the data is in
+BULK_INDEXES = [
+    "CREATE INDEX idx_clients_client ON Clients(ClientID)",
+    "CREATE INDEX idx_events_client ON Events(ClientID)",
+    "CREATE INDEX idx_events_program ON Events(ProgramID)",
+]
+
+# Load-time PRAGMAs: WAL so readers are not blocked, no fsync while loading,
+# a 256 MB page cache and in-memory temp storage for the index sorts.
+LOAD_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=OFF",
+    "PRAGMA cache_size=-262144",
+    "PRAGMA temp_store=MEMORY",
+]
+
+
+def table_sources(data_dir, file_name):
+    """
+    The CSV file(s) of one table: data_dir/clients.csv, or the shard files
+    data_dir/clients/part-*.csv written by generate_data.py's scalable mode.
+    """
+    shard_dir = os.path.join(data_dir, os.path.splitext(file_name)[0])
+    if os.path.isdir(shard_dir):
+        return sorted(glob.glob(os.path.join(shard_dir, 'part-*.csv')))
+    return [os.path.join(data_dir, file_name)]
+
+
+def read_table_csv(data_dir, file_name):
+    return pd.concat([pd.read_csv(path) for path in table_sources(data_dir, file_name)], ignore_index=True)
+
+
+@instrumentation.timed('create_db.load')
+def create_database(db_path=DB_PATH, data_dir=DATA_DIR):
     print("Creating SQLite database (DEBUG VERSION)...")
     
-    db_path = 'juvenile_justice.db'
-    if os.path.exists(db_path):
-        os.remove(db_path)
+    database.remove_database(db_path)
     
-    conn = sqlite3.connect(db_path)
+    conn = database.connect(db_path)
     cursor = conn.cursor()
     
     try:
         # Create Tables
-        cursor.execute("CREATE TABLE Programs (ProgramID TEXT PRIMARY KEY, ProgramName TEXT, ProgramType TEXT, Capacity INTEGER)")
-        cursor.execute("CREATE TABLE Clients (ClientID TEXT, LastName TEXT, FirstName TEXT, Gender TEXT, Race TEXT, DOB TEXT)")
-        cursor.execute("CREATE TABLE Events (EventID TEXT PRIMARY KEY, ClientID TEXT, ProgramID TEXT, StartDate TEXT, Status TEXT, EndDate TEXT)")
+        for ddl in TABLE_DDL.values():
+            cursor.execute(ddl)
         
         print("Tables created.")
         
-        data_dir = 'data'
-        
+
         # Programs
         try:
-            programs_df = pd.read_csv(os.path.join(data_dir, 'programs.csv'))
+            programs_df = read_table_csv(data_dir, 'programs.csv')
             programs_df.to_sql('Programs', conn, if_exists='append', index=False)
             print(f"Programs: Imported {len(programs_df)}")
         except Exception as e:
@@ -34,7 +79,7 @@ def create_database():
 
         # Clients
         try:
-            clients_df = pd.read_csv(os.path.join(data_dir, 'clients.csv'))
+            clients_df = read_table_csv(data_dir, 'clients.csv')
             clients_df.to_sql('Clients', conn, if_exists='append', index=False)
             print(f"Clients: Imported {len(clients_df)}")
         except Exception as e:
@@ -43,7 +88,7 @@ def create_database():
 
         # Events
         try:
-            events_df = pd.read_csv(os.path.join(data_dir, 'events.csv'))
+            events_df = read_table_csv(data_dir, 'events.csv')
             # Force EndDate to string to avoid mixed type issues if any, or NaN issues?
             # Pandas handles NaNs as NULLs in SQL usually.
             events_df.to_sql('Events', conn, if_exists='append', index=False)
@@ -59,5 +104,103 @@ def create_database():
         conn.close()
         print(f"Database closed. Path: {os.path.abspath(db_path)}")
 
+
+def bulk_load_table(conn, table, csv_path):
+    """
+    Stream one CSV into its table with a single prepared executemany inside one
+    transaction. Rows go from csv.reader to SQLite untouched; NULLIF turns
+    empty fields into NULL (what to_sql does with NaN) inside SQLite.
+    """
+    start = time.perf_counter()
+    with open(csv_path, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        placeholders = ", ".join(["NULLIF(?, '')"] * len(header))
+        insert = f"INSERT INTO {table} ({', '.join(header)}) VALUES ({placeholders})"
+        conn.execute("BEGIN")
+        try:
+            rows = conn.executemany(insert, reader).rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    elapsed = time.perf_counter() - start
+    return rows, elapsed
+
+
+@instrumentation.timed('create_db.bulk_load', rows=lambda result: result[0])
+def bulk_load_database(db_path=DB_PATH, data_dir=DATA_DIR):
+    """
+    Fast path for create_database(): rows go straight from the CSVs through
+    csv + executemany (no pandas type inference), one transaction per table,
+    with load-time PRAGMAs. Secondary indexes are built after the data is in.
+    """
+    print("Creating SQLite database (bulk load)...")
+
+    database.remove_database(db_path)
+
+    # Autocommit mode: transactions are managed explicitly per table
+    conn = database.connect(db_path, isolation_level=None)
+    try:
+        for pragma in LOAD_PRAGMAS:
+            conn.execute(pragma)
+        for ddl in TABLE_DDL.values():
+            conn.execute(ddl)
+
+        total_rows = 0
+        total_seconds = 0.0
+        for table, file_name in TABLE_FILES.items():
+            rows, elapsed = 0, 0.0
+            with instrumentation.span('create_db.load_table', table=table) as stage:
+                for csv_path in table_sources(data_dir, file_name):
+                    file_rows, file_seconds = bulk_load_table(conn, table, csv_path)
+                    rows += file_rows
+                    elapsed += file_seconds
+                stage.rows = rows
+            total_rows += rows
+            total_seconds += elapsed
+            print(f"{table}: Imported {rows:,} in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):,.0f} rows/sec)")
+
+        start = time.perf_counter()
+        with instrumentation.span('create_db.index_build', rows=total_rows):
+            conn.execute("BEGIN")
+            for ddl in BULK_INDEXES:
+                conn.execute(ddl)
+            conn.execute("COMMIT")
+        index_seconds = time.perf_counter() - start
+        print(f"Indexes built in {index_seconds:.2f}s")
+
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA optimize")
+    finally:
+        conn.close()
+
+    total_seconds += index_seconds
+    print(f"Bulk load complete: {total_rows:,} rows in {total_seconds:.2f}s "
+          f"({total_rows / max(total_seconds, 1e-9):,.0f} rows/sec). Path: {os.path.abspath(db_path)}")
+    return total_rows, total_seconds
+
+
 if __name__ == "__main__":
-    create_database()
+    parser = argparse.ArgumentParser(description="Create the Programs/Clients/Events database from data/*.csv.")
+    parser.add_argument('--bulk', action='store_true',
+                        help="Stream the CSVs with executemany and load-time PRAGMAs (much faster at scale).")
+    parser.add_argument('--data-dir', default=DATA_DIR,
+                        help="Directory with programs/clients/events CSVs or shard directories (bulk mode).")
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--migrate', action='store_true',
+                        help="Afterwards, migrate to the STRICT, indexed schema (see migrate_schema.py).")
+    parser.add_argument('--resolve-clients', action='store_true',
+                        help="Afterwards, resolve duplicate client rows into Client_Master (see entity_resolution.py).")
+    args = parser.parse_args()
+
+    if args.bulk:
+        bulk_load_database(args.db, args.data_dir)
+    else:
+        create_database(args.db, args.data_dir)
+    if args.migrate:
+        import migrate_schema
+        migrate_schema.migrate(args.db)
+    if args.resolve_clients:
+        import entity_resolution
+        entity_resolution.resolve_clients(args.db)
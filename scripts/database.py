@@ -0,0 +1,141 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from urllib.parse import quote
+
+DB_PATH = 'juvenile_justice.db'
+
+# Connection settings shared by every entry point. WAL lets readers keep
+# reading the last committed state while a writer (the ETL) is loading, and
+# lets the writer commit without waiting for readers.
+POOL_SIZE = int(os.environ.get('TJJD_DB_POOL_SIZE', '8'))
+CACHED_STATEMENTS = 256
+MMAP_SIZE = int(os.environ.get('TJJD_SQLITE_MMAP_MB', '256')) * 1024 * 1024
+BUSY_TIMEOUT_SECONDS = 30
+WRITE_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    # Durable at every checkpoint; a power loss can only drop the last commits
+    "PRAGMA synchronous=NORMAL",
+]
+
+
+def _read_only_uri(db_path):
+    return f"file:{quote(os.path.abspath(db_path))}?mode=ro"
+
+
+def connect(db_path=DB_PATH, read_only=False, **kwargs):
+    """
+    A tuned connection: prepared statements cached per connection, the file
+    memory-mapped up to MMAP_SIZE, and a busy timeout instead of an immediate
+    'database is locked'. Writers switch the database to WAL (a persistent
+    setting of the file); readers open it through a read-only URI, so they
+    can never take a write lock.
+    """
+    if read_only:
+        if not os.path.exists(db_path):
+            raise sqlite3.OperationalError(f"unable to open database file: {db_path}")
+        conn = sqlite3.connect(_read_only_uri(db_path), uri=True, cached_statements=CACHED_STATEMENTS,
+                               timeout=BUSY_TIMEOUT_SECONDS, **kwargs)
+    else:
+        conn = sqlite3.connect(db_path, cached_statements=CACHED_STATEMENTS, timeout=BUSY_TIMEOUT_SECONDS, **kwargs)
+        for pragma in WRITE_PRAGMAS:
+            conn.execute(pragma)
+    conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+    return conn
+
+
+def remove_database(db_path=DB_PATH):
+    """Delete a database with its WAL and shared-memory files (a stale WAL must never meet a new file)."""
+    for path in (db_path, db_path + '-wal', db_path + '-shm'):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class ConnectionPool:
+    """
+    Up to `size` read-only connections to one database, shared by threads.
+    A connection is used by one thread at a time and goes back to the pool
+    afterwards, keeping its statement cache and memory map warm. If the
+    database file is replaced (create_db.py recreates it), idle connections
+    to the old file are dropped.
+    """
+
+    def __init__(self, db_path, size=POOL_SIZE):
+        self.db_path = db_path
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._file_id = None
+        self._lock = threading.Lock()
+
+    def _current_file_id(self):
+        stat = os.stat(self.db_path)
+        return stat.st_dev, stat.st_ino
+
+    def _checkout(self):
+        file_id = self._current_file_id()
+        with self._lock:
+            if file_id != self._file_id:
+                self._drain()
+                self._file_id = file_id
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return connect(self.db_path, read_only=True, check_same_thread=False)
+
+    def _drain(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    @contextmanager
+    def connection(self):
+        with self._slots:
+            conn = self._checkout()
+            try:
+                yield conn
+            except BaseException:
+                conn.close()
+                raise
+            else:
+                # End any read transaction so the next user sees the latest commit
+                conn.rollback()
+                self._idle.put(conn)
+
+    def close(self):
+        with self._lock:
+            self._drain()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path=DB_PATH):
+    """
+    The process-wide reader pool for `db_path`, created on first use. Readers
+    leave the journal mode alone: the file switches to WAL the first time a
+    writer opens it, so serving a checked-out database never modifies it.
+    """
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(db_path)
+        return _pools[key]
+
+
+@contextmanager
+def read_connection(db_path=DB_PATH):
+    """A pooled read-only connection: `with read_connection(path) as conn: ...`."""
+    with get_pool(db_path).connection() as conn:
+        yield conn
+
+
+def close_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
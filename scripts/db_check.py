@@ -1,13 +1,15 @@
-import sqlite3
 import pandas as pd
 import os
 
+import database
+
 db_path = 'juvenile_justice.db'
 if not os.path.exists(db_path):
     print("DB file not found.")
     exit()
 
-conn = sqlite3.connect(db_path)
+# Read-only: safe to run against a database the ETL is loading
+conn = database.connect(db_path, read_only=True)
 tables = ['Programs', 'Clients', 'Events']
 
 print(f"Checking DB: {db_path}", flush=True)
@@ -0,0 +1,364 @@
+import pandas as pd
+import os
+import time
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+import compact_facts
+import database
+import instrumentation
+
+DB_PATH = 'juvenile_justice.db'
+# Rows per piece when a chunked scan is streamed to the vectorized predicates
+CHUNK_ROWS = int(os.environ.get('TJJD_DQ_CHUNK_ROWS', '250000'))
+REPORT_COLUMNS = ['Category', 'Rule', 'Failed_Rows', 'Severity', 'Details']
+
+# A scan is one pass over one table (or view). Rules name the scan they read;
+# every rule on the same scan is evaluated in that single pass. 'count_sql',
+# when given, is a cheaper source for the row-level COUNT pass (where
+# expressions on the referral scan may only use Fact_Referrals columns).
+# `{facts}` stands for the fact rows to audit: the whole Fact_Referrals
+# table, or a subset of County/Year partitions for an incremental audit.
+# 'chunked' scans are streamed to the vectorized predicates CHUNK_ROWS rows at
+# a time, so every predicate on them must be row-local (reference tables come
+# in whole through the rule's lookups).
+FULL_FACTS = "Fact_Referrals"
+SCANS = {
+    'referrals': {
+        'sql': """
+            SELECT f.*, c.County, c.Region, t.Year
+            FROM {facts} f
+            JOIN Dim_County c ON f.CountyID = c.CountyID
+            JOIN Dim_Time t ON f.YearID = t.YearID
+        """,
+        'count_sql': "SELECT * FROM {facts}",
+        'tables': ['Fact_Referrals', 'Dim_County', 'Dim_Time'],
+        'keys': ['County', 'Year'],
+    },
+    'Programs': {'sql': "SELECT * FROM Programs", 'tables': ['Programs'], 'keys': ['ProgramID']},
+    'Clients': {'sql': "SELECT rowid AS RowID, * FROM Clients", 'tables': ['Clients'], 'keys': ['RowID', 'ClientID']},
+    'Events': {'sql': "SELECT * FROM Events", 'tables': ['Events'], 'keys': ['EventID'], 'chunked': True},
+    # Only present once migrate_schema.py has given Clients its primary key
+    'Clients_Duplicates': {'sql': "SELECT * FROM Clients_Duplicates", 'tables': ['Clients_Duplicates'],
+                           'keys': ['RowID', 'ClientID']},
+}
+
+
+@dataclass
+class Rule:
+    """
+    One data quality rule, in one or more forms:
+
+    - `predicate`: vectorized function DataFrame -> boolean Series, True for
+      failing rows (it must not modify the frame); it also receives each of
+      `lookups` ({name: SQL}) as a keyword argument, the query's result
+      loaded once per scan (e.g. the key set of a referenced table)
+    - `where`: SQL expression over the scan, true for failing rows
+    - `query`: full SQL for set-level rules (GROUP BY/HAVING, window
+      functions) returning the failing keys; `{scan}` is replaced by the scan
+      query and `{facts}` by the fact rows being audited, and an optional
+      `Failed_Rows` column weights each key
+    - `tables`: tables the rule reads besides its scan's (in `where`,
+      `query` or `lookups`); the rule is skipped if one is missing
+
+    The engine picks the form that matches its backend. `details` is
+    formatted with the failing row count.
+    """
+    name: str
+    category: str
+    severity: str
+    scan: str
+    details: str
+    predicate: Optional[Callable] = None
+    where: Optional[str] = None
+    query: Optional[str] = None
+    lookups: Optional[dict] = None
+    tables: Optional[list] = None
+
+    def method(self, backend='sql'):
+        sql_method = 'where' if self.where is not None else ('query' if self.query is not None else None)
+        if backend == 'sql':
+            return sql_method or 'vectorized'
+        return 'vectorized' if self.predicate is not None else sql_method
+
+
+@dataclass
+class RuleResult:
+    rule: Rule
+    method: str
+    failed_rows: int
+    failing_keys: pd.DataFrame
+    seconds: float
+    scan_seconds: float = 0.0
+    batch_size: int = 1
+
+
+RULES = {}
+
+
+def register(rule):
+    if rule.scan not in SCANS:
+        raise ValueError(f"Rule '{rule.name}' reads unknown scan '{rule.scan}'")
+    if rule.predicate is None and rule.where is None and rule.query is None:
+        raise ValueError(f"Rule '{rule.name}' needs a predicate, a where expression or a query")
+    if rule.where is not None and rule.query is not None:
+        raise ValueError(f"Rule '{rule.name}' can have a where expression or a query, not both")
+    RULES[rule.name] = rule
+    return rule
+
+
+def rule(name, category, severity, scan, details, where=None, query=None, lookups=None, tables=None):
+    """Decorator form of register() for vectorized predicates, optionally with a SQL form."""
+    def decorator(predicate):
+        register(Rule(name, category, severity, scan, details, predicate=predicate, where=where, query=query,
+                      lookups=lookups, tables=tables))
+        return predicate
+    return decorator
+
+
+def _table_exists(conn, table):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone() is not None
+
+
+def _render(sql, facts):
+    return sql.replace('{facts}', facts)
+
+
+def _scan_sql(scan, facts):
+    return _render(SCANS[scan]['sql'], facts)
+
+
+def _run_where_rules(conn, scan, rules, facts):
+    """
+    Row-level SQL rules of a scan. One pass counts every rule with
+    COUNT(*) FILTER; a second query fetches keys only for rules that failed.
+    Nothing but counts and offending keys leaves SQLite.
+    """
+    keys = SCANS[scan]['keys']
+    scan_sql = _scan_sql(scan, facts)
+    start = time.perf_counter()
+    counts_sql = ", ".join(f"COUNT(*) FILTER (WHERE {r.where}) AS _r{i}" for i, r in enumerate(rules))
+    count_source = _render(SCANS[scan].get('count_sql', scan_sql), facts)
+    counts = conn.execute(f"SELECT {counts_sql} FROM ({count_source})").fetchone()
+
+    failed = [i for i, n in enumerate(counts) if n]
+    failing = pd.DataFrame(columns=keys)
+    if failed:
+        flags = ", ".join(f"({rules[i].where}) AS _r{i}" for i in failed)
+        any_failed = " OR ".join(f"({rules[i].where})" for i in failed)
+        failing = pd.read_sql(f"SELECT {', '.join(keys)}, {flags} FROM ({scan_sql}) WHERE {any_failed}", conn)
+    scan_seconds = time.perf_counter() - start
+
+    results = []
+    for i, r in enumerate(rules):
+        start = time.perf_counter()
+        if counts[i]:
+            mask = failing[f'_r{i}'].fillna(0).astype(bool)
+            rule_keys = failing.loc[mask, keys].reset_index(drop=True)
+        else:
+            rule_keys = pd.DataFrame(columns=keys)
+        results.append(RuleResult(r, 'where', counts[i], rule_keys, time.perf_counter() - start,
+                                  scan_seconds, len(rules)))
+    return results
+
+
+def _run_query_rule(conn, scan, r, facts):
+    """
+    Set-level SQL rule: the query returns the failing keys, and optionally
+    Failed_Rows per key (kept in failing_keys so per-key weights survive).
+    """
+    keys = SCANS[scan]['keys']
+    start = time.perf_counter()
+    query = _render(r.query, facts).replace('{scan}', f"({_scan_sql(scan, facts)})")
+    failing = pd.read_sql(query, conn)
+    if 'Failed_Rows' in failing:
+        failed_rows = int(failing['Failed_Rows'].sum())
+        failing = failing[keys + ['Failed_Rows']]
+    else:
+        failed_rows = len(failing)
+        failing = failing[keys]
+    elapsed = time.perf_counter() - start
+    return RuleResult(r, 'query', failed_rows, failing, elapsed, elapsed, 1)
+
+
+def _load_columnar_referrals():
+    """The referral scan from the Parquet/Arrow store (see columnar_store) instead of SQLite."""
+    import columnar_store
+    columns = ['CountyID', 'YearID', 'Juv_Pop', 'Violent_Felony', 'Other_Felony', 'Misd', 'VOP',
+               'Status_Offense', 'CINS', 'Total_Referrals', 'Referral_Rate', 'Unique_Youth',
+               'County', 'Region', 'Year']
+    return columnar_store.read_fact_view(columns)
+
+
+def _scan_frames(conn, scan, facts, backend):
+    """The scan as DataFrames: one frame, or CHUNK_ROWS-row pieces for a chunked scan."""
+    if SCANS[scan].get('chunked'):
+        return pd.read_sql(_scan_sql(scan, facts), conn, chunksize=CHUNK_ROWS)
+    if backend == 'columnar' and scan == 'referrals':
+        # The store holds every partition; a scoped audit keeps only its own partitions' results
+        df = _load_columnar_referrals()
+    else:
+        df = pd.read_sql(_scan_sql(scan, facts), conn)
+    if scan == 'referrals':
+        # Same compact in-memory format as the dashboard's fact view frames
+        df = compact_facts.compact_fact_view(df, compact_facts.read_dim_county(conn))
+    return iter([df])
+
+
+def _run_vectorized_rules(conn, scan, rules, facts, backend='pandas'):
+    """
+    Load the scan once and evaluate every predicate against the same frame
+    (or against each chunk in turn, so a chunked scan holds one chunk, the
+    lookups and the failing keys in memory, however large the table).
+    """
+    keys = SCANS[scan]['keys']
+    start = time.perf_counter()
+    lookup_sql = {name: sql for r in rules for name, sql in (r.lookups or {}).items()}
+    lookups = {name: pd.read_sql(sql, conn) for name, sql in lookup_sql.items()}
+    frames = _scan_frames(conn, scan, facts, backend)
+    scan_seconds = time.perf_counter() - start
+
+    failed = {r.name: 0 for r in rules}
+    failing = {r.name: [] for r in rules}
+    seconds = {r.name: 0.0 for r in rules}
+    while True:
+        start = time.perf_counter()
+        df = next(frames, None)
+        scan_seconds += time.perf_counter() - start
+        if df is None:
+            break
+        for r in rules:
+            start = time.perf_counter()
+            mask = r.predicate(df, **{name: lookups[name] for name in r.lookups or {}}).fillna(False).astype(bool)
+            failed[r.name] += int(mask.sum())
+            failing[r.name].append(df.loc[mask, keys])
+            seconds[r.name] += time.perf_counter() - start
+
+    return [RuleResult(r, 'vectorized', failed[r.name],
+                       pd.concat(failing[r.name], ignore_index=True) if failing[r.name] else pd.DataFrame(columns=keys),
+                       seconds[r.name], scan_seconds, len(rules))
+            for r in rules]
+
+
+def _run_scan(db_path, scan, rules, backend, facts):
+    # Each parallel scan borrows its own read-only connection from the shared pool
+    with database.read_connection(db_path) as conn, \
+            instrumentation.span(f"dq.scan.{scan}", rules=len(rules), backend=backend) as stage:
+        missing = [t for t in SCANS[scan]['tables'] if not _table_exists(conn, t)]
+        if missing:
+            # Expected on databases that never loaded the optional tables: recorded on the span, not printed
+            stage.attrs['skipped_missing'] = ','.join(missing)
+            return []
+        # A rule that also reads another table is skipped on its own, the scan's other rules still run
+        rule_missing = {r.name: [t for t in r.tables or [] if not _table_exists(conn, t)] for r in rules}
+        if any(rule_missing.values()):
+            stage.attrs['skipped_missing'] = ','.join(sorted({t for tables in rule_missing.values() for t in tables}))
+            stage.attrs['skipped_rules'] = sum(1 for tables in rule_missing.values() if tables)
+            rules = [r for r in rules if not rule_missing[r.name]]
+        results = []
+        where_rules = [r for r in rules if r.method(backend) == 'where']
+        query_rules = [r for r in rules if r.method(backend) == 'query']
+        vectorized_rules = [r for r in rules if r.method(backend) == 'vectorized']
+        if where_rules:
+            results += _run_where_rules(conn, scan, where_rules, facts)
+        for r in query_rules:
+            results.append(_run_query_rule(conn, scan, r, facts))
+        if vectorized_rules:
+            results += _run_vectorized_rules(conn, scan, vectorized_rules, facts, backend)
+        return results
+
+
+def run_rules(db_path=DB_PATH, rules=None, backend='sql', max_workers=4, facts=FULL_FACTS):
+    """
+    Evaluate rules (default: every registered rule). With backend='sql' every
+    rule that has a SQL form runs inside SQLite and only counts and failing
+    keys are fetched, so the fact table is never loaded; backend='pandas'
+    prefers the vectorized predicates, and backend='columnar' does the same
+    but reads the referral facts from the columnar store. Rules are grouped by scan so each table
+    is read once, and independent scans run in parallel threads, each with its
+    own connection. Results come back in registration order. `facts` narrows
+    the referral rules to a subset of fact rows (see dq_incremental).
+    """
+    if backend not in ('sql', 'pandas', 'columnar'):
+        raise ValueError(f"Unknown backend: {backend}")
+    rules = list(RULES.values()) if rules is None else list(rules)
+    by_scan = {}
+    for r in rules:
+        by_scan.setdefault(r.scan, []).append(r)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(_run_scan, db_path, scan, scan_rules, backend, facts) for scan, scan_rules in by_scan.items()]
+        results = [result for future in futures for result in future.result()]
+
+    order = {r.name: i for i, r in enumerate(rules)}
+    results = sorted(results, key=lambda result: order[result.rule.name])
+    for res in results:
+        instrumentation.record(f"dq.rule.{res.rule.name}", res.seconds, 'dq', rows=res.failed_rows,
+                               scan=res.rule.scan, method=res.method, scan_seconds=round(res.scan_seconds, 6))
+    return results
+
+
+# --------------------------
+# Sinks
+# --------------------------
+def issues_frame(rule_counts):
+    """The data_quality_report.csv layout from (Rule, failed row count) pairs; rules without failures are left out."""
+    issues = [{
+        'Category': r.category,
+        'Rule': r.name,
+        'Failed_Rows': count,
+        'Severity': r.severity,
+        'Details': r.details.format(count=count),
+    } for r, count in rule_counts if count > 0]
+    return pd.DataFrame(issues, columns=REPORT_COLUMNS)
+
+
+def report_frame(results):
+    """One report row per rule that found issues."""
+    return issues_frame([(res.rule, res.failed_rows) for res in results])
+
+
+def write_report(results, path):
+    return write_report_frame(report_frame(results), path)
+
+
+def write_report_frame(report_df, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    report_df.to_csv(path, index=False)
+    return report_df
+
+
+def write_rule_timings(results, path):
+    timings = pd.DataFrame([{
+        'Rule': res.rule.name,
+        'Scan': res.rule.scan,
+        'Method': res.method,
+        'Failed_Rows': res.failed_rows,
+        'Rule_Seconds': round(res.seconds, 6),
+        'Scan_Seconds': round(res.scan_seconds, 6),
+        'Rules_In_Scan': res.batch_size,
+    } for res in results])
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    timings.to_csv(path, index=False)
+    return timings
+
+
+def key_strings(failing_keys):
+    """Each failing record's key as 'Col=value' pairs (per-key Failed_Rows weights are not part of the key)."""
+    keys = failing_keys.drop(columns=['Failed_Rows'], errors='ignore').astype(str)
+    if keys.empty:
+        return pd.Series([], dtype=object)
+    return keys.apply(lambda row: ", ".join(f"{col}={val}" for col, val in row.items()), axis=1)
+
+
+def write_failing_keys(results, path):
+    """One row per failing record: the rule and the record's key."""
+    frames = [
+        pd.DataFrame({'Rule': res.rule.name, 'Scan': res.rule.scan, 'Key': key_strings(res.failing_keys)})
+        for res in results if res.failed_rows > 0
+    ]
+    keys_df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['Rule', 'Scan', 'Key'])
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    keys_df.to_csv(path, index=False)
+    return keys_df
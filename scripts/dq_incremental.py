@@ -0,0 +1,214 @@
+import pandas as pd
+from datetime import datetime
+
+import database
+import dq_engine
+
+DB_PATH = 'juvenile_justice.db'
+ALL_PARTITIONS = '*'
+
+# Persisted issue store: one row per failing record per rule. Referral issues
+# are keyed by their County/Year partition so an incremental audit can replace
+# just the partitions it re-evaluated; other scans use a single '*' partition.
+STORE_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS DQ_Issues (
+        Rule TEXT, Scan TEXT, Partition_Key TEXT, Record_Key TEXT,
+        Failed_Rows INTEGER, Detected_At TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_dq_issues_partition ON DQ_Issues(Scan, Partition_Key)",
+    # Last ETL_Changelog entry each scan has been audited up to
+    """
+    CREATE TABLE IF NOT EXISTS DQ_Audit_State (
+        Scan TEXT PRIMARY KEY, Last_ChangeID INTEGER, Audited_At TEXT
+    )
+    """,
+    # Partitions of the current incremental audit: 'eval' partitions are
+    # re-evaluated and replaced in the store, 'neighbour' partitions are only
+    # read (the previous year the YoY rule compares against)
+    """
+    CREATE TABLE IF NOT EXISTS DQ_Audit_Scope (
+        CountyID INTEGER, YearID INTEGER, Role TEXT,
+        PRIMARY KEY (CountyID, YearID)
+    )
+    """,
+]
+
+SCOPED_FACTS = """(
+    SELECT f.* FROM Fact_Referrals f
+    JOIN DQ_Audit_Scope s ON f.CountyID = s.CountyID AND f.YearID = s.YearID
+)"""
+
+
+def _table_exists(conn, table):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone() is not None
+
+
+def _pending_changes(conn, last_change_id):
+    if not _table_exists(conn, 'ETL_Changelog'):
+        return None, pd.DataFrame(columns=['County', 'Year', 'Change_Type'])
+    max_id = conn.execute("SELECT MAX(ChangeID) FROM ETL_Changelog").fetchone()[0]
+    changes = pd.read_sql(
+        "SELECT County, Year, Change_Type FROM ETL_Changelog WHERE ChangeID > ?",
+        conn, params=(last_change_id or 0,)
+    )
+    return max_id, changes
+
+
+def _build_scope(conn, changes):
+    """
+    Fill DQ_Audit_Scope from the changed partitions: the changed County/Year
+    rows and the next year of each county (whose YoY change depends on them)
+    are re-evaluated; the previous year is read as YoY context only.
+    """
+    conn.execute("DELETE FROM DQ_Audit_Scope")
+    conn.execute("DROP TABLE IF EXISTS temp.dq_changed")
+    conn.execute("CREATE TEMP TABLE dq_changed (County TEXT, Year INTEGER)")
+    conn.executemany("INSERT INTO temp.dq_changed (County, Year) VALUES (?, ?)",
+                     changes[['County', 'Year']].drop_duplicates().itertuples(index=False, name=None))
+    conn.execute("""
+        INSERT OR IGNORE INTO DQ_Audit_Scope (CountyID, YearID, Role)
+        SELECT c.CountyID, t.YearID, 'eval'
+        FROM temp.dq_changed d
+        JOIN Dim_County c ON c.County = d.County
+        JOIN Dim_Time t ON t.Year = d.Year
+    """)
+
+    # Previous/next existing year of every changed partition, from the keys of the changed counties only
+    conn.execute("DROP TABLE IF EXISTS temp.dq_neighbours")
+    conn.execute("""
+        CREATE TEMP TABLE dq_neighbours AS
+        SELECT CountyID, YearID,
+               LAG(YearID) OVER w AS Prev_YearID,
+               LEAD(YearID) OVER w AS Next_YearID
+        FROM (
+            SELECT f.CountyID, f.YearID, t.Year
+            FROM Fact_Referrals f
+            JOIN Dim_Time t ON f.YearID = t.YearID
+            WHERE f.CountyID IN (SELECT CountyID FROM DQ_Audit_Scope)
+        )
+        WINDOW w AS (PARTITION BY CountyID ORDER BY Year)
+    """)
+    conn.execute("""
+        INSERT OR IGNORE INTO DQ_Audit_Scope (CountyID, YearID, Role)
+        SELECT n.CountyID, n.Next_YearID, 'eval'
+        FROM temp.dq_neighbours n
+        JOIN DQ_Audit_Scope s ON s.CountyID = n.CountyID AND s.YearID = n.YearID
+        WHERE n.Next_YearID IS NOT NULL
+    """)
+    conn.execute("""
+        INSERT OR IGNORE INTO DQ_Audit_Scope (CountyID, YearID, Role)
+        SELECT n.CountyID, n.Prev_YearID, 'neighbour'
+        FROM temp.dq_neighbours n
+        JOIN DQ_Audit_Scope s ON s.CountyID = n.CountyID AND s.YearID = n.YearID AND s.Role = 'eval'
+        WHERE n.Prev_YearID IS NOT NULL
+    """)
+
+    eval_partitions = conn.execute("""
+        SELECT c.County, t.Year
+        FROM DQ_Audit_Scope s
+        JOIN Dim_County c ON s.CountyID = c.CountyID
+        JOIN Dim_Time t ON s.YearID = t.YearID
+        WHERE s.Role = 'eval'
+    """).fetchall()
+    return {f"{county}|{year}" for county, year in eval_partitions}
+
+
+def _store_rows(res, detected_at):
+    keys = res.failing_keys
+    if res.failed_rows == 0 or keys.empty:
+        return pd.DataFrame(columns=['Rule', 'Scan', 'Partition_Key', 'Record_Key', 'Failed_Rows', 'Detected_At'])
+    if res.rule.scan == 'referrals':
+        partitions = keys['County'].astype(str) + '|' + keys['Year'].astype(str)
+    else:
+        partitions = pd.Series(ALL_PARTITIONS, index=keys.index)
+    weights = keys['Failed_Rows'] if 'Failed_Rows' in keys else pd.Series(1, index=keys.index)
+    return pd.DataFrame({
+        'Rule': res.rule.name,
+        'Scan': res.rule.scan,
+        'Partition_Key': partitions.values,
+        'Record_Key': dq_engine.key_strings(keys).values,
+        'Failed_Rows': weights.astype(int).values,
+        'Detected_At': detected_at,
+    })
+
+
+def _merge_results(conn, results, scans, eval_partitions):
+    """Replace the store rows of every evaluated scan (only the eval partitions for a scoped referral audit)."""
+    detected_at = datetime.now().isoformat(timespec='seconds')
+    rows = [_store_rows(res, detected_at) for res in results]
+    new_rows = pd.concat(rows, ignore_index=True) if rows else None
+
+    for scan in scans:
+        if scan == 'referrals' and eval_partitions is not None:
+            conn.executemany("DELETE FROM DQ_Issues WHERE Scan = 'referrals' AND Partition_Key = ?",
+                             [(p,) for p in eval_partitions])
+        else:
+            conn.execute("DELETE FROM DQ_Issues WHERE Scan = ?", (scan,))
+
+    if new_rows is not None and not new_rows.empty:
+        if eval_partitions is not None:
+            in_scope = (new_rows['Scan'] != 'referrals') | new_rows['Partition_Key'].isin(eval_partitions)
+            new_rows = new_rows[in_scope]
+        conn.executemany(
+            "INSERT INTO DQ_Issues (Rule, Scan, Partition_Key, Record_Key, Failed_Rows, Detected_At) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            new_rows.astype(object).itertuples(index=False, name=None)
+        )
+
+
+def run_audit(db_path=DB_PATH, backend='sql', incremental=True):
+    """
+    Evaluate the registered rules and merge the results into DQ_Issues.
+
+    Incrementally, referral rules only see the County/Year partitions listed
+    in ETL_Changelog since the last audit (plus YoY neighbours); a full
+    reload, a first run or incremental=False audits every partition. Rules on
+    the other tables are always evaluated in full. Returns the RuleResults of
+    this run.
+    """
+    conn = database.connect(db_path)
+    with conn:
+        for ddl in STORE_DDL:
+            conn.execute(ddl)
+
+    state = conn.execute("SELECT Last_ChangeID FROM DQ_Audit_State WHERE Scan = 'referrals'").fetchone()
+    max_change_id, changes = _pending_changes(conn, state[0] if state else 0)
+    full = (not incremental or state is None or max_change_id is None
+            or (changes['Change_Type'] == 'reload').any())
+
+    referral_rules = [r for r in dq_engine.RULES.values() if r.scan == 'referrals']
+    other_rules = [r for r in dq_engine.RULES.values() if r.scan != 'referrals']
+
+    facts = dq_engine.FULL_FACTS
+    eval_partitions = None
+    rules = referral_rules + other_rules
+    if full:
+        print("Auditing all County/Year partitions.")
+    elif changes.empty:
+        print("No County/Year partitions changed since the last audit.")
+        rules = other_rules
+    else:
+        with conn:
+            eval_partitions = _build_scope(conn, changes)
+        facts = SCOPED_FACTS
+        print(f"Auditing {len(eval_partitions)} changed County/Year partitions (incl. YoY neighbours).")
+
+    results = dq_engine.run_rules(db_path, rules=rules, backend=backend, facts=facts)
+
+    with conn:
+        _merge_results(conn, results, {r.scan for r in rules}, eval_partitions)
+        conn.execute(
+            "INSERT OR REPLACE INTO DQ_Audit_State (Scan, Last_ChangeID, Audited_At) VALUES ('referrals', ?, ?)",
+            (max_change_id or 0, datetime.now().isoformat(timespec='seconds'))
+        )
+    conn.close()
+    return results
+
+
+def report_from_store(db_path=DB_PATH):
+    """The data_quality_report.csv layout, aggregated from DQ_Issues in rule registration order."""
+    with database.read_connection(db_path) as conn:
+        counts = dict(conn.execute("SELECT Rule, SUM(Failed_Rows) FROM DQ_Issues GROUP BY Rule").fetchall())
+    return dq_engine.issues_frame([(r, int(counts.get(r.name, 0))) for r in dq_engine.RULES.values()])
@@ -0,0 +1,212 @@
+import pandas as pd
+
+import analytics
+from dq_engine import Rule, register, rule
+
+OFFENSE_COLUMNS = ['Violent_Felony', 'Other_Felony', 'Misd', 'VOP', 'Status_Offense', 'CINS']
+EVENT_STATUSES = ['Completed', 'Active', 'Dropped', 'Transferred']
+OFFENSE_SUM = " + ".join(OFFENSE_COLUMNS)
+
+# Rules are evaluated and reported in the order they are registered here.
+# Referral rules carry both a pandas predicate and a SQL form; the engine's
+# backend decides which one runs.
+
+# --------------------------
+# Referral facts (Fact_Referrals joined to its dimensions)
+# --------------------------
+
+# 1. Completeness Check
+@rule('Total_Referrals must not be NULL', 'Completeness', 'Critical', 'referrals',
+      "{count} rows have missing referral counts.",
+      where="Total_Referrals IS NULL")
+def missing_total(df):
+    return df['Total_Referrals'].isnull()
+
+
+# 2. Uniqueness Check
+@rule('County + Year must be unique', 'Uniqueness', 'Critical', 'referrals',
+      "Found {count} duplicate records for County/Year combinations.",
+      # Group on the integer keys, join names only for the offending groups
+      query="""
+          SELECT c.County, t.Year, d.Failed_Rows
+          FROM (
+              SELECT CountyID, YearID, COUNT(*) - 1 AS Failed_Rows
+              FROM {facts}
+              GROUP BY CountyID, YearID
+              HAVING COUNT(*) > 1
+          ) d
+          JOIN Dim_County c ON d.CountyID = c.CountyID
+          JOIN Dim_Time t ON d.YearID = t.YearID
+      """)
+def duplicate_county_year(df):
+    return df.duplicated(subset=['CountyID', 'YearID'])
+
+
+# 3. Logic: Math Consistency
+# Note: Dataset says "Status" and "Other CINS" are separate.
+# Formula: Violent + Other_Felony + Misd + VOP + Status_Offense + CINS == Total?
+# In real datasets, there's often a small "Other" category missing or data entry errors.
+@rule('Sum of Offenses == Total Referrals', 'Logic', 'Medium', 'referrals',
+      "{count} rows have mismatch between offense sum and Total Referrals. (Potential data entry error)",
+      # NULL on either side counts as a mismatch, as NaN != x does in pandas
+      where=f"({OFFENSE_SUM}) IS NULL OR Total_Referrals IS NULL OR ({OFFENSE_SUM}) != Total_Referrals")
+def offense_sum_mismatch(df):
+    # Spelled out: on nullable integer columns NA != x is NA, not True
+    offense_sum = df[OFFENSE_COLUMNS].sum(axis=1, min_count=len(OFFENSE_COLUMNS))
+    return offense_sum.isna() | df['Total_Referrals'].isna() | (offense_sum != df['Total_Referrals'])
+
+
+# 4. Logic: Unique Youth
+# Unique Youth Referred cannot be > Total Referrals
+@rule('Unique Youth <= Total Referrals', 'Logic', 'High', 'referrals',
+      "{count} rows have more Unique Youth than Referrals (impossible).",
+      where="Unique_Youth > Total_Referrals")
+def youth_exceeds_referrals(df):
+    return df['Unique_Youth'] > df['Total_Referrals']
+
+
+# 5. Outliers: YoY Change
+# Flag > 50% change (arbitrary threshold for "investigate")
+# Only consider significant volume (e.g., > 10 referrals) to avoid noise from small counties going 1 -> 2 (100%)
+@rule('YoY Change > 50%', 'Outlier', 'Low', 'referrals',
+      "{count} county-years show >50% change in volume vs previous year.",
+      query="""
+          SELECT c.County, y.Year FROM (
+              SELECT f.CountyID, t.Year, f.Total_Referrals,
+                     LAG(f.Total_Referrals) OVER (PARTITION BY f.CountyID ORDER BY t.Year) AS Prev_Year_Ref
+              FROM {facts} f
+              JOIN Dim_Time t ON f.YearID = t.YearID
+          ) y
+          JOIN Dim_County c ON y.CountyID = c.CountyID
+          WHERE y.Prev_Year_Ref > 10
+            AND ABS((y.Total_Referrals - y.Prev_Year_Ref) * 1.0 / y.Prev_Year_Ref) > 0.5
+      """)
+def yoy_outlier(df):
+    # Same County x Year matrix the Risk & Hotspots scores are built on (see analytics)
+    matrix = analytics.CountyYearMatrix.from_frame(df, ['Total_Referrals'])
+    flagged = analytics.yoy_flags(matrix.values['Total_Referrals'], analytics.YOY_THRESHOLD, analytics.MIN_PREV_VOLUME)
+    return pd.Series(matrix.to_rows(flagged), index=df.index)
+
+
+# --------------------------
+# Programs / Clients / Events
+# --------------------------
+register(Rule('Program Capacity must be positive', 'Validity', 'Medium', 'Programs',
+              "{count} programs have a missing or non-positive Capacity.",
+              where="Capacity IS NULL OR Capacity <= 0"))
+
+register(Rule('Client DOB must not be NULL', 'Completeness', 'Medium', 'Clients',
+              "{count} clients have no date of birth.",
+              where="DOB IS NULL OR DOB = ''"))
+
+register(Rule('Client Gender must be M or F', 'Validity', 'Low', 'Clients',
+              "{count} clients have a missing or unrecognised Gender.",
+              where="Gender IS NULL OR Gender NOT IN ('M', 'F')"))
+
+
+@rule('ClientID must be unique', 'Uniqueness', 'High', 'Clients',
+      "Found {count} client rows that repeat an existing ClientID.",
+      query="""
+          SELECT RowID, ClientID FROM (
+              SELECT RowID, ClientID, ROW_NUMBER() OVER (PARTITION BY ClientID ORDER BY RowID) AS Occurrence
+              FROM {scan}
+          )
+          WHERE Occurrence > 1
+      """)
+def duplicate_client_id(df):
+    return df.duplicated(subset=['ClientID'])
+
+
+# After the schema migration Clients is keyed by ClientID and the repeats live here
+register(Rule('Client rows set aside as duplicates', 'Uniqueness', 'High', 'Clients_Duplicates',
+              "{count} client rows repeat an existing ClientID or have none (moved to Clients_Duplicates).",
+              where="RowID IS NOT NULL"))
+
+
+register(Rule('Event StartDate must not be NULL', 'Completeness', 'Critical', 'Events',
+              "{count} events have no StartDate.",
+              where="StartDate IS NULL OR StartDate = ''"))
+
+register(Rule('Event Status must be a known status', 'Validity', 'Medium', 'Events',
+              "{count} events have a status outside " + "/".join(EVENT_STATUSES) + ".",
+              where="Status IS NULL OR Status NOT IN (" + ", ".join(f"'{s}'" for s in EVENT_STATUSES) + ")"))
+
+register(Rule('Closed events must have an EndDate', 'Completeness', 'Medium', 'Events',
+              "{count} non-active events have no EndDate.",
+              where="Status != 'Active' AND EndDate IS NULL"))
+
+register(Rule('Active events must not have an EndDate', 'Logic', 'Low', 'Events',
+              "{count} active events already have an EndDate.",
+              where="Status = 'Active' AND EndDate IS NOT NULL"))
+
+
+# --------------------------
+# Events referential integrity
+# --------------------------
+# Orphans are anti-joins against the key set of the referenced table: in SQL
+# a NOT IN over an uncorrelated subquery (SQLite builds its index once, or
+# uses the Clients/Programs primary key after the migration), in pandas a
+# hash lookup (isin) of each chunk against the key set loaded once.
+# Dates compare as they are stored: ISO text and YYYYMMDD integers both
+# order chronologically.
+@rule('Event ClientID must exist in Clients', 'Integrity', 'High', 'Events',
+      "{count} events reference a ClientID that is not in Clients (orphaned events).",
+      where="ClientID IS NOT NULL AND ClientID NOT IN (SELECT ClientID FROM Clients WHERE ClientID IS NOT NULL)",
+      lookups={'clients': "SELECT DISTINCT ClientID FROM Clients WHERE ClientID IS NOT NULL"}, tables=['Clients'])
+def orphan_client(df, clients):
+    return df['ClientID'].notna() & ~df['ClientID'].isin(clients['ClientID'])
+
+
+@rule('Event ProgramID must exist in Programs', 'Integrity', 'High', 'Events',
+      "{count} events reference a ProgramID that is not in Programs.",
+      where="ProgramID IS NOT NULL AND ProgramID NOT IN (SELECT ProgramID FROM Programs WHERE ProgramID IS NOT NULL)",
+      lookups={'programs': "SELECT ProgramID FROM Programs WHERE ProgramID IS NOT NULL"}, tables=['Programs'])
+def orphan_program(df, programs):
+    return df['ProgramID'].notna() & ~df['ProgramID'].isin(programs['ProgramID'])
+
+
+@rule('Event EndDate must not be before StartDate', 'Logic', 'High', 'Events',
+      "{count} events end before they start.",
+      where="EndDate < StartDate")
+def end_before_start(df):
+    dated = df['StartDate'].notna() & df['EndDate'].notna()
+    return dated & (df['EndDate'].where(dated) < df['StartDate'].where(dated))
+
+
+# Capacity: a sweep over each program's enrollment intervals. Every event is
+# an entry on its StartDate and an exit on its EndDate (active events stay
+# open); entries and exits are first counted per program and day, so the
+# running sum over days is the number enrolled at the end of each day.
+# Exits are taken before entries, and the entries of a day that lift the
+# count above Capacity are the admissions over capacity, counted per program.
+# Events with reversed dates, or closed without an EndDate, have no interval
+# and are left to the rules above.
+register(Rule('Program enrollment must not exceed Capacity', 'Capacity', 'Medium', 'Programs',
+              "{count} admissions took a program above its Capacity.",
+              query="""
+                  WITH moves AS (
+                      SELECT ProgramID, StartDate AS Day, COUNT(*) AS Entries, 0 AS Exits
+                      FROM Events
+                      WHERE StartDate IS NOT NULL
+                        AND (EndDate >= StartDate OR (EndDate IS NULL AND Status = 'Active'))
+                      GROUP BY ProgramID, StartDate
+                      UNION ALL
+                      SELECT ProgramID, EndDate AS Day, 0 AS Entries, COUNT(*) AS Exits
+                      FROM Events
+                      WHERE StartDate IS NOT NULL AND EndDate >= StartDate
+                      GROUP BY ProgramID, EndDate
+                  ), days AS (
+                      SELECT ProgramID, Day, SUM(Entries) AS Entries, SUM(Exits) AS Exits
+                      FROM moves
+                      GROUP BY ProgramID, Day
+                  ), sweep AS (
+                      SELECT ProgramID, Entries,
+                             SUM(Entries - Exits) OVER (PARTITION BY ProgramID ORDER BY Day) AS Enrolled
+                      FROM days
+                  )
+                  SELECT p.ProgramID, SUM(MIN(s.Entries, s.Enrolled - p.Capacity)) AS Failed_Rows
+                  FROM sweep s
+                  JOIN {scan} p ON s.ProgramID = p.ProgramID
+                  WHERE s.Entries > 0 AND s.Enrolled > p.Capacity
+                  GROUP BY p.ProgramID
+              """, tables=['Events']))
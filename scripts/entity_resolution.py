@@ -0,0 +1,321 @@
+import argparse
+import time
+from difflib import SequenceMatcher
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+import database
+import instrumentation
+import migrate_schema
+
+DB_PATH = 'juvenile_justice.db'
+
+# Client rows are resolved to people without comparing every pair:
+# 1. Blocking: records are sorted on each key below and only records within
+#    WINDOW positions of each other become candidate pairs (sorted
+#    neighbourhood), so the work is O(n log n + n * WINDOW) per key.
+# 2. Scoring: candidate pairs sum a weight per field (log-odds style:
+#    agreement is evidence for a match, disagreement against, near misses
+#    such as a mistyped name or swapped day/month count part way), computed
+#    on integer codes in vectorized batches.
+# 3. Clustering: pairs scoring at least MATCH_THRESHOLD are linked and
+#    each connected component becomes one Client_Master row.
+# A ClientID shared by rows that disagree on name and DOB (generate_data.py
+# reuses IDs this way) is not a match: those rows stay separate people and
+# Client_ID_Map flags the ID as ambiguous.
+WINDOW = 5
+BATCH_PAIRS = 2_000_000
+MATCH_THRESHOLD = 6.0
+BLOCKING_KEYS = [
+    ['ClientID'],
+    ['LastName', 'FirstName', 'DOB_Key'],
+    ['DOB_Key', 'FirstName', 'LastName'],
+]
+WEIGHTS = {
+    'id_agree': 3.0, 'id_disagree': -2.0,
+    'last_agree': 3.0, 'last_similar': 1.5, 'last_disagree': -2.0,
+    'first_agree': 2.5, 'first_similar': 1.0, 'first_disagree': -1.5,
+    'dob_agree': 4.0, 'dob_partial': 2.0, 'dob_disagree': -3.0,
+    'gender_agree': 0.5, 'gender_disagree': -1.0,
+}
+# Names that differ count as a likely typo when their similarity ratio
+# (difflib: matched characters over total length) reaches this
+NAME_SIMILARITY = 0.8
+CLIENT_COLUMNS = ['ClientID', 'LastName', 'FirstName', 'Gender', 'Race', 'DOB']
+
+MASTER_DDL = """
+    CREATE TABLE Client_Master (
+        MasterID INTEGER PRIMARY KEY, ClientID TEXT, LastName TEXT, FirstName TEXT, Gender TEXT, Race TEXT,
+        DOB, Records INTEGER, Client_IDs INTEGER
+    )
+"""
+CROSSWALK_DDL = """
+    CREATE TABLE Client_Crosswalk (
+        Source TEXT, RowID INTEGER, ClientID TEXT, MasterID INTEGER, Match_Score REAL,
+        PRIMARY KEY (Source, RowID)
+    )
+"""
+# Each ClientID's person: the master of its first row by load order (the row
+# migrate_schema.py keeps in Clients), and how many people share the ID
+ID_MAP_DDL = """
+    CREATE TABLE Client_ID_Map (
+        ClientID TEXT PRIMARY KEY, MasterID INTEGER, Masters INTEGER
+    )
+"""
+RESOLUTION_INDEXES = ["CREATE INDEX idx_crosswalk_master ON Client_Crosswalk(MasterID)"]
+
+
+def load_client_records(conn):
+    """
+    Every client row in load order, with the table and rowid it came from:
+    Clients as loaded by create_db.py, or, once migrated, Clients plus the
+    rows set aside in Clients_Duplicates.
+    """
+    sources = [('Clients', "SELECT 'Clients' AS Source, rowid AS RowID, {columns} FROM Clients ORDER BY rowid")]
+    if migrate_schema.schema_version(conn) >= migrate_schema.SCHEMA_VERSION:
+        sources.append(('Clients_Duplicates', "SELECT 'Clients_Duplicates' AS Source, RowID, {columns} "
+                                              "FROM Clients_Duplicates ORDER BY RowID"))
+    frames = [pd.read_sql(sql.format(columns=", ".join(CLIENT_COLUMNS)), conn) for _, sql in sources]
+    records = pd.concat(frames, ignore_index=True)
+    if pd.api.types.is_numeric_dtype(records['DOB']):
+        # Migrated YYYYMMDD dates stay integers (read as float when some are NULL)
+        records['DOB'] = records['DOB'].astype('Int64')
+    return records
+
+
+def _normalize_name(values):
+    """Upper case without spaces or punctuation ("O'Neil" == "ONEIL"); empty names are missing."""
+    return values.astype('string').str.upper().str.replace(r'[^A-Z0-9]', '', regex=True).replace('', pd.NA)
+
+
+def dob_key(values):
+    """DOBs as YYYYMMDD integers (-1 when missing), from ISO text or the migrated integer form."""
+    text = values.astype('string').str.replace('-', '', regex=False).str.slice(0, 8)
+    return pd.to_numeric(text, errors='coerce').fillna(-1).astype(np.int64).to_numpy()
+
+
+def _codes(values):
+    """
+    Integer code per distinct value in sorted order, -1 for missing: equality
+    tests and the blocking sorts run on ints, not strings.
+    """
+    return pd.factorize(values, sort=True, use_na_sentinel=True)[0]
+
+
+def prepare(records):
+    """The comparison fields of each record as integer arrays (normalized names, DOB parts, codes)."""
+    last = _normalize_name(records['LastName'])
+    first = _normalize_name(records['FirstName'])
+    dob = dob_key(records['DOB'])
+    return {
+        'id': _codes(records['ClientID']),
+        'last': _codes(last),
+        'last_names': np.sort(last.dropna().unique().to_numpy(dtype=object)),
+        'first': _codes(first),
+        'first_names': np.sort(first.dropna().unique().to_numpy(dtype=object)),
+        'dob': dob,
+        'gender': _codes(records['Gender'].astype('string').str.upper().str.strip()),
+    }
+
+
+def candidate_pairs(fields, window=WINDOW):
+    """
+    (left, right) record positions to compare: neighbours within `window`
+    in each blocking sort order, deduplicated, left < right.
+    """
+    n = len(fields['id'])
+    sort_columns = {'ClientID': fields['id'], 'LastName': fields['last'],
+                    'FirstName': fields['first'], 'DOB_Key': fields['dob']}
+    pairs = []
+    for key in BLOCKING_KEYS:
+        # lexsort sorts by the last key first; missing values (-1) sort together
+        order = np.lexsort([sort_columns[column] for column in reversed(key)])
+        if key == ['ClientID']:
+            # Records without an ID are not a block
+            order = order[fields['id'][order] >= 0]
+        for offset in range(1, window):
+            if offset >= len(order):
+                break
+            pairs.append(np.stack([order[:-offset], order[offset:]], axis=1))
+    if not pairs:
+        return np.empty((0, 2), dtype=np.int64)
+    pairs = np.sort(np.concatenate(pairs), axis=1)
+    # One integer per pair, so deduplicating is a 1-D sort and a neighbour compare
+    keys = np.sort(pairs[:, 0].astype(np.int64) * n + pairs[:, 1])
+    return keys[np.concatenate([[True], keys[1:] != keys[:-1]])]
+
+
+def _agreement(left, right, agree, disagree, partial=None, partial_weight=0.0):
+    """Per-pair weight: agree/partial/disagree where both sides are known, 0 where either is missing."""
+    known = (left >= 0) & (right >= 0)
+    weight = np.where(left == right, agree, disagree)
+    if partial is not None:
+        weight = np.where((left != right) & partial, partial_weight, weight)
+    return np.where(known, weight, 0.0)
+
+
+def _similar_names(left, right, names):
+    """
+    Whether the names coded `left` and `right` (codes into `names`) are close
+    enough to be one name mistyped, compared once per distinct code pair.
+    """
+    code_pairs, inverse = np.unique(np.stack([left, right], axis=1), axis=0, return_inverse=True)
+    ratios = np.array([SequenceMatcher(None, names[a], names[b]).ratio() for a, b in code_pairs])
+    return ratios[inverse.ravel()] >= NAME_SIMILARITY
+
+
+def score_pairs(fields, left, right, threshold=MATCH_THRESHOLD):
+    """
+    Match score of each (left, right) pair: the summed field weights. Names
+    that differ are only compared for similarity where that can lift the
+    pair to `threshold`; elsewhere they score as a disagreement.
+    """
+    w = WEIGHTS
+    score = _agreement(fields['id'][left], fields['id'][right], w['id_agree'], w['id_disagree'])
+    dob_l, dob_r = fields['dob'][left], fields['dob'][right]
+    year_l, year_r = dob_l // 10000, dob_r // 10000
+    month_l, month_r = dob_l // 100 % 100, dob_r // 100 % 100
+    day_l, day_r = dob_l % 100, dob_r % 100
+    # One part mistyped, or day and month swapped
+    partial_dob = (((year_l == year_r).astype(int) + (month_l == month_r) + (day_l == day_r)) == 2) | \
+        ((year_l == year_r) & (month_l == day_r) & (day_l == month_r))
+    score += _agreement(dob_l, dob_r, w['dob_agree'], w['dob_disagree'], partial_dob, w['dob_partial'])
+    score += _agreement(fields['gender'][left], fields['gender'][right], w['gender_agree'], w['gender_disagree'])
+
+    names = [(name, fields[name][left], fields[name][right]) for name in ('last', 'first')]
+    for name, codes_l, codes_r in names:
+        score += _agreement(codes_l, codes_r, w[f'{name}_agree'], w[f'{name}_disagree'])
+    # Typo credit could add up to this much to any pair
+    headroom = sum(w[f'{name}_similar'] - w[f'{name}_disagree'] for name, _, _ in names)
+    for name, codes_l, codes_r in names:
+        undecided = (codes_l >= 0) & (codes_r >= 0) & (codes_l != codes_r) & (score + headroom >= threshold)
+        if undecided.any():
+            similar = _similar_names(codes_l[undecided], codes_r[undecided], fields[f'{name}_names'])
+            score[np.flatnonzero(undecided)[similar]] += w[f'{name}_similar'] - w[f'{name}_disagree']
+    return score
+
+
+def resolve(records, window=WINDOW, threshold=MATCH_THRESHOLD, batch_pairs=BATCH_PAIRS):
+    """
+    Cluster client records (load order) into people. Returns the records with
+    MasterID (numbered by each person's first record) and Match_Score (the
+    best score linking the record to another, NaN for a singleton), and the
+    number of candidate pairs scored.
+    """
+    n = len(records)
+    fields = prepare(records)
+    keys = candidate_pairs(fields, window)
+    links, best = [], np.full(n, np.nan)
+    for start in range(0, len(keys), batch_pairs):
+        batch = keys[start:start + batch_pairs]
+        left, right = batch // n, batch % n
+        score = score_pairs(fields, left, right, threshold)
+        matched = score >= threshold
+        links.append(np.stack([left[matched], right[matched]], axis=1))
+        for side in (left, right):
+            # Best matching score per record (np.fmax ignores the initial NaN)
+            np.fmax.at(best, side[matched], score[matched])
+    links = np.concatenate(links) if links else np.empty((0, 2), dtype=np.int64)
+
+    graph = coo_matrix((np.ones(len(links), dtype=np.int8), (links[:, 0], links[:, 1])), shape=(n, n))
+    _, component = connected_components(graph, directed=False)
+    # Number people in order of their first record
+    first_record = pd.Series(np.arange(n)).groupby(component).transform('min').to_numpy()
+    master = pd.factorize(first_record, sort=True)[0] + 1
+
+    resolved = records.copy()
+    resolved['MasterID'] = master
+    resolved['Match_Score'] = best
+    return resolved, len(keys)
+
+
+def master_records(resolved):
+    """
+    One row per person: the values of its most complete record, gaps filled
+    from its other records (earliest first), with record and ClientID counts.
+    """
+    completeness = resolved[CLIENT_COLUMNS].notna().sum(axis=1)
+    ordered = resolved.assign(_complete=completeness, _order=np.arange(len(resolved))) \
+        .sort_values(['MasterID', '_complete', '_order'], ascending=[True, False, True], kind='stable')
+    grouped = ordered.groupby('MasterID', sort=True)
+    master = grouped[CLIENT_COLUMNS].first()
+    master['Records'] = grouped.size()
+    master['Client_IDs'] = grouped['ClientID'].nunique()
+    return master.reset_index()
+
+
+def id_map(resolved):
+    """ClientID -> the master of its first record, and how many masters share the ID."""
+    with_id = resolved[resolved['ClientID'].notna()]
+    grouped = with_id.groupby('ClientID', sort=False)
+    return pd.DataFrame({'MasterID': grouped['MasterID'].first(), 'Masters': grouped['MasterID'].nunique()}) \
+        .reset_index()
+
+
+def _rows(frame, columns):
+    return frame[columns].astype(object).where(frame[columns].notna(), None).itertuples(index=False, name=None)
+
+
+@instrumentation.timed('entity_resolution', rows=lambda result: result['records'])
+def resolve_clients(db_path=DB_PATH, window=WINDOW, threshold=MATCH_THRESHOLD):
+    """Resolve every client row to a person and (re)write Client_Master, Client_Crosswalk and Client_ID_Map."""
+    start = time.perf_counter()
+    conn = database.connect(db_path)
+    try:
+        with instrumentation.span('entity_resolution.load') as stage:
+            records = load_client_records(conn)
+            stage.rows = len(records)
+        with instrumentation.span('entity_resolution.match', rows=len(records)) as stage:
+            resolved, pairs = resolve(records, window, threshold)
+            stage.attrs['pairs'] = pairs
+        master = master_records(resolved)
+        ids = id_map(resolved)
+
+        with instrumentation.span('entity_resolution.write', rows=len(resolved)), conn:
+            for table, ddl in (('Client_Master', MASTER_DDL), ('Client_Crosswalk', CROSSWALK_DDL),
+                               ('Client_ID_Map', ID_MAP_DDL)):
+                conn.execute(f"DROP TABLE IF EXISTS {table}")
+                conn.execute(ddl)
+            master_columns = ['MasterID'] + CLIENT_COLUMNS + ['Records', 'Client_IDs']
+            conn.executemany(f"INSERT INTO Client_Master ({', '.join(master_columns)}) "
+                             f"VALUES ({', '.join('?' * len(master_columns))})", _rows(master, master_columns))
+            crosswalk_columns = ['Source', 'RowID', 'ClientID', 'MasterID', 'Match_Score']
+            conn.executemany(f"INSERT INTO Client_Crosswalk ({', '.join(crosswalk_columns)}) VALUES (?, ?, ?, ?, ?)",
+                             _rows(resolved, crosswalk_columns))
+            conn.executemany("INSERT INTO Client_ID_Map (ClientID, MasterID, Masters) VALUES (?, ?, ?)",
+                             _rows(ids, ['ClientID', 'MasterID', 'Masters']))
+            for ddl in RESOLUTION_INDEXES:
+                conn.execute(ddl)
+    finally:
+        conn.close()
+
+    result = {
+        'records': len(resolved),
+        'masters': len(master),
+        'merged_records': int((master['Records'] - 1).sum()),
+        'ids_merged': int((master['Client_IDs'] > 1).sum()),
+        'ambiguous_ids': int((ids['Masters'] > 1).sum()),
+        'pairs': pairs,
+    }
+    print(f"Resolved {result['records']:,} client rows to {result['masters']:,} people in "
+          f"{time.perf_counter() - start:.2f}s ({pairs:,} candidate pairs scored).")
+    print(f"  {result['merged_records']:,} rows merged into another record's person; "
+          f"{result['ids_merged']:,} people carry more than one ClientID; "
+          f"{result['ambiguous_ids']:,} ClientIDs are shared by different people (see Client_ID_Map).")
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resolve duplicate client rows into Client_Master with a "
+                                                 "Client_Crosswalk from every row to its person.")
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--window', type=int, default=WINDOW,
+                        help="Sorted-neighbourhood window: records compared per blocking key and record.")
+    parser.add_argument('--threshold', type=float, default=MATCH_THRESHOLD,
+                        help="Minimum pair score to treat two records as the same person.")
+    args = parser.parse_args()
+
+    resolve_clients(args.db, args.window, args.threshold)
@@ -0,0 +1,320 @@
+import pandas as pd
+import numpy as np
+import csv
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+import database
+import instrumentation
+import rollups
+
+from etl_pipeline import (
+    DB_PATH, FACT_COLUMNS, SOURCE_HEADER, FACT_DDL, DIM_TIME_DDL, DIM_COUNTY_DDL,
+    file_hash, row_fingerprints, load_county_meta, clean_referrals, ensure_control_tables,
+    write_changelog, timestamp, db_records, _append_dim_time, _append_dim_county
+)
+
+REPORT_PATH = os.path.join('docs', 'etl_file_report.csv')
+REPORT_COLUMNS = ['File', 'Status', 'Rows', 'Inserted', 'Updated', 'Skipped', 'Parse_Seconds', 'Error']
+# The writer commits once per this many parsed files or rows, whichever comes first
+BATCH_FILES = 200
+BATCH_ROWS = 100_000
+
+
+@dataclass
+class ParsedFile:
+    """What a worker sends back for one file: the transformed rows, or why there are none."""
+    path: str
+    source: str
+    status: str  # 'parsed', 'unchanged' or 'failed'
+    digest: Optional[str] = None
+    frame: Optional[pd.DataFrame] = None
+    error: Optional[str] = None
+    seconds: float = 0.0
+
+
+def expand_sources(source):
+    """The CSV files of a drop: every *.csv under a directory (recursively), a glob pattern, or one file."""
+    if os.path.isdir(source):
+        paths = glob.glob(os.path.join(source, '**', '*.csv'), recursive=True)
+    else:
+        paths = glob.glob(source, recursive=True)
+    return sorted(path for path in paths if os.path.isfile(path))
+
+
+def is_multi_source(source):
+    return os.path.isdir(source) or glob.has_magic(source)
+
+
+def _normalize(name):
+    return " ".join(name.split()).lower()
+
+
+def check_header(path):
+    """None if the first line is the 12-column TJJD layout, else what is wrong with it. Reads one line only."""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        header = next(csv.reader(f), None)
+    if not header:
+        return "empty file"
+    if len(header) != len(SOURCE_HEADER):
+        return f"expected {len(SOURCE_HEADER)} columns, found {len(header)}"
+    mismatched = [f"{found!r} (expected {expected!r})"
+                  for found, expected in zip(header, SOURCE_HEADER) if _normalize(found) != _normalize(expected)]
+    if mismatched:
+        return "unexpected column(s): " + ", ".join(mismatched)
+    return None
+
+
+def parse_file(path, source, known_digest=None):
+    """
+    Worker: validate the header, skip the file if its hash matches the last
+    load, else parse and transform it (column names, year type, row
+    fingerprints). Never raises, so one bad file cannot stop the pool.
+    """
+    start = time.perf_counter()
+    try:
+        error = check_header(path)
+        if error:
+            return ParsedFile(path, source, 'failed', error=error, seconds=time.perf_counter() - start)
+        digest = file_hash(path)
+        if digest == known_digest:
+            return ParsedFile(path, source, 'unchanged', digest, seconds=time.perf_counter() - start)
+        df = clean_referrals(pd.read_csv(path))
+        df['Year'] = df['Year'].astype(int)
+        if df['County'].isna().any():
+            raise ValueError("rows without a County")
+        if df.duplicated(['County', 'Year']).any():
+            raise ValueError("repeated County/Year rows")
+        df['Row_Hash'] = row_fingerprints(df)
+        return ParsedFile(path, source, 'parsed', digest, df, seconds=time.perf_counter() - start)
+    except Exception as exc:
+        return ParsedFile(path, source, 'failed', error=f"{type(exc).__name__}: {exc}",
+                          seconds=time.perf_counter() - start)
+
+
+def _start_run(conn, source, started_at):
+    """ETL_Runs row opened before the first file is written, so every file's changelog can point to it."""
+    with conn:
+        return conn.execute("INSERT INTO ETL_Runs (Mode, Source, Started_At) VALUES ('multi', ?, ?)",
+                            (source, started_at)).lastrowid
+
+
+def _finish_run(conn, run_id, inserted, updated, skipped):
+    conn.execute("UPDATE ETL_Runs SET Finished_At = ?, Rows_Inserted = ?, Rows_Updated = ?, Rows_Skipped = ? "
+                 "WHERE RunID = ?", (timestamp(), inserted, updated, skipped, run_id))
+
+
+class Writer:
+    """
+    The only SQLite writer of a multi-file load. Parsed files are buffered
+    and written in batches (one transaction per batch) to amortize the
+    per-transaction and pandas overhead over many small files. If a batch
+    fails, its files are retried one by one so only the bad file is lost.
+    Files are written in path order. Each County/Year belongs to the file
+    that loaded it, in this run or an earlier one; another file carrying the
+    same County/Year fails instead of overwriting it.
+    """
+
+    def __init__(self, conn, run_id, county_meta, sources):
+        self.conn = conn
+        self.run_id = run_id
+        self.county_meta = county_meta
+        fingerprints = pd.read_sql("SELECT Source, County, Year, Row_Hash AS Prev_Hash FROM ETL_Row_Fingerprint", conn)
+        self.previous = fingerprints[fingerprints['Source'].isin(set(sources))]
+        self.existing = set(conn.execute("SELECT CountyID, YearID FROM Fact_Referrals").fetchall())
+        self.pending = []
+        self.pending_rows = 0
+        self.years = set()
+        self.county_ids = set()
+        # (County, Year) -> the file that wrote it, seeded from the earlier runs of this drop's
+        # files: unchanged ones are skipped unparsed, yet still hold their County/Years
+        self.written = dict(zip(zip(self.previous['County'], self.previous['Year'].astype(int)),
+                                self.previous['Source']))
+
+    def add(self, parsed):
+        """Buffer a parsed file; returns the report rows of any batch this completes."""
+        self.pending.append(parsed)
+        self.pending_rows += len(parsed.frame)
+        if len(self.pending) >= BATCH_FILES or self.pending_rows >= BATCH_ROWS:
+            return self.flush()
+        return []
+
+    def flush(self):
+        batch, self.pending, self.pending_rows = self.pending, [], 0
+        batch, rows = self._claim(batch)
+        if not batch:
+            return rows
+        try:
+            with instrumentation.span('etl.multi.write', rows=sum(len(p.frame) for p in batch), files=len(batch)):
+                return rows + self._write(batch)
+        except Exception as exc:
+            if len(batch) == 1:
+                return rows + [self._failed(batch[0], exc)]
+        for parsed in batch:
+            try:
+                rows += self._write([parsed])
+            except Exception as exc:
+                rows.append(self._failed(parsed, exc))
+        return rows
+
+    def _claim(self, batch):
+        """
+        Split `batch` into the files that can be written and failed report rows
+        for those repeating a County/Year another file already wrote, or that
+        an earlier file of the same batch takes.
+        """
+        claimed = {}
+        accepted, rows = [], []
+        for parsed in batch:
+            keys = list(zip(parsed.frame['County'], parsed.frame['Year'].astype(int)))
+            taken = []
+            for key in keys:
+                owner = claimed.get(key) or self.written.get(key)
+                if owner not in (None, parsed.source):
+                    taken.append((key, owner))
+            if taken:
+                owners = sorted({owner for _, owner in taken})
+                sample = ", ".join(f"{county} {year}" for (county, year), _ in taken[:3])
+                more = f" and {len(taken) - 3} more" if len(taken) > 3 else ""
+                rows.append({'File': parsed.source, 'Status': 'failed',
+                             'Error': f"County/Year already loaded from {', '.join(owners)}: {sample}{more}"})
+                continue
+            claimed.update((key, parsed.source) for key in keys)
+            accepted.append(parsed)
+        return accepted, rows
+
+    @staticmethod
+    def _failed(parsed, exc):
+        return {'File': parsed.source, 'Status': 'failed', 'Error': f"write: {type(exc).__name__}: {exc}"}
+
+    def _write(self, batch):
+        """Upsert the changed County/Year rows of `batch` with their fingerprints, watermarks and changelog."""
+        df = pd.concat([p.frame for p in batch], ignore_index=True)
+        df['Source'] = np.repeat([p.source for p in batch], [len(p.frame) for p in batch])
+        diff = df.merge(self.previous, on=['Source', 'County', 'Year'], how='left')
+        changed = diff[diff['Row_Hash'] != diff['Prev_Hash']]
+
+        conn = self.conn
+        with conn:
+            year_ids, _ = _append_dim_time(conn, changed['Year'])
+            county_ids, _ = _append_dim_county(conn, changed['County'], self.county_meta)
+            changed = changed.assign(CountyID=changed['County'].map(county_ids), YearID=changed['Year'].map(year_ids))
+
+            # Replace each County/Year partition: whatever was there (from any source) counts as updated
+            keys = db_records(changed, ['CountyID', 'YearID'])
+            is_update = [key in self.existing for key in keys]
+            conn.executemany("DELETE FROM Fact_Referrals WHERE CountyID = ? AND YearID = ?",
+                             [key for key, update in zip(keys, is_update) if update])
+            placeholders = ", ".join("?" for _ in FACT_COLUMNS)
+            conn.executemany(f"INSERT INTO Fact_Referrals ({', '.join(FACT_COLUMNS)}) VALUES ({placeholders})",
+                             db_records(changed, FACT_COLUMNS))
+
+            conn.executemany(
+                "INSERT OR REPLACE INTO ETL_Row_Fingerprint (Source, County, Year, Row_Hash) VALUES (?, ?, ?, ?)",
+                db_records(changed, ['Source', 'County', 'Year', 'Row_Hash'])
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO ETL_Watermark (Source, File_Hash, Row_Count, RunID, Loaded_At) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(p.source, p.digest, len(p.frame), self.run_id, timestamp()) for p in batch]
+            )
+            write_changelog(conn, self.run_id, [
+                (county, int(year), 'update' if update else 'insert')
+                for county, year, update in zip(changed['County'], changed['Year'], is_update)
+            ])
+
+        # Committed: only now does the writer's view of the table move on
+        self.existing.update(keys)
+        self.years.update(int(y) for y in changed['Year'].unique())
+        self.county_ids.update(int(c) for c in changed['CountyID'].unique())
+        self.written.update(zip(zip(df['County'], df['Year'].astype(int)), df['Source']))
+
+        per_file = pd.Series(is_update, index=changed.index, dtype=bool).groupby(changed['Source']).agg(['size', 'sum'])
+        rows = []
+        for p in batch:
+            written, updated = per_file.loc[p.source] if p.source in per_file.index else (0, 0)
+            rows.append({'File': p.source, 'Status': 'loaded', 'Rows': len(p.frame),
+                         'Inserted': int(written - updated), 'Updated': int(updated),
+                         'Skipped': len(p.frame) - int(written)})
+        return rows
+
+
+@instrumentation.timed('etl.multi', rows=lambda stats: stats['inserted'] + stats['updated'])
+def etl_files(source, db_path=DB_PATH, workers=None, report_path=REPORT_PATH):
+    """
+    Load a drop of per-county / per-year extracts (a directory or a glob).
+    Worker processes validate headers and parse and fingerprint the files;
+    this process is the only SQLite writer and upserts the files' County/Year
+    rows in path order, one transaction per batch of files. A file that fails
+    (bad header, unparseable values, a write error) is reported and left out;
+    its partitions keep their previous values. Files unchanged since their
+    last load are skipped after hashing. Rollups are refreshed once at the
+    end for the touched years and counties.
+    """
+    paths = expand_sources(source)
+    if not paths:
+        raise FileNotFoundError(f"No CSV files match {source}")
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in paths])
+    workers = workers or os.cpu_count()
+    print(f"Starting multi-file ETL: {len(paths):,} files, {workers} worker processes...")
+    started_at = timestamp()
+    county_meta = load_county_meta()
+
+    conn = database.connect(db_path)
+    ensure_control_tables(conn)
+    with conn:
+        for ddl in (DIM_TIME_DDL, DIM_COUNTY_DDL, FACT_DDL):
+            conn.execute(ddl)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_fact_county ON Fact_Referrals(CountyID)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_fact_year ON Fact_Referrals(YearID)")
+    known = dict(conn.execute("SELECT Source, File_Hash FROM ETL_Watermark").fetchall())
+    run_id = _start_run(conn, source, started_at)
+
+    sources = {path: os.path.relpath(os.path.abspath(path), root).replace(os.sep, '/') for path in paths}
+    writer = Writer(conn, run_id, county_meta, sources.values())
+    report = []
+    parse_seconds = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(parse_file, path, name, known.get(name)) for path, name in sources.items()]
+        # In submission (path) order, so which file keeps a County/Year two files carry does not depend on timing
+        for future in futures:
+            parsed = future.result()
+            parse_seconds[parsed.source] = round(parsed.seconds, 4)
+            instrumentation.record('etl.multi.parse', parsed.seconds,
+                                   rows=len(parsed.frame) if parsed.frame is not None else None,
+                                   file=parsed.source, status=parsed.status)
+            if parsed.status == 'parsed':
+                report += writer.add(parsed)
+            else:
+                report.append({'File': parsed.source, 'Status': parsed.status, 'Error': parsed.error})
+    report += writer.flush()
+
+    report_df = pd.DataFrame(report, columns=REPORT_COLUMNS).sort_values('File', ignore_index=True)
+    report_df[['Inserted', 'Updated', 'Skipped']] = report_df[['Inserted', 'Updated', 'Skipped']].fillna(0).astype(int)
+    report_df['Parse_Seconds'] = report_df['File'].map(parse_seconds)
+    totals = {key: int(report_df[key.capitalize()].sum()) for key in ('inserted', 'updated', 'skipped')}
+
+    with conn:
+        if writer.years:
+            with instrumentation.span('etl.rollups'):
+                rollups.refresh_rollups(conn, years=sorted(writer.years), county_ids=sorted(writer.county_ids))
+        _finish_run(conn, run_id, totals['inserted'], totals['updated'], totals['skipped'])
+    conn.close()
+
+    os.makedirs(os.path.dirname(report_path) or '.', exist_ok=True)
+    report_df.to_csv(report_path, index=False)
+
+    counts = report_df['Status'].value_counts()
+    print(f"Multi-file ETL Complete. {counts.get('loaded', 0)} loaded, {counts.get('unchanged', 0)} unchanged, "
+          f"{counts.get('failed', 0)} failed.")
+    print(f"Rows inserted: {totals['inserted']}, updated: {totals['updated']}, skipped: {totals['skipped']}")
+    failed = report_df[report_df['Status'] == 'failed']
+    if not failed.empty:
+        print("Failed files (not loaded; their County/Year rows keep their previous values):")
+        print(failed[['File', 'Error']].to_string(index=False))
+    print(f"Per-file report saved to {report_path}")
+    return dict(totals, files=len(paths), failed=list(failed['File']), run_id=run_id)
@@ -1,78 +1,416 @@
 import pandas as pd
-import sqlite3
 import os
+import hashlib
+import argparse
+from datetime import datetime
 
-def etl_process():
-    print("Starting ETL Pipeline...")
-    
-    # 1. Extract
-    print("Extracting data...")
-    raw_referrals = pd.read_csv('TJJD_-_County_Level_Referral_Data__FY_2013-2021.csv')
-    
+import database
+import instrumentation
+import rollups
+
+SOURCE_CSV = 'TJJD_-_County_Level_Referral_Data__FY_2013-2021.csv'
+METADATA_CSV = 'data/County_Metadata.csv'
+DB_PATH = 'juvenile_justice.db'
+
+# The extract's own header, in order; RAW_COLUMNS renames it column by column
+SOURCE_HEADER = [
+    'Calendar Year', 'County', 'Juvenile Population', 'Violent Felony', 'Other Felony', 'Misd.',
+    'VOP', 'Status', 'Other CINS', 'Referrals', 'Referral Rate/1,000', 'Youth Referred'
+]
+RAW_COLUMNS = [
+    'Year', 'County', 'Juv_Pop', 'Violent_Felony', 'Other_Felony',
+    'Misd', 'VOP', 'Status_Offense', 'CINS', 'Total_Referrals',
+    'Referral_Rate', 'Unique_Youth'
+]
+MEASURE_COLUMNS = RAW_COLUMNS[2:]
+# Measure dtypes of a full read of a complete extract. A count column with a
+# gap (in the file, or only in one chunk of it) is read as float otherwise, so
+# every reader casts to these and a row's values and fingerprint do not depend
+# on how it was read.
+MEASURE_DTYPES = {col: 'float64' if col == 'Referral_Rate' else 'Int64' for col in MEASURE_COLUMNS}
+FACT_COLUMNS = ['CountyID', 'YearID'] + MEASURE_COLUMNS
+
+# Same column layout pandas.to_sql produces for the full refresh, so both modes
+# can read and write the same tables.
+DIM_TIME_DDL = "CREATE TABLE IF NOT EXISTS Dim_Time (Year INTEGER, YearID INTEGER)"
+DIM_COUNTY_DDL = "CREATE TABLE IF NOT EXISTS Dim_County (County TEXT, Region TEXT, State TEXT, CountyID INTEGER)"
+FACT_DDL = """
+CREATE TABLE IF NOT EXISTS Fact_Referrals (
+    CountyID INTEGER, YearID INTEGER, Juv_Pop INTEGER,
+    Violent_Felony INTEGER, Other_Felony INTEGER, Misd INTEGER, VOP INTEGER,
+    Status_Offense INTEGER, CINS INTEGER, Total_Referrals INTEGER,
+    Referral_Rate REAL, Unique_Youth INTEGER
+)
+"""
+
+# Control tables: one row per ETL run, one watermark per source file, one
+# fingerprint per County/Year row of that source, and a changelog of the
+# County/Year partitions each run touched (read by the incremental DQ audit).
+CONTROL_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS ETL_Runs (
+        RunID INTEGER PRIMARY KEY AUTOINCREMENT,
+        Mode TEXT, Source TEXT, File_Hash TEXT,
+        Started_At TEXT, Finished_At TEXT,
+        Rows_Inserted INTEGER, Rows_Updated INTEGER, Rows_Skipped INTEGER
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ETL_Watermark (
+        Source TEXT PRIMARY KEY, File_Hash TEXT, Row_Count INTEGER,
+        RunID INTEGER, Loaded_At TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ETL_Row_Fingerprint (
+        Source TEXT, County TEXT, Year INTEGER, Row_Hash TEXT,
+        PRIMARY KEY (Source, County, Year)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ETL_Changelog (
+        ChangeID INTEGER PRIMARY KEY AUTOINCREMENT,
+        RunID INTEGER, County TEXT, Year INTEGER, Change_Type TEXT
+    )
+    """,
+]
+# Changelog marker for loads that replace every partition
+RELOAD = 'reload'
+
+
+def file_hash(path, block_size=1 << 20):
+    """SHA-256 of a file, read in blocks so large extracts are not held in memory."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def row_fingerprints(df):
+    """
+    One SHA-1 per row over the measure columns (County/Year identify the row),
+    as MEASURE_DTYPES values with gaps hashed as ''.
+    """
+    text = df[MEASURE_COLUMNS].astype(MEASURE_DTYPES).astype(str).fillna('')
+    # Joined per row in Python: one pass instead of a pandas string concatenation per column
+    columns = [text[col].tolist() for col in MEASURE_COLUMNS]
+    payload = ('|'.join(values) for values in zip(*columns))
+    return pd.Series([hashlib.sha1(s.encode('utf-8')).hexdigest() for s in payload], index=df.index)
+
+
+def load_county_meta():
     # Check if metadata exists, if not, generate it on the fly (handling the race condition from previous step)
-    if not os.path.exists('data/County_Metadata.csv'):
+    if not os.path.exists(METADATA_CSV):
         print("Metadata file not found, generating...")
         import generate_metadata
         generate_metadata.generate_metadata()
-        
-    county_meta = pd.read_csv('data/County_Metadata.csv')
-    
+
+    return pd.read_csv(METADATA_CSV)
+
+
+def clean_referrals(raw_referrals):
+    raw_referrals = raw_referrals.copy()
+    raw_referrals.columns = RAW_COLUMNS
+    return raw_referrals.astype(MEASURE_DTYPES)
+
+
+def ensure_control_tables(conn):
+    for ddl in CONTROL_DDL:
+        conn.execute(ddl)
+
+
+def timestamp():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def record_run(conn, mode, source, digest, started_at, inserted, updated, skipped):
+    """Write the ETL_Runs row and move the source watermark forward. Returns the RunID."""
+    cursor = conn.execute(
+        "INSERT INTO ETL_Runs (Mode, Source, File_Hash, Started_At, Finished_At, "
+        "Rows_Inserted, Rows_Updated, Rows_Skipped) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (mode, source, digest, started_at, timestamp(), inserted, updated, skipped)
+    )
+    run_id = cursor.lastrowid
+    conn.execute(
+        "INSERT OR REPLACE INTO ETL_Watermark (Source, File_Hash, Row_Count, RunID, Loaded_At) "
+        "VALUES (?, ?, ?, ?, ?)",
+        (source, digest, inserted + updated + skipped, run_id, timestamp())
+    )
+    return run_id
+
+
+def write_changelog(conn, run_id, changes):
+    """changes: (County, Year, Change_Type) tuples; a full reload is one (None, None, RELOAD) row."""
+    conn.executemany(
+        "INSERT INTO ETL_Changelog (RunID, County, Year, Change_Type) VALUES (?, ?, ?, ?)",
+        [(run_id, county, year, change_type) for county, year, change_type in changes]
+    )
+
+
+def write_fingerprints(conn, source, df):
+    rows = zip([source] * len(df), df['County'], df['Year'].astype(int), df['Row_Hash'])
+    conn.executemany(
+        "INSERT OR REPLACE INTO ETL_Row_Fingerprint (Source, County, Year, Row_Hash) VALUES (?, ?, ?, ?)",
+        rows
+    )
+
+
+@instrumentation.timed('etl.full')
+def etl_process(source=SOURCE_CSV, db_path=DB_PATH):
+    print("Starting ETL Pipeline...")
+    started_at = timestamp()
+
+    # 1. Extract
+    print("Extracting data...")
+    with instrumentation.span('etl.extract') as stage:
+        raw_referrals = pd.read_csv(source)
+        county_meta = load_county_meta()
+        stage.rows = len(raw_referrals)
+
     # 2. Transform
     print("Transforming data...")
-    
-    # Clean Column Names
-    # "Calendar Year","County","Juvenile Population","Violent Felony","Other Felony","Misd.","VOP","Status","Other CINS","Referrals","Referral Rate/1,000","Youth Referred"
-    raw_referrals.columns = [
-        'Year', 'County', 'Juv_Pop', 'Violent_Felony', 'Other_Felony', 
-        'Misd', 'VOP', 'Status_Offense', 'CINS', 'Total_Referrals', 
-        'Referral_Rate', 'Unique_Youth'
-    ]
-    
-    # Create Dim_Time
-    dim_time = pd.DataFrame({'Year': raw_referrals['Year'].unique()})
-    dim_time = dim_time.sort_values('Year').reset_index(drop=True)
-    dim_time['YearID'] = dim_time.index + 1
-    
-    # Create Dim_County
-    # Merge with metadata to get Region
-    dim_county = raw_referrals[['County']].drop_duplicates().sort_values('County').reset_index(drop=True)
-    dim_county = dim_county.merge(county_meta, on='County', how='left')
-    dim_county['Region'] = dim_county['Region'].fillna('Unknown') # Handle missing regions
-    dim_county['CountyID'] = dim_county.index + 1
-    
-    # Join Keys back to Fact Table
-    fact_table = raw_referrals.merge(dim_time, on='Year', how='left')
-    fact_table = fact_table.merge(dim_county, on='County', how='left')
-    
-    # Select final Fact columns
-    fact_referrals = fact_table[[
-        'CountyID', 'YearID', 'Juv_Pop', 
-        'Violent_Felony', 'Other_Felony', 'Misd', 'VOP', 'Status_Offense', 'CINS',
-        'Total_Referrals', 'Referral_Rate', 'Unique_Youth'
-    ]]
-    
+    with instrumentation.span('etl.transform') as stage:
+        # Clean Column Names
+        raw_referrals = clean_referrals(raw_referrals)
+
+        # Create Dim_Time
+        dim_time = pd.DataFrame({'Year': raw_referrals['Year'].unique()})
+        dim_time = dim_time.sort_values('Year').reset_index(drop=True)
+        dim_time['YearID'] = dim_time.index + 1
+
+        # Create Dim_County
+        # Merge with metadata to get Region
+        dim_county = raw_referrals[['County']].drop_duplicates().sort_values('County').reset_index(drop=True)
+        dim_county = dim_county.merge(county_meta, on='County', how='left')
+        dim_county['Region'] = dim_county['Region'].fillna('Unknown') # Handle missing regions
+        dim_county['CountyID'] = dim_county.index + 1
+        stage.rows = len(dim_time) + len(dim_county)
+
+    with instrumentation.span('etl.merge') as stage:
+        # Join Keys back to Fact Table
+        fact_table = raw_referrals.merge(dim_time, on='Year', how='left')
+        fact_table = fact_table.merge(dim_county, on='County', how='left')
+
+        # Select final Fact columns
+        fact_referrals = fact_table[FACT_COLUMNS]
+        stage.rows = len(fact_referrals)
+
     # 3. Load
     print("Loading into SQLite...")
-    db_path = 'juvenile_justice.db'
     # if os.path.exists(db_path):
     #     os.remove(db_path) # Full refresh - COMMENTED OUT TO PRESERVE EXISTING TABLES
-        
-    conn = sqlite3.connect(db_path)
-    
-    dim_time.to_sql('Dim_Time', conn, if_exists='replace', index=False)
-    dim_county.to_sql('Dim_County', conn, if_exists='replace', index=False)
-    fact_referrals.to_sql('Fact_Referrals', conn, if_exists='replace', index=False)
-    
+
+    conn = database.connect(db_path)
+
+    with instrumentation.span('etl.load', rows=len(dim_time) + len(dim_county) + len(fact_referrals)):
+        dim_time.to_sql('Dim_Time', conn, if_exists='replace', index=False)
+        dim_county.to_sql('Dim_County', conn, if_exists='replace', index=False)
+        fact_referrals.to_sql('Fact_Referrals', conn, if_exists='replace', index=False)
+
     # Create Indexes for performance (overkill for this size, but good practice)
-    cursor = conn.cursor()
-    cursor.execute("CREATE INDEX idx_fact_county ON Fact_Referrals(CountyID)")
-    cursor.execute("CREATE INDEX idx_fact_year ON Fact_Referrals(YearID)")
-    
-    conn.commit()
+    with instrumentation.span('etl.index_build', rows=len(fact_referrals)):
+        cursor = conn.cursor()
+        cursor.execute("CREATE INDEX idx_fact_county ON Fact_Referrals(CountyID)")
+        cursor.execute("CREATE INDEX idx_fact_year ON Fact_Referrals(YearID)")
+
+    # Materialize the dashboard rollups
+    print("Refreshing rollup tables...")
+    with instrumentation.span('etl.rollups'):
+        rollups.refresh_rollups(conn)
+
+    # Record the watermark so a later incremental run can diff against this load
+    with instrumentation.span('etl.watermark', rows=len(raw_referrals)):
+        source_name = os.path.basename(source)
+        ensure_control_tables(conn)
+        conn.execute("DELETE FROM ETL_Row_Fingerprint WHERE Source = ?", (source_name,))
+        raw_referrals['Row_Hash'] = row_fingerprints(raw_referrals)
+        write_fingerprints(conn, source_name, raw_referrals)
+        run_id = record_run(conn, 'full', source_name, file_hash(source), started_at, len(fact_referrals), 0, 0)
+        write_changelog(conn, run_id, [(None, None, RELOAD)])
+
+        conn.commit()
     conn.close()
-    
+
     print(f"ETL Complete. Database created at {db_path}")
     print(f"Loaded {len(fact_referrals)} facts, {len(dim_county)} counties, {len(dim_time)} years.")
 
+
+def db_records(df, columns):
+    """Plain Python tuples for executemany (sqlite3 cannot bind numpy scalars or NaN)."""
+    values = df[columns].astype(object).where(df[columns].notna(), None)
+    return list(values.itertuples(index=False, name=None))
+
+
+def _append_dim_time(conn, years):
+    """Return Year -> YearID, appending unseen years after the current max key."""
+    key_map = dict(conn.execute("SELECT Year, YearID FROM Dim_Time").fetchall())
+    next_id = max(key_map.values(), default=0) + 1
+    new_rows = []
+    for year in sorted(set(int(y) for y in years) - set(key_map)):
+        key_map[year] = next_id
+        new_rows.append((year, next_id))
+        next_id += 1
+    conn.executemany("INSERT INTO Dim_Time (Year, YearID) VALUES (?, ?)", new_rows)
+    return key_map, len(new_rows)
+
+
+def _append_dim_county(conn, counties, county_meta):
+    """Return County -> CountyID, appending unseen counties after the current max key."""
+    key_map = dict(conn.execute("SELECT County, CountyID FROM Dim_County").fetchall())
+    meta = county_meta.set_index('County')
+    next_id = max(key_map.values(), default=0) + 1
+    new_rows = []
+    for county in sorted(set(counties) - set(key_map)):
+        region = meta['Region'].get(county, 'Unknown')
+        state = meta['State'].get(county) if 'State' in meta else None
+        key_map[county] = next_id
+        new_rows.append((county, region if pd.notna(region) else 'Unknown', state, next_id))
+        next_id += 1
+    conn.executemany("INSERT INTO Dim_County (County, Region, State, CountyID) VALUES (?, ?, ?, ?)", new_rows)
+    return key_map, len(new_rows)
+
+
+@instrumentation.timed('etl.incremental', rows=lambda stats: stats['inserted'] + stats['updated'])
+def etl_incremental(source=SOURCE_CSV, db_path=DB_PATH):
+    """
+    Incremental load: compare the source against its watermark and upsert only
+    new or changed County/Year facts. Existing CountyID/YearID keys are never
+    renumbered; new dimension members are appended after the current max key.
+    Returns a dict with the inserted/updated/skipped row counts.
+    """
+    print("Starting incremental ETL...")
+    started_at = timestamp()
+    source_name = os.path.basename(source)
+    digest = file_hash(source)
+
+    conn = database.connect(db_path)
+    ensure_control_tables(conn)
+
+    watermark = conn.execute(
+        "SELECT File_Hash, Row_Count FROM ETL_Watermark WHERE Source = ?", (source_name,)
+    ).fetchone()
+    if watermark is not None and watermark[0] == digest:
+        stats = {'inserted': 0, 'updated': 0, 'skipped': watermark[1] or 0}
+        print(f"Source unchanged since last load ({digest[:12]}), nothing to do.")
+        conn.close()
+        return stats
+
+    # 1. Extract
+    print("Extracting data...")
+    with instrumentation.span('etl.extract') as stage:
+        raw_referrals = clean_referrals(pd.read_csv(source))
+        county_meta = load_county_meta()
+        stage.rows = len(raw_referrals)
+
+    # 2. Transform: fingerprint each County/Year row and diff against the last load
+    print("Diffing against previous load...")
+    with instrumentation.span('etl.diff') as stage:
+        raw_referrals['Row_Hash'] = row_fingerprints(raw_referrals)
+        previous = pd.read_sql(
+            "SELECT County, Year, Row_Hash AS Prev_Hash FROM ETL_Row_Fingerprint WHERE Source = ?",
+            conn, params=(source_name,)
+        )
+        diff = raw_referrals.merge(previous, on=['County', 'Year'], how='left')
+        changed = diff[diff['Row_Hash'] != diff['Prev_Hash']]
+        stage.rows = len(changed)
+
+    # 3. Load: one short write transaction so dashboard readers are blocked as little as possible
+    print("Upserting changed rows...")
+    with conn, instrumentation.span('etl.upsert', rows=len(changed)):
+        for ddl in (DIM_TIME_DDL, DIM_COUNTY_DDL, FACT_DDL):
+            conn.execute(ddl)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_fact_county ON Fact_Referrals(CountyID)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_fact_year ON Fact_Referrals(YearID)")
+
+        year_ids, new_years = _append_dim_time(conn, changed['Year'])
+        county_ids, new_counties = _append_dim_county(conn, changed['County'], county_meta)
+
+        changed = changed.assign(
+            CountyID=changed['County'].map(county_ids),
+            YearID=changed['Year'].astype(int).map(year_ids)
+        )
+        existing = set(conn.execute("SELECT CountyID, YearID FROM Fact_Referrals").fetchall())
+        is_update = [key in existing for key in zip(changed['CountyID'], changed['YearID'])]
+        updates = changed[is_update]
+        inserts = changed[[not flag for flag in is_update]]
+
+        set_clause = ", ".join(f"{col} = ?" for col in MEASURE_COLUMNS)
+        conn.executemany(
+            f"UPDATE Fact_Referrals SET {set_clause} WHERE CountyID = ? AND YearID = ?",
+            db_records(updates, MEASURE_COLUMNS + ['CountyID', 'YearID'])
+        )
+        placeholders = ", ".join("?" for _ in FACT_COLUMNS)
+        conn.executemany(
+            f"INSERT INTO Fact_Referrals ({', '.join(FACT_COLUMNS)}) VALUES ({placeholders})",
+            db_records(inserts, FACT_COLUMNS)
+        )
+
+        # Only the years and counties touched by this load need new rollups
+        rollups.refresh_rollups(conn, years=changed['Year'].unique(), county_ids=changed['CountyID'].unique())
+
+        write_fingerprints(conn, source_name, changed)
+        stats = {
+            'inserted': len(inserts),
+            'updated': len(updates),
+            'skipped': len(raw_referrals) - len(changed),
+        }
+        run_id = record_run(conn, 'incremental', source_name, digest, started_at,
+                            stats['inserted'], stats['updated'], stats['skipped'])
+        write_changelog(conn, run_id,
+                        [(c, int(y), 'insert') for c, y in zip(inserts['County'], inserts['Year'])] +
+                        [(c, int(y), 'update') for c, y in zip(updates['County'], updates['Year'])])
+    conn.close()
+
+    print(f"Incremental ETL Complete. {new_counties} new counties, {new_years} new years.")
+    print(f"Rows inserted: {stats['inserted']}, updated: {stats['updated']}, skipped: {stats['skipped']}")
+    return stats
+
+
 if __name__ == "__main__":
-    etl_process()
+    parser = argparse.ArgumentParser(description="Load TJJD referral data into the star schema.")
+    parser.add_argument('--source', default=SOURCE_CSV,
+                        help="Referral CSV to load, or a directory / glob of per-county or per-year extracts.")
+    parser.add_argument('--db', default=DB_PATH, help="SQLite database to load into.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--incremental', action='store_true',
+                      help="Upsert only new or changed rows instead of rebuilding the tables.")
+    mode.add_argument('--stream', action='store_true',
+                      help="Chunked full load with bounded memory, for very large extracts.")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Parser processes for a directory/glob source (default: CPU count).")
+    parser.add_argument('--memory-budget-mb', type=int, default=None,
+                        help="Peak RSS budget for --stream (default 256).")
+    parser.add_argument('--columnar', choices=['parquet', 'arrow'],
+                        help="After loading, also export the star schema as Parquet (partitioned by Year) or Arrow IPC.")
+    parser.add_argument('--columnar-dir', default=None, help="Where to write the columnar store (default data/columnar).")
+    args = parser.parse_args()
+
+    import etl_multi
+    if etl_multi.is_multi_source(args.source):
+        if args.incremental or args.stream:
+            parser.error("--incremental/--stream take a single file; a directory or glob is always upserted per file")
+        etl_multi.etl_files(args.source, args.db, args.workers)
+    elif args.incremental:
+        etl_incremental(args.source, args.db)
+    elif args.stream:
+        import etl_stream
+        budget = args.memory_budget_mb or etl_stream.DEFAULT_MEMORY_BUDGET_MB
+        etl_stream.etl_stream(args.source, args.db, budget)
+    else:
+        etl_process(args.source, args.db)
+
+    # Refresh the dashboard's memory-mapped fact view snapshot (a no-op if this run changed nothing)
+    import fact_snapshot
+    with instrumentation.span('etl.snapshot'):
+        fact_snapshot.write_snapshot(args.db)
+
+    # Refit the dashboard's per-county/region/offense forecast models for this run
+    import forecasting
+    with instrumentation.span('etl.forecasts'):
+        forecasting.refresh_models(args.db)
+
+    if args.columnar:
+        import columnar_store
+        with instrumentation.span('etl.columnar_export'):
+            columnar_store.export_star_schema(args.db, args.columnar_dir or columnar_store.STORE_DIR, args.columnar)
@@ -0,0 +1,163 @@
+import pandas as pd
+import os
+
+import database
+import instrumentation
+import rollups
+
+from etl_pipeline import (
+    SOURCE_CSV, DB_PATH, FACT_COLUMNS, RAW_COLUMNS, MEASURE_DTYPES, FACT_DDL,
+    DIM_TIME_DDL, DIM_COUNTY_DDL, file_hash, row_fingerprints, load_county_meta,
+    ensure_control_tables, record_run, write_changelog, RELOAD, timestamp, db_records
+)
+from instrumentation import current_rss_mb, peak_rss_mb
+
+DEFAULT_MEMORY_BUDGET_MB = 256
+MIN_CHUNK_ROWS = 1_000
+# Share of the budget left to a single parsed chunk. The rest covers the
+# interpreter, pandas itself and the tuples built for executemany.
+CHUNK_BUDGET_SHARE = 0.1
+SAMPLE_ROWS = 1_000
+
+
+def estimate_chunk_rows(source, memory_budget_mb):
+    """Size chunks from the in-memory width of a sample so one chunk stays a fixed share of the budget."""
+    sample = pd.read_csv(source, nrows=SAMPLE_ROWS)
+    bytes_per_row = max(1, sample.memory_usage(deep=True).sum() / max(1, len(sample)))
+    # Tuples for executemany and the fingerprint strings roughly triple the frame
+    bytes_per_row *= 3
+    rows = int(memory_budget_mb * 1024 * 1024 * CHUNK_BUDGET_SHARE / bytes_per_row)
+    return max(MIN_CHUNK_ROWS, rows)
+
+
+class KeyMap:
+    """
+    Dimension key map built as the stream goes. Seeded from the existing
+    Dim table so keys are never renumbered; unseen members get the next key
+    and are written with the batch that first references them.
+    """
+
+    def __init__(self, conn, select_sql):
+        self.keys = dict(conn.execute(select_sql).fetchall())
+        self.next_id = max(self.keys.values(), default=0) + 1
+
+    def resolve(self, members):
+        new_members = []
+        for member in pd.unique(members):
+            if member not in self.keys:
+                self.keys[member] = self.next_id
+                new_members.append((member, self.next_id))
+                self.next_id += 1
+        return new_members
+
+
+@instrumentation.timed('etl.stream', rows=lambda stats: stats['rows'])
+def etl_stream(source=SOURCE_CSV, db_path=DB_PATH, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """
+    Bounded-memory full load for extracts too large for etl_process().
+
+    The CSV is read in chunks sized from the memory budget, County/Year keys
+    are resolved against in-memory key maps, and facts are written in batched
+    executemany transactions into a staging table that replaces Fact_Referrals
+    in one short transaction at the end. If RSS climbs past the budget the
+    chunk size is halved for the rest of the load.
+    """
+    print("Starting streaming ETL...")
+    started_at = timestamp()
+    source_name = os.path.basename(source)
+    chunk_rows = estimate_chunk_rows(source, memory_budget_mb)
+    print(f"Memory budget {memory_budget_mb} MB -> {chunk_rows:,} rows per chunk")
+
+    county_meta = load_county_meta()
+    regions = dict(zip(county_meta['County'], county_meta['Region']))
+    states = dict(zip(county_meta['County'], county_meta['State'])) if 'State' in county_meta else {}
+
+    conn = database.connect(db_path)
+    # Memory-mapped pages count towards RSS, and the budget is an RSS budget
+    conn.execute("PRAGMA mmap_size=0")
+    ensure_control_tables(conn)
+    with conn:
+        for ddl in (DIM_TIME_DDL, DIM_COUNTY_DDL):
+            conn.execute(ddl)
+        conn.execute("DROP TABLE IF EXISTS Fact_Referrals_Stage")
+        conn.execute(FACT_DDL.replace("Fact_Referrals", "Fact_Referrals_Stage"))
+        conn.execute("DROP TABLE IF EXISTS ETL_Row_Fingerprint_Stage")
+        conn.execute("CREATE TABLE ETL_Row_Fingerprint_Stage (County TEXT, Year INTEGER, Row_Hash TEXT)")
+
+    year_ids = KeyMap(conn, "SELECT Year, YearID FROM Dim_Time")
+    county_ids = KeyMap(conn, "SELECT County, CountyID FROM Dim_County")
+
+    placeholders = ", ".join("?" for _ in FACT_COLUMNS)
+    insert_fact = f"INSERT INTO Fact_Referrals_Stage ({', '.join(FACT_COLUMNS)}) VALUES ({placeholders})"
+
+    total_rows = 0
+    batches = 0
+    # The full load's dtypes: a chunk would otherwise infer its own (float for a count with a gap)
+    reader = pd.read_csv(source, iterator=True, header=0, names=RAW_COLUMNS, dtype=MEASURE_DTYPES)
+    while True:
+        try:
+            chunk = reader.get_chunk(chunk_rows)
+        except StopIteration:
+            break
+
+        # Transform
+        chunk['Year'] = chunk['Year'].astype(int)
+        new_years = year_ids.resolve(chunk['Year'])
+        new_counties = county_ids.resolve(chunk['County'])
+        chunk['YearID'] = chunk['Year'].map(year_ids.keys)
+        chunk['CountyID'] = chunk['County'].map(county_ids.keys)
+        chunk['Row_Hash'] = row_fingerprints(chunk)
+
+        # Load: one transaction per batch
+        with conn:
+            conn.executemany("INSERT INTO Dim_Time (Year, YearID) VALUES (?, ?)",
+                             [(int(y), k) for y, k in new_years])
+            conn.executemany(
+                "INSERT INTO Dim_County (County, Region, State, CountyID) VALUES (?, ?, ?, ?)",
+                [(c, regions.get(c, 'Unknown'), states.get(c), k) for c, k in new_counties]
+            )
+            conn.executemany(insert_fact, db_records(chunk, FACT_COLUMNS))
+            conn.executemany(
+                "INSERT INTO ETL_Row_Fingerprint_Stage (County, Year, Row_Hash) VALUES (?, ?, ?)",
+                db_records(chunk, ['County', 'Year', 'Row_Hash'])
+            )
+
+        total_rows += len(chunk)
+        batches += 1
+        del chunk
+
+        if current_rss_mb() > memory_budget_mb and chunk_rows > MIN_CHUNK_ROWS:
+            chunk_rows = max(MIN_CHUNK_ROWS, chunk_rows // 2)
+            print(f"RSS over budget, reducing chunk size to {chunk_rows:,} rows")
+
+    # Swap the staged facts in
+    print("Swapping staged facts into Fact_Referrals...")
+    digest = file_hash(source)
+    with conn, instrumentation.span('etl.swap', rows=total_rows):
+        conn.execute("DROP TABLE IF EXISTS Fact_Referrals")
+        conn.execute("ALTER TABLE Fact_Referrals_Stage RENAME TO Fact_Referrals")
+        conn.execute("CREATE INDEX idx_fact_county ON Fact_Referrals(CountyID)")
+        conn.execute("CREATE INDEX idx_fact_year ON Fact_Referrals(YearID)")
+        conn.execute("DELETE FROM ETL_Row_Fingerprint WHERE Source = ?", (source_name,))
+        conn.execute(
+            "INSERT OR REPLACE INTO ETL_Row_Fingerprint (Source, County, Year, Row_Hash) "
+            "SELECT ?, County, Year, Row_Hash FROM ETL_Row_Fingerprint_Stage", (source_name,)
+        )
+        conn.execute("DROP TABLE ETL_Row_Fingerprint_Stage")
+        rollups.refresh_rollups(conn)
+        run_id = record_run(conn, 'stream', source_name, digest, started_at, total_rows, 0, 0)
+        write_changelog(conn, run_id, [(None, None, RELOAD)])
+    conn.close()
+
+    stats = {
+        'rows': total_rows,
+        'batches': batches,
+        'counties': len(county_ids.keys),
+        'years': len(year_ids.keys),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    print(f"Streaming ETL Complete. Loaded {total_rows:,} facts in {batches} batches, "
+          f"{stats['counties']} counties, {stats['years']} years.")
+    print(f"Peak RSS: {stats['peak_rss_mb']:.1f} MB (budget {memory_budget_mb} MB)")
+    return stats
+
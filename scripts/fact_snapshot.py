@@ -0,0 +1,102 @@
+import hashlib
+import os
+
+import pandas as pd
+import pyarrow as pa
+
+import database
+
+DB_PATH = 'juvenile_justice.db'
+SNAPSHOT_PATH = os.path.join('data', 'snapshots', 'fact_view.arrow')
+CHUNK_ROWS = 250_000
+KEY_FIELD = b'snapshot_key'
+
+# The joined County/Year fact view the dashboard reads, with every column
+VIEW_SQL = """
+    SELECT f.CountyID, f.YearID, t.Year, c.County, c.Region, f.Juv_Pop,
+           f.Violent_Felony, f.Other_Felony, f.Misd, f.VOP, f.Status_Offense, f.CINS,
+           f.Total_Referrals, f.Referral_Rate, f.Unique_Youth
+    FROM Fact_Referrals f
+    JOIN Dim_County c ON f.CountyID = c.CountyID
+    JOIN Dim_Time t ON f.YearID = t.YearID
+    ORDER BY t.Year, c.County
+"""
+_INT = pa.int64()
+SCHEMA = pa.schema([
+    ('CountyID', _INT), ('YearID', _INT), ('Year', _INT), ('County', pa.string()), ('Region', pa.string()),
+    ('Juv_Pop', _INT), ('Violent_Felony', _INT), ('Other_Felony', _INT), ('Misd', _INT), ('VOP', _INT),
+    ('Status_Offense', _INT), ('CINS', _INT), ('Total_Referrals', _INT), ('Referral_Rate', pa.float64()),
+    ('Unique_Youth', _INT),
+])
+
+
+def snapshot_key(db_path=DB_PATH):
+    """
+    What the snapshot was built from: the resolved database path plus its
+    latest ETL run (RunID and Finished_At), or plus the file's content hash
+    for databases loaded before ETL_Runs existed. RunIDs restart at 1 in
+    every new database, so the run alone does not say which one it was.
+    """
+    with database.read_connection(db_path) as conn:
+        has_runs = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ETL_Runs'").fetchone()
+        run = conn.execute(
+            "SELECT RunID, Finished_At FROM ETL_Runs ORDER BY RunID DESC LIMIT 1"
+        ).fetchone() if has_runs else None
+    source = os.path.realpath(db_path)
+    if run is not None:
+        return f"{source}|run:{run[0]}|{run[1]}"
+    digest = hashlib.sha256()
+    with open(db_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return f"{source}|sha256:{digest.hexdigest()}"
+
+
+def stored_key(path=SNAPSHOT_PATH):
+    """Key recorded in an existing snapshot's schema metadata, read without loading any data."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with pa.memory_map(path) as source:
+            metadata = pa.ipc.open_file(source).schema.metadata or {}
+    except (pa.ArrowInvalid, OSError):
+        return None
+    key = metadata.get(KEY_FIELD)
+    return key.decode() if key else None
+
+
+def write_snapshot(db_path=DB_PATH, path=SNAPSHOT_PATH, force=False):
+    """
+    Write the joined fact view as one uncompressed Arrow IPC file, streamed
+    from SQLite in chunks, and atomically replace the previous snapshot.
+    Skipped when the existing snapshot already has the current key.
+    """
+    key = snapshot_key(db_path)
+    if not force and stored_key(path) == key:
+        return key
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    schema = SCHEMA.with_metadata({KEY_FIELD: key.encode()})
+    with database.read_connection(db_path) as conn, pa.OSFile(tmp_path, 'wb') as sink, \
+            pa.ipc.new_file(sink, schema) as writer:
+        for chunk in pd.read_sql(VIEW_SQL, conn, chunksize=CHUNK_ROWS):
+            writer.write_batch(pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False))
+    os.replace(tmp_path, path)
+    print(f"Fact view snapshot written to {path} ({key}).")
+    return key
+
+
+def open_snapshot(db_path=DB_PATH, path=SNAPSHOT_PATH, rebuild=True):
+    """
+    Memory-map the snapshot and return it as an Arrow Table whose buffers
+    point straight into the page cache (no parse, no copy). If it is missing
+    or was built from another database or an older ETL run it is rebuilt
+    first, or None is returned when rebuild=False.
+    """
+    if stored_key(path) != snapshot_key(db_path):
+        if not rebuild:
+            return None
+        write_snapshot(db_path, path, force=True)
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).read_all()
@@ -0,0 +1,301 @@
+import argparse
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+import database
+
+DB_PATH = 'juvenile_justice.db'
+OFFENSE_COLUMNS = ['Violent_Felony', 'Other_Felony', 'Misd', 'VOP', 'Status_Offense', 'CINS']
+MEASURES = ['Total_Referrals'] + OFFENSE_COLUMNS
+STATE = 'Texas'
+CONFIDENCE = 0.95
+MIN_OBS = 3
+# Counties whose series are loaded and fitted together
+SERIES_BATCH_COUNTIES = 1_000
+FACT_VIEW = """
+    Fact_Referrals f
+    JOIN Dim_County c ON f.CountyID = c.CountyID
+    JOIN Dim_Time t ON f.YearID = t.YearID
+"""
+
+# Smoothing parameters tried for Holt's linear trend method; every series
+# picks the pair with the lowest one-step-ahead squared error.
+HOLT_ALPHAS = np.round(np.arange(0.1, 1.0, 0.1), 2)
+HOLT_BETAS = np.round(np.arange(0.05, 1.0, 0.05), 2)
+
+# One row per fitted series per ETL run. Linear models keep what the
+# prediction interval needs (N_Obs, X_Mean, Sxx, Sigma); Holt models keep
+# their final level/trend, smoothing parameters and one-step error Sigma.
+MODEL_DDL = """
+CREATE TABLE IF NOT EXISTS Forecast_Models (
+    RunID INTEGER, Level TEXT, Entity TEXT, Measure TEXT, Method TEXT,
+    N_Obs INTEGER, Last_Year INTEGER, Last_Value REAL,
+    Slope REAL, Intercept REAL, X_Mean REAL, Sxx REAL,
+    Level_Value REAL, Trend REAL, Alpha REAL, Beta REAL, Sigma REAL,
+    PRIMARY KEY (RunID, Level, Entity, Measure, Method)
+)
+"""
+MODEL_COLUMNS = ['Level', 'Entity', 'Measure', 'Method', 'N_Obs', 'Last_Year', 'Last_Value',
+                 'Slope', 'Intercept', 'X_Mean', 'Sxx', 'Level_Value', 'Trend', 'Alpha', 'Beta', 'Sigma']
+SERIES_COLUMNS = MODEL_COLUMNS[:4]
+# Columns of project()'s output
+PROJECTION_COLUMNS = SERIES_COLUMNS + ['Year', 'Forecast', 'Lower', 'Upper']
+
+
+def _dense(rows, key, entities, years):
+    """(entity, year, measure) array of one row per entity and year, NaN where an entity has no row."""
+    cube = np.full((len(entities), len(years), len(MEASURES)), np.nan)
+    entity_idx = np.searchsorted(entities, rows[key].to_numpy())
+    cube[entity_idx, np.searchsorted(years, rows['Year'].to_numpy())] = rows[MEASURES].to_numpy(dtype=float)
+    return cube
+
+
+def _block(level, entities, cube):
+    """Labels and (series, years) values of a cube, one series per entity and measure."""
+    labels = pd.DataFrame([(level, entity, measure) for measure in MEASURES for entity in entities],
+                          columns=['Level', 'Entity', 'Measure'])
+    return labels, np.vstack([cube[:, :, m] for m in range(len(MEASURES))])
+
+
+def iter_series(conn, batch_counties=SERIES_BATCH_COUNTIES):
+    """
+    Every series in blocks of (labels, years, values), where values has shape
+    (series, years) with NaN for missing County/Year rows: the state and the
+    regions (summed in SQL), then the counties `batch_counties` at a time, so
+    memory follows the batch rather than the number of counties. Every block
+    shares the same year axis.
+    """
+    years = np.array([year for (year,) in conn.execute(
+        "SELECT Year FROM Dim_Time WHERE YearID IN (SELECT DISTINCT YearID FROM Fact_Referrals) ORDER BY Year")])
+    # SQL SUM semantics: missing rows are skipped, a year with no rows at all stays NaN
+    sums = ', '.join(f'SUM(f.{m}) AS {m}' for m in MEASURES)
+    state = pd.read_sql(f"SELECT t.Year, {sums} FROM {FACT_VIEW} GROUP BY t.Year", conn).assign(State=STATE)
+    axis = years.astype(float)
+    labels, values = _block('State', [STATE], _dense(state, 'State', np.array([STATE]), years))
+    yield labels, axis, values
+    region_rows = pd.read_sql(f"SELECT c.Region, t.Year, {sums} FROM {FACT_VIEW} GROUP BY c.Region, t.Year", conn)
+    regions = np.sort(region_rows['Region'].unique())
+    labels, values = _block('Region', regions, _dense(region_rows, 'Region', regions, years))
+    yield labels, axis, values
+
+    county_ids = pd.read_sql(
+        "SELECT CountyID FROM Dim_County WHERE CountyID IN (SELECT DISTINCT CountyID FROM Fact_Referrals) "
+        "ORDER BY County", conn)['CountyID'].tolist()
+    for start in range(0, len(county_ids), batch_counties):
+        batch = county_ids[start:start + batch_counties]
+        rows = pd.read_sql(f"""
+            SELECT c.County, t.Year, {', '.join(f'f.{m}' for m in MEASURES)}
+            FROM {FACT_VIEW} WHERE f.CountyID IN ({', '.join('?' * len(batch))})
+        """, conn, params=batch)
+        counties = np.sort(rows['County'].unique())
+        labels, values = _block('County', counties, _dense(rows, 'County', counties, years))
+        yield labels, axis, values
+
+
+def load_series(conn):
+    """
+    Every series as one dense array: (labels, years, values) where values
+    has shape (series, years). Series are each county, each region and the
+    state, for every measure.
+    """
+    blocks = list(iter_series(conn))
+    return (pd.concat([labels for labels, _, _ in blocks], ignore_index=True), blocks[0][1],
+            np.vstack([values for _, _, values in blocks]))
+
+
+def fit_linear(years, values):
+    """
+    Ordinary least squares of value on year for every row of `values` at
+    once (closed form, NaN-aware). Returns a dict of arrays, one per series.
+    """
+    mask = ~np.isnan(values)
+    n = mask.sum(axis=1)
+    x = np.broadcast_to(years, values.shape)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x_mean = np.where(mask, x, 0).sum(axis=1) / n
+        y_mean = np.where(mask, values, 0).sum(axis=1) / n
+        dx = np.where(mask, x - x_mean[:, None], 0)
+        dy = np.where(mask, values - y_mean[:, None], 0)
+        sxx = (dx * dx).sum(axis=1)
+        slope = (dx * dy).sum(axis=1) / sxx
+        intercept = y_mean - slope * x_mean
+        residuals = np.where(mask, values - (intercept[:, None] + slope[:, None] * x), 0)
+        sigma = np.sqrt((residuals ** 2).sum(axis=1) / (n - 2))
+    return {'Slope': slope, 'Intercept': intercept, 'X_Mean': x_mean, 'Sxx': sxx, 'Sigma': sigma}
+
+
+def _holt_pass(values, alpha, beta):
+    """
+    One Holt recursion over time for every (series, parameter pair) column.
+    Missing years advance the level by the trend without an update.
+    values: (series, years); alpha/beta: (pairs,). Returns level, trend, SSE, error count.
+    """
+    series, n_years = values.shape
+    first = np.argmax(~np.isnan(values), axis=1)
+    rows = np.arange(series)
+    level = np.repeat(values[rows, first][:, None], len(alpha), axis=1)
+    trend = np.zeros_like(level)
+    sse = np.zeros_like(level)
+    n_errors = np.zeros(series)
+    seen = np.zeros(series, dtype=bool)
+    for t in range(n_years):
+        y = values[:, t][:, None]
+        valid = ~np.isnan(values[:, t])
+        started = valid & (t > first)
+        # The second observation initialises the trend; later ones update it
+        init = started & ~seen
+        seen |= started
+        steps = np.maximum(t - first, 1)[:, None]
+        trend = np.where(init[:, None], (y - level) / steps, trend)
+        forecast = level + trend
+        update = (started & ~init)[:, None]
+        error = np.where(update, y - forecast, 0)
+        sse += error ** 2
+        n_errors += update[:, 0]
+        # Before the first observation forecast == level, so this is a no-op there
+        new_level = np.where(update, alpha * y + (1 - alpha) * forecast, np.where(init[:, None], y, forecast))
+        trend = np.where(update, beta * (new_level - level) + (1 - beta) * trend, trend)
+        level = new_level
+    return level, trend, sse, n_errors
+
+
+def fit_holt(years, values):
+    """
+    Holt's linear trend exponential smoothing for every series at once,
+    choosing alpha/beta per series from a grid by one-step squared error.
+    """
+    alpha, beta = (grid.ravel() for grid in np.meshgrid(HOLT_ALPHAS, HOLT_BETAS))
+    filled = np.where(np.isnan(values).all(axis=1)[:, None], 0, values)
+    level, trend, sse, n_errors = _holt_pass(filled, alpha, beta)
+    best = np.argmin(sse, axis=1)
+    rows = np.arange(len(values))
+    level, trend = level[rows, best], trend[rows, best]
+    # Trailing missing years only advanced the level by the trend; wind it
+    # back so the level belongs to the series' own last observed year
+    last_idx = values.shape[1] - 1 - np.argmax(~np.isnan(values[:, ::-1]), axis=1)
+    level -= (years[-1] - years[last_idx]) * trend
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sigma = np.sqrt(sse[rows, best] / n_errors)
+    return {'Level_Value': level, 'Trend': trend, 'Alpha': alpha[best], 'Beta': beta[best], 'Sigma': sigma}
+
+
+def fit_series(labels, years, values):
+    """Fit both methods to a block of series. Returns one row per series and method."""
+    mask = ~np.isnan(values)
+    n_obs = mask.sum(axis=1)
+    last_idx = values.shape[1] - 1 - np.argmax(mask[:, ::-1], axis=1)
+    rows = np.arange(len(values))
+    common = labels.assign(N_Obs=n_obs, Last_Year=years[last_idx].astype(int), Last_Value=values[rows, last_idx])
+    models = []
+    for method, params in (('linear', fit_linear(years, values)), ('holt', fit_holt(years, values))):
+        models.append(common.assign(Method=method, **params))
+    models = pd.concat(models, ignore_index=True).reindex(columns=MODEL_COLUMNS)
+    # Too short to fit a trend with an error estimate
+    return models[models['N_Obs'] >= MIN_OBS].reset_index(drop=True)
+
+
+def fit_models(conn):
+    """Fit both methods to every State/Region/County x measure series. Returns one row per series and method."""
+    return pd.concat([fit_series(*block) for block in iter_series(conn)], ignore_index=True)
+
+
+def latest_run_id(conn):
+    has_runs = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ETL_Runs'").fetchone()
+    return conn.execute("SELECT MAX(RunID) FROM ETL_Runs").fetchone()[0] if has_runs else None
+
+
+def refresh_models(db_path=DB_PATH):
+    """
+    Fit every series and store the parameters under the latest ETL RunID,
+    replacing older runs, one block of series at a time. A no-op when this
+    run is already cached.
+    """
+    conn = database.connect(db_path)
+    try:
+        conn.execute(MODEL_DDL)
+        run_id = latest_run_id(conn) or 0
+        if conn.execute("SELECT 1 FROM Forecast_Models WHERE RunID = ? LIMIT 1", (run_id,)).fetchone():
+            return run_id
+        fitted = 0
+        with conn:
+            conn.execute("DELETE FROM Forecast_Models")
+            # One block of series at a time: fitted, written and dropped
+            for block in iter_series(conn):
+                models = fit_series(*block)
+                conn.executemany(
+                    f"INSERT INTO Forecast_Models (RunID, {', '.join(MODEL_COLUMNS)}) "
+                    f"VALUES (?, {', '.join('?' * len(MODEL_COLUMNS))})",
+                    ((run_id, *row) for row in models.astype(object).where(models.notna(), None)
+                     .itertuples(index=False))
+                )
+                fitted += len(models)
+        print(f"Fitted {fitted:,} forecast models for ETL run {run_id}.")
+        return run_id
+    finally:
+        conn.close()
+
+
+def load_models(db_path=DB_PATH):
+    """
+    The cached parameters for the latest ETL run, fitted in memory if they
+    are missing (e.g. a read-only database loaded before this module existed).
+    """
+    with database.read_connection(db_path) as conn:
+        run_id = latest_run_id(conn) or 0
+        has_table = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'Forecast_Models'").fetchone()
+        if has_table:
+            models = pd.read_sql(f"SELECT {', '.join(MODEL_COLUMNS)} FROM Forecast_Models WHERE RunID = ?",
+                                 conn, params=(run_id,))
+            if not models.empty:
+                return models
+        return fit_models(conn)
+
+
+def project(models, years, confidence=CONFIDENCE):
+    """
+    Point forecasts and prediction intervals for `years` from fitted model
+    rows (any mix of series and methods), vectorized over rows and years.
+    Linear intervals use Student's t with N_Obs - 2 degrees of freedom;
+    Holt intervals use the normal approximation of the h-step error variance.
+    No rows (e.g. a filter matching no fitted series) project to an empty frame.
+    """
+    from scipy import stats
+
+    years = np.asarray(years, dtype=float)
+    if models.empty or not len(years):
+        return pd.DataFrame(columns=PROJECTION_COLUMNS)
+    m = {col: models[col].to_numpy(dtype=float)[:, None] for col in
+         ['N_Obs', 'Last_Year', 'Slope', 'Intercept', 'X_Mean', 'Sxx', 'Level_Value', 'Trend', 'Alpha', 'Beta', 'Sigma']}
+    linear = (models['Method'] == 'linear').to_numpy()[:, None]
+    tail = (1 + confidence) / 2
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        lin_point = m['Intercept'] + m['Slope'] * years
+        lin_se = m['Sigma'] * np.sqrt(1 + 1 / m['N_Obs'] + (years - m['X_Mean']) ** 2 / m['Sxx'])
+        lin_half = stats.t.ppf(tail, m['N_Obs'] - 2) * lin_se
+
+        h = np.maximum(years - m['Last_Year'], 1)
+        holt_point = m['Level_Value'] + h * m['Trend']
+        # Var(h-step error) = sigma^2 * (1 + sum_{j=1}^{h-1} alpha^2 (1 + j beta)^2)
+        j = np.arange(1, int(h.max()))
+        terms = (m['Alpha'] ** 2 * (1 + j * m['Beta']) ** 2)[:, None, :] * (j < h[..., None])
+        holt_half = NormalDist().inv_cdf(tail) * m['Sigma'] * np.sqrt(1 + terms.sum(axis=2))
+
+    point = np.where(linear, lin_point, holt_point)
+    half = np.where(linear, lin_half, holt_half)
+    out = models[SERIES_COLUMNS].loc[models.index.repeat(len(years))].reset_index(drop=True)
+    out['Year'] = np.tile(years.astype(int), len(models))
+    out['Forecast'] = point.ravel()
+    out['Lower'] = (point - half).ravel()
+    out['Upper'] = (point + half).ravel()
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit and cache forecasts for every county, region and offense series.")
+    parser.add_argument('--db', default=DB_PATH)
+    args = parser.parse_args()
+    refresh_models(args.db)
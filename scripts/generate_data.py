@@ -2,23 +2,28 @@ import pandas as pd
 import numpy as np
 import random
 from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+import argparse
 import os
+import time
 
 # Set random seed for reproducibility
 np.random.seed(42)
 random.seed(42)
 
+PROGRAMS_DATA = {
+    'ProgramID': ['P001', 'P002', 'P003', 'P004', 'P005'],
+    'ProgramName': ['Aggression Replacement Training', 'Functional Family Therapy', 'Mentoring 101', 'Substance Abuse Education', 'Vocational Skills'],
+    'ProgramType': ['CBT', 'Family Therapy', 'Mentoring', 'Education', 'Vocational'],
+    'Capacity': [20, 15, 50, 30, 25]
+}
+
 def generate_data():
     print("Generating synthetic data...")
     
     # 1. Programs Data
     # ----------------
-    programs_data = {
-        'ProgramID': ['P001', 'P002', 'P003', 'P004', 'P005'],
-        'ProgramName': ['Aggression Replacement Training', 'Functional Family Therapy', 'Mentoring 101', 'Substance Abuse Education', 'Vocational Skills'],
-        'ProgramType': ['CBT', 'Family Therapy', 'Mentoring', 'Education', 'Vocational'],
-        'Capacity': [20, 15, 50, 30, 25]
-    }
+    programs_data = PROGRAMS_DATA
     df_programs = pd.DataFrame(programs_data)
     
     # 2. Clients Data
@@ -106,5 +111,204 @@ def generate_data():
     print(f"  - clients.csv: {len(df_clients)} records (with duplicates and missing DOBs)")
     print(f"  - events.csv: {len(df_events)} records (with date logic errors and orphan records)")
 
+
+# --------------------------
+# Scalable generator (load testing)
+# --------------------------
+PROGRAM_IDS = np.array(PROGRAMS_DATA['ProgramID'])
+GENDERS = np.array(['M', 'F', 'M', 'M', 'F'])
+RACES = np.array(['White', 'Black', 'Hispanic', 'Asian', 'Other'])
+STATUSES = np.array(['Completed', 'Active', 'Dropped', 'Transferred'])
+
+# Flaw rates of the original 500-client / 800-event set, as fractions of rows
+FLAW_RATES = {
+    'duplicate_clients': 5 / 500,   # extra rows repeating an existing ClientID
+    'missing_dob': 10 / 500,
+    'reversed_dates': 5 / 800,      # EndDate before StartDate (non-active events)
+    'orphan_events': 10 / 800,      # ClientID not in Clients
+    'invalid_programs': 5 / 800,    # ProgramID 'P999'
+}
+
+DOB_START = np.datetime64('2005-01-01')
+EVENT_START = np.datetime64('2023-01-01')
+
+
+def _ids(prefix, numbers, width):
+    return np.char.add(prefix, np.char.zfill(numbers.astype(str), width))
+
+
+def _date_strings(origin, first_day, last_day):
+    """ISO strings for every day offset in [first_day, last_day]; indexing this is far cheaper than formatting per row."""
+    return np.datetime_as_string(origin + np.arange(first_day, last_day + 1).astype('timedelta64[D]'), unit='D')
+
+
+# Every date the generator can emit, as offsets from their origin
+DOB_STRINGS = _date_strings(DOB_START, 0, 365 * 6)
+EVENT_DATE_STRINGS = _date_strings(EVENT_START, -10, 365 + 180)
+EVENT_DATE_OFFSET = 10
+
+
+def _client_chunk(rng, first, count, n_clients, rates):
+    numbers = np.arange(first, first + count)
+    # Duplicates repeat a random earlier ID of the same range
+    n_dupes = rng.binomial(count, rates['duplicate_clients'])
+    numbers = np.concatenate([numbers, rng.choice(numbers, n_dupes)])
+    n = len(numbers)
+
+    dob = DOB_STRINGS[rng.integers(0, len(DOB_STRINGS), n)]
+    dob[rng.random(n) < rates['missing_dob']] = ''
+    rows = np.arange(n) + first - 1
+    return pd.DataFrame({
+        'ClientID': _ids('C', numbers, max(5, len(str(n_clients)))),
+        'LastName': np.char.add('Last', rows.astype(str)),
+        'FirstName': np.char.add('First', rows.astype(str)),
+        'Gender': GENDERS[rng.integers(0, len(GENDERS), n)],
+        'Race': RACES[rng.integers(0, len(RACES), n)],
+        'DOB': dob,
+    })
+
+
+def _event_chunk(rng, first, count, n_clients, n_events, rates):
+    client_numbers = rng.integers(1, n_clients + 1, count)
+    # Orphans point just past the last generated client
+    orphans = rng.random(count) < rates['orphan_events']
+    client_numbers[orphans] = n_clients + rng.integers(1, 11, orphans.sum())
+
+    program_ids = PROGRAM_IDS[rng.integers(0, len(PROGRAM_IDS), count)]
+    program_ids[rng.random(count) < rates['invalid_programs']] = 'P999'
+
+    status = STATUSES[rng.integers(0, len(STATUSES), count)]
+    start_days = rng.integers(0, 366, count)
+    end_days = start_days + rng.integers(1, 181, count)
+    reversed_dates = (status != 'Active') & (rng.random(count) < rates['reversed_dates'])
+    end_days[reversed_dates] = start_days[reversed_dates] - rng.integers(1, 11, reversed_dates.sum())
+    end_dates = np.where(status == 'Active', '', EVENT_DATE_STRINGS[end_days + EVENT_DATE_OFFSET])
+
+    return pd.DataFrame({
+        'EventID': _ids('E', np.arange(first, first + count), max(6, len(str(n_events)))),
+        'ClientID': _ids('C', client_numbers, max(5, len(str(n_clients)))),
+        'ProgramID': program_ids,
+        'StartDate': EVENT_DATE_STRINGS[start_days + EVENT_DATE_OFFSET],
+        'Status': status,
+        'EndDate': end_dates,
+    })
+
+
+
+def _write_frames(frames, path, fmt):
+    """Append chunks to one shard file so a shard never has to fit in memory."""
+    rows = 0
+    if fmt == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        writer = None
+        try:
+            for frame in frames:
+                # Empty strings are missing values; store them as Parquet nulls
+                table = pa.Table.from_pandas(frame.mask(frame == ''), preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+                rows += len(frame)
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        for i, frame in enumerate(frames):
+            frame.to_csv(path, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+            rows += len(frame)
+    return rows
+
+
+def _generate_shard(task):
+    """
+    Worker entry point: generate one shard of Clients or Events. The RNG is
+    seeded from (seed, table, shard) so output does not depend on the number
+    of workers or the order shards finish in.
+    """
+    table, shard, first, count, n_clients, n_events, seed, rates, fmt, path, chunk_rows = task
+    rng = np.random.default_rng([seed, 0 if table == 'clients' else 1, shard])
+
+    def frames():
+        for offset in range(0, count, chunk_rows):
+            size = min(chunk_rows, count - offset)
+            if table == 'clients':
+                yield _client_chunk(rng, first + offset, size, n_clients, rates)
+            else:
+                yield _event_chunk(rng, first + offset, size, n_clients, n_events, rates)
+
+    return table, path, _write_frames(frames(), path, fmt)
+
+
+def generate_data_scaled(n_clients, n_events, output_dir=os.path.join('data', 'generated'), shards=None,
+                         workers=None, fmt='csv', seed=42, flaw_rates=None, chunk_rows=500_000):
+    """
+    Generate Clients/Events at load-testing scale (10M+ clients, 100M+ events).
+
+    Each table is split into `shards` ID ranges written in parallel by a
+    process pool, one file per shard (output_dir/clients/part-00000.csv, ...),
+    each streamed in chunks of `chunk_rows`. All columns are drawn with
+    vectorized NumPy calls; flaws are injected at `flaw_rates` (see
+    FLAW_RATES). programs.csv is the same five programs as generate_data().
+    """
+    if fmt not in ('csv', 'parquet'):
+        raise ValueError(f"Unknown format: {fmt}")
+    rates = {**FLAW_RATES, **(flaw_rates or {})}
+    workers = workers or os.cpu_count()
+    shards = shards or workers
+    print(f"Generating {n_clients:,} clients and {n_events:,} events "
+          f"({shards} shards per table, {workers} workers, {fmt})...")
+
+    os.makedirs(output_dir, exist_ok=True)
+    pd.DataFrame(PROGRAMS_DATA).to_csv(os.path.join(output_dir, 'programs.csv'), index=False)
+
+    tasks = []
+    for table, total in (('clients', n_clients), ('events', n_events)):
+        table_dir = os.path.join(output_dir, table)
+        os.makedirs(table_dir, exist_ok=True)
+        first = 1
+        for shard, count in enumerate(np.array_split(np.arange(total), shards)):
+            if len(count) == 0:
+                continue
+            path = os.path.join(table_dir, f"part-{shard:05d}.{fmt}")
+            tasks.append((table, shard, first, len(count), n_clients, n_events, seed, rates, fmt, path, chunk_rows))
+            first += len(count)
+
+    start = time.perf_counter()
+    totals = {'clients': 0, 'events': 0}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for table, path, rows in pool.map(_generate_shard, tasks):
+            totals[table] += rows
+    elapsed = time.perf_counter() - start
+
+    rows = sum(totals.values())
+    print(f"Data generation complete in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/sec). "
+          f"Files saved to {output_dir}/")
+    print(f"  - clients/: {totals['clients']:,} records (with duplicates and missing DOBs)")
+    print(f"  - events/: {totals['events']:,} records (with date logic errors, orphans and invalid programs)")
+    return totals
+
+
 if __name__ == "__main__":
-    generate_data()
+    parser = argparse.ArgumentParser(description="Generate the synthetic Programs/Clients/Events data.")
+    parser.add_argument('--clients', type=int,
+                        help="Scalable mode: number of clients (without the injected duplicates).")
+    parser.add_argument('--events', type=int, help="Scalable mode: number of events.")
+    parser.add_argument('--output-dir', default=os.path.join('data', 'generated'))
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--shards', type=int, help="Shard files per table (default: one per worker).")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: CPU count).")
+    parser.add_argument('--seed', type=int, default=42)
+    for flaw, rate in FLAW_RATES.items():
+        parser.add_argument(f"--{flaw.replace('_', '-')}-rate", dest=flaw, type=float, default=rate)
+    args = parser.parse_args()
+
+    if args.clients is None and args.events is None:
+        # The small demo set shipped in data/
+        generate_data()
+    else:
+        generate_data_scaled(
+            args.clients or 500, args.events or 800, output_dir=args.output_dir, shards=args.shards,
+            workers=args.workers, fmt=args.format, seed=args.seed,
+            flaw_rates={flaw: getattr(args, flaw) for flaw in FLAW_RATES}
+        )
@@ -1,10 +1,16 @@
 import pandas as pd
 import os
 
-def generate_metadata():
-    # Load raw data to get list of counties
-    df = pd.read_csv('TJJD_-_County_Level_Referral_Data__FY_2013-2021.csv')
-    counties = df['County'].unique()
+def generate_metadata(source='TJJD_-_County_Level_Referral_Data__FY_2013-2021.csv', chunksize=100_000):
+    # Collect the list of counties, reading only that column in chunks so very
+    # large extracts never have to fit in memory
+    counties = []
+    seen = set()
+    for chunk in pd.read_csv(source, usecols=['County'], chunksize=chunksize):
+        for county in chunk['County'].unique():
+            if county not in seen:
+                seen.add(county)
+                counties.append(county)
     
     # Simple mapping logic for demo purposes (Texas Regions)
     # in a real scenario, we'd use a real lookup table/shapefile
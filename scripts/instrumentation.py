@@ -0,0 +1,256 @@
+import argparse
+import cProfile
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import wraps
+from typing import Optional
+
+import pandas as pd
+
+# Every span (an ETL stage, a DQ scan or rule, a dashboard loader) appends one
+# JSON line to METRICS_PATH: duration, row count and memory change.
+# TJJD_METRICS=0 turns recording off. TJJD_PROFILE=cprofile and/or
+# tracemalloc (comma-separated) also profiles each outermost span of a thread
+# into PROFILE_DIR: a .prof file for `python -m pstats` or snakeviz, and the
+# top allocation sites as text.
+METRICS_PATH = os.environ.get('TJJD_METRICS_PATH', os.path.join('docs', 'metrics.jsonl'))
+ENABLED = os.environ.get('TJJD_METRICS', '1') != '0'
+PROFILE = {mode.strip() for mode in os.environ.get('TJJD_PROFILE', '').lower().split(',') if mode.strip()}
+PROFILE_DIR = os.environ.get('TJJD_PROFILE_DIR', os.path.join('docs', 'profiles'))
+TOP_ALLOCATIONS = 25
+
+METRIC_COLUMNS = ['Run', 'Program', 'Component', 'Span', 'Parent', 'Thread', 'Started_At', 'Seconds', 'Rows',
+                  'RSS_MB', 'RSS_Delta_MB', 'Traced_Delta_MB', 'Traced_Peak_MB', 'Status', 'Profile', 'Attrs']
+
+# One run per process: an ETL invocation, a DQ audit, a dashboard server
+RUN_ID = f"{datetime.now():%Y%m%dT%H%M%S}-{os.getpid()}"
+PROGRAM = os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else 'python'
+
+if 'tracemalloc' in PROFILE and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+_local = threading.local()
+_write_lock = threading.Lock()
+
+
+def current_rss_mb():
+    """Resident set size of this process right now (Linux), falling back to the peak."""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+@dataclass
+class Span:
+    """An open span. Set `rows` (or add to `attrs`) inside the block to record them."""
+    name: str
+    component: str
+    rows: Optional[int] = None
+    attrs: dict = field(default_factory=dict)
+
+
+def _stack():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+def _write(record):
+    os.makedirs(os.path.dirname(METRICS_PATH) or '.', exist_ok=True)
+    line = json.dumps(record, default=str)
+    with _write_lock, open(METRICS_PATH, 'a') as f:
+        f.write(line + '\n')
+
+
+def _profile_path(name, suffix):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    safe = "".join(ch if ch.isalnum() or ch in '._-' else '_' for ch in name)
+    return os.path.join(PROFILE_DIR, f"{RUN_ID}-{safe}{suffix}")
+
+
+def _save_allocations(name):
+    stats = tracemalloc.take_snapshot().statistics('lineno')[:TOP_ALLOCATIONS]
+    path = _profile_path(name, '-alloc.txt')
+    with open(path, 'w') as f:
+        f.write("\n".join(str(stat) for stat in stats) + "\n")
+    return path
+
+
+def _mb(value):
+    return round(value / (1024 * 1024), 3)
+
+
+def _record(current, parent, started_at, seconds, rss_start, status, traced=None, profile=None):
+    rss_end = current_rss_mb()
+    record = {
+        'Run': RUN_ID,
+        'Program': PROGRAM,
+        'Component': current.component,
+        'Span': current.name,
+        'Parent': parent,
+        'Thread': threading.current_thread().name,
+        'Started_At': started_at,
+        'Seconds': round(seconds, 6),
+        'Rows': int(current.rows) if current.rows is not None else None,
+        'RSS_MB': round(rss_end, 1),
+        'RSS_Delta_MB': round(rss_end - rss_start, 3) if rss_start is not None else None,
+        'Traced_Delta_MB': None,
+        'Traced_Peak_MB': None,
+        'Status': status,
+        'Profile': profile,
+        'Attrs': current.attrs or None,
+    }
+    if traced is not None:
+        record['Traced_Delta_MB'], record['Traced_Peak_MB'] = traced
+    _write(record)
+
+
+@contextmanager
+def span(name, component=None, rows=None, **attrs):
+    """
+    Time a block: `with span('etl.load', rows=len(df)) as s: ...`. Spans
+    nest per thread (the enclosing span is recorded as Parent, and its
+    component is inherited). The memory delta is the process RSS change, so
+    spans running in parallel threads see each other's allocations.
+    """
+    stack = _stack()
+    parent = stack[-1] if stack else None
+    current = Span(name, component or (parent.component if parent else name.split('.')[0]), rows, dict(attrs))
+    if not ENABLED:
+        yield current
+        return
+
+    outermost = parent is None
+    profiler = None
+    if outermost and 'cprofile' in PROFILE:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    tracing = tracemalloc.is_tracing()
+    if outermost and tracing:
+        # The peak is process-wide; only an outermost span resets it
+        tracemalloc.reset_peak()
+    traced_start = tracemalloc.get_traced_memory()[0] if tracing else None
+    rss_start = current_rss_mb()
+    started_at = datetime.now().isoformat(timespec='milliseconds')
+    start = time.perf_counter()
+    stack.append(current)
+    status = 'ok'
+    try:
+        yield current
+    except BaseException as exc:
+        status = f"error: {type(exc).__name__}"
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        stack.pop()
+        profiles = []
+        if profiler is not None:
+            profiler.disable()
+            path = _profile_path(name, '.prof')
+            profiler.dump_stats(path)
+            profiles.append(path)
+        traced = None
+        if tracing:
+            traced_now, traced_peak = tracemalloc.get_traced_memory()
+            traced = (_mb(traced_now - traced_start), _mb(traced_peak) if outermost else None)
+            if outermost:
+                profiles.append(_save_allocations(name))
+        _record(current, parent.name if parent else None, started_at, seconds, rss_start, status,
+                traced, ";".join(profiles) or None)
+
+
+def timed(name=None, component=None, rows=None):
+    """
+    Decorator form of span(), named after the function by default. `rows`
+    maps the return value to its row count (e.g. `rows=len`).
+    """
+    def decorator(func):
+        label = name or f"{func.__module__}.{func.__qualname__}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(label, component) as current:
+                result = func(*args, **kwargs)
+                if rows is not None:
+                    current.rows = rows(result)
+                return result
+        return wrapper
+    return decorator
+
+
+def record(name, seconds, component=None, rows=None, **attrs):
+    """Record a duration measured elsewhere (e.g. a DQ rule timed by the engine) as a span."""
+    if not ENABLED:
+        return
+    stack = _stack()
+    parent = stack[-1] if stack else None
+    current = Span(name, component or (parent.component if parent else name.split('.')[0]), rows, dict(attrs))
+    started_at = datetime.now().isoformat(timespec='milliseconds')
+    _record(current, parent.name if parent else None, started_at, seconds, None, 'ok')
+
+
+# --------------------------
+# Reading the metrics back
+# --------------------------
+def load_metrics(path=METRICS_PATH):
+    """Every recorded span, oldest first. Lines cut short by a crash are skipped."""
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=METRIC_COLUMNS)
+    rows = []
+    with open(path) as f:
+        for line in f:
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    metrics = pd.DataFrame(rows, columns=METRIC_COLUMNS)
+    metrics['Started_At'] = pd.to_datetime(metrics['Started_At'])
+    return metrics
+
+
+def summarize(metrics, last_runs=None):
+    """Per span: runs seen, last, median and max seconds, last row count and largest RSS growth."""
+    if last_runs is not None:
+        runs = metrics.drop_duplicates('Run', keep='last')['Run'].tail(last_runs)
+        metrics = metrics[metrics['Run'].isin(runs)]
+    if metrics.empty:
+        return pd.DataFrame(columns=['Component', 'Span', 'Runs', 'Calls', 'Last_s', 'Median_s', 'Max_s',
+                                     'Last_Rows', 'Max_RSS_Delta_MB'])
+    summary = metrics.groupby(['Component', 'Span'], sort=False).agg(
+        Runs=('Run', 'nunique'),
+        Calls=('Seconds', 'size'),
+        Last_s=('Seconds', 'last'),
+        Median_s=('Seconds', 'median'),
+        Max_s=('Seconds', 'max'),
+        Last_Rows=('Rows', 'last'),
+        Max_RSS_Delta_MB=('RSS_Delta_MB', 'max'),
+    ).reset_index()
+    return summary.sort_values('Max_s', ascending=False, ignore_index=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize the spans recorded in the metrics file.")
+    parser.add_argument('--metrics', default=METRICS_PATH)
+    parser.add_argument('--component', help="Only spans of this component (etl, dq, dashboard, create_db).")
+    parser.add_argument('--last-runs', type=int, help="Only the most recent N runs.")
+    args = parser.parse_args()
+
+    metrics = load_metrics(args.metrics)
+    if args.component:
+        metrics = metrics[metrics['Component'] == args.component]
+    print(summarize(metrics, args.last_runs).round(4).to_string(index=False))
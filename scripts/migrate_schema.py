@@ -0,0 +1,253 @@
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import pandas as pd
+
+import database
+import instrumentation
+
+DB_PATH = 'juvenile_justice.db'
+BENCH_PATH = os.path.join('docs', 'schema_benchmark.csv')
+
+# PRAGMA user_version of a migrated database. 0 is create_db.py's schema:
+# untyped TEXT dates, no Clients key, no foreign keys or Events indexes.
+SCHEMA_VERSION = 1
+
+# STRICT tables reject values of the wrong type instead of storing them
+# anyway; dates are integers (YYYYMMDD), so range filters, ordering and
+# month grouping are integer comparisons on an index. Foreign keys are
+# declared for documentation and PRAGMA foreign_key_check; SQLite only
+# enforces them on connections that turn PRAGMA foreign_keys on.
+STRICT_DDL = {
+    'Programs': """
+        CREATE TABLE Programs_New (
+            ProgramID TEXT PRIMARY KEY NOT NULL, ProgramName TEXT, ProgramType TEXT, Capacity INTEGER
+        ) STRICT
+    """,
+    'Clients': """
+        CREATE TABLE Clients_New (
+            ClientID TEXT PRIMARY KEY NOT NULL, LastName TEXT, FirstName TEXT, Gender TEXT, Race TEXT, DOB INTEGER
+        ) STRICT
+    """,
+    'Events': """
+        CREATE TABLE Events_New (
+            EventID TEXT PRIMARY KEY NOT NULL,
+            ClientID TEXT REFERENCES Clients(ClientID),
+            ProgramID TEXT REFERENCES Programs(ProgramID),
+            StartDate INTEGER, Status TEXT, EndDate INTEGER
+        ) STRICT
+    """,
+}
+# Client rows that could not keep their ClientID as a key: repeats of an
+# earlier row (the first row by load order stays in Clients) or no ID at all
+DUPLICATES_DDL = """
+    CREATE TABLE Clients_Duplicates (
+        RowID INTEGER PRIMARY KEY, ClientID TEXT, LastName TEXT, FirstName TEXT, Gender TEXT, Race TEXT,
+        DOB INTEGER, Reason TEXT NOT NULL
+    ) STRICT
+"""
+INDEXES = [
+    "CREATE INDEX idx_events_client ON Events(ClientID)",
+    "CREATE INDEX idx_events_program_status ON Events(ProgramID, Status)",
+    "CREATE INDEX idx_events_start ON Events(StartDate)",
+]
+
+
+def date_key(column):
+    """SQL turning an ISO 'YYYY-MM-DD' text column into YYYYMMDD; anything else becomes NULL."""
+    return (f"CASE WHEN {column} GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]' "
+            f"THEN CAST(REPLACE({column}, '-', '') AS INTEGER) END")
+
+
+def _unparsed_dates(conn, table, column):
+    return conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {column} IS NOT NULL AND {column} != '' "
+                        f"AND ({date_key(column)}) IS NULL").fetchone()[0]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+@instrumentation.timed('schema.migrate')
+def migrate(db_path=DB_PATH, check_fks=None):
+    """
+    Move Programs/Clients/Events to the STRICT schema in one transaction:
+    integer dates, ClientID as the Clients primary key (duplicates set aside
+    in Clients_Duplicates), declared foreign keys and the Events indexes.
+    check_fks='report' lists orphaned Events rows; 'enforce' rolls the
+    migration back if there are any. Already migrated databases are left as is.
+    """
+    conn = database.connect(db_path, isolation_level=None)
+    try:
+        if schema_version(conn) >= SCHEMA_VERSION:
+            print(f"{db_path} is already at schema version {schema_version(conn)}.")
+            return {}
+
+        start = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        unparsed = {f"{table}.{column}": _unparsed_dates(conn, table, column)
+                    for table, column in (('Clients', 'DOB'), ('Events', 'StartDate'), ('Events', 'EndDate'))}
+
+        for ddl in STRICT_DDL.values():
+            conn.execute(ddl)
+        conn.execute(DUPLICATES_DDL)
+        conn.execute("""
+            INSERT INTO Programs_New (ProgramID, ProgramName, ProgramType, Capacity)
+            SELECT ProgramID, ProgramName, ProgramType, CAST(Capacity AS INTEGER) FROM Programs
+        """)
+        # First row per ClientID (by rowid, i.e. load order) keeps the key
+        conn.execute(f"""
+            INSERT INTO Clients_New (ClientID, LastName, FirstName, Gender, Race, DOB)
+            SELECT ClientID, LastName, FirstName, Gender, Race, {date_key('DOB')} FROM Clients
+            WHERE rowid IN (SELECT MIN(rowid) FROM Clients WHERE ClientID IS NOT NULL GROUP BY ClientID)
+        """)
+        conn.execute(f"""
+            INSERT INTO Clients_Duplicates (RowID, ClientID, LastName, FirstName, Gender, Race, DOB, Reason)
+            SELECT rowid, ClientID, LastName, FirstName, Gender, Race, {date_key('DOB')},
+                   CASE WHEN ClientID IS NULL THEN 'missing_id' ELSE 'duplicate' END
+            FROM Clients
+            WHERE rowid NOT IN (SELECT MIN(rowid) FROM Clients WHERE ClientID IS NOT NULL GROUP BY ClientID)
+        """)
+        conn.execute(f"""
+            INSERT INTO Events_New (EventID, ClientID, ProgramID, StartDate, Status, EndDate)
+            SELECT EventID, ClientID, ProgramID, {date_key('StartDate')}, Status, {date_key('EndDate')} FROM Events
+        """)
+
+        for table in STRICT_DDL:
+            conn.execute(f"DROP TABLE {table}")
+            conn.execute(f"ALTER TABLE {table}_New RENAME TO {table}")
+        for ddl in INDEXES:
+            conn.execute(ddl)
+
+        violations = foreign_key_violations(conn) if check_fks else None
+        if check_fks == 'enforce' and not violations.empty:
+            conn.execute("ROLLBACK")
+            print(violations.to_string(index=False))
+            raise ValueError(f"{int(violations['Rows'].sum())} Events rows reference missing parents; "
+                             f"migration rolled back.")
+
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.execute("COMMIT")
+        conn.execute("ANALYZE")
+
+        counts = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                  for table in list(STRICT_DDL) + ['Clients_Duplicates']}
+        print(f"Migrated to schema version {SCHEMA_VERSION} in {time.perf_counter() - start:.2f}s: "
+              + ", ".join(f"{table} {rows:,}" for table, rows in counts.items()))
+        for column, rows in unparsed.items():
+            if rows:
+                print(f"  {rows:,} {column} values were not ISO dates and are now NULL.")
+        if violations is not None:
+            if violations.empty:
+                print("Foreign key check: no orphaned Events rows.")
+            else:
+                print("Foreign key check (orphaned Events rows):")
+                print(violations.to_string(index=False))
+        return counts
+    finally:
+        conn.close()
+
+
+def foreign_key_violations(conn):
+    """Events rows whose ClientID/ProgramID has no parent row, counted per referenced table."""
+    rows = conn.execute("PRAGMA foreign_key_check(Events)").fetchall()
+    violations = pd.DataFrame(rows, columns=['Table', 'RowID', 'Parent', 'FK_Index'])
+    return violations.groupby('Parent').size().rename('Rows').reset_index()
+
+
+# --------------------------
+# Before/after benchmark
+# --------------------------
+# The same question against each schema: (create_db.py schema SQL, migrated SQL)
+BENCH_QUERIES = {
+    'Dashboard join (all events)': (
+        """SELECT e.*, p.ProgramName, p.ProgramType, p.Capacity, c.LastName, c.FirstName, c.Gender, c.Race, c.DOB
+           FROM Events e LEFT JOIN Programs p ON e.ProgramID = p.ProgramID
+           LEFT JOIN Clients c ON e.ClientID = c.ClientID""",
+    ) * 2,
+    'Events of one client': ("SELECT * FROM Events WHERE ClientID = 'C00042'",) * 2,
+    'Enrollments by program/status': ("SELECT ProgramID, Status, COUNT(*) FROM Events GROUP BY ProgramID, Status",) * 2,
+    'Completed in one program': ("SELECT COUNT(*) FROM Events WHERE ProgramID = 'P003' AND Status = 'Completed'",) * 2,
+    'Started in a quarter': (
+        "SELECT COUNT(*) FROM Events WHERE StartDate BETWEEN '2023-04-01' AND '2023-06-30'",
+        "SELECT COUNT(*) FROM Events WHERE StartDate BETWEEN 20230401 AND 20230630",
+    ),
+    'Monthly enrollment trend': (
+        "SELECT substr(StartDate, 1, 7) AS Month, COUNT(*) FROM Events GROUP BY Month",
+        "SELECT StartDate / 100 AS Month, COUNT(*) FROM Events GROUP BY Month",
+    ),
+}
+
+
+def _time_queries(db_path, migrated, repeat):
+    timings = {}
+    conn = database.connect(db_path, read_only=True)
+    try:
+        for name, queries in BENCH_QUERIES.items():
+            sql = queries[1 if migrated else 0]
+            runs = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                conn.execute(sql).fetchall()
+                runs.append(time.perf_counter() - start)
+            timings[name] = statistics.median(runs) * 1000
+    finally:
+        conn.close()
+    return timings
+
+
+def benchmark(db_path=DB_PATH, repeat=20):
+    """
+    Median query times on a copy of an unmigrated database, before and after
+    migrating the copy. The database itself is not modified.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        copy_path = os.path.join(tmp, 'bench.db')
+        source = database.connect(db_path, read_only=True)
+        target = database.connect(copy_path)
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+        conn = database.connect(copy_path)
+        try:
+            if schema_version(conn) >= SCHEMA_VERSION:
+                raise ValueError(f"{db_path} is already migrated; benchmark an unmigrated database.")
+            # Planner statistics on both sides (migrate() analyzes the migrated tables)
+            conn.execute("ANALYZE")
+        finally:
+            conn.close()
+
+        before = _time_queries(copy_path, False, repeat)
+        migrate(copy_path)
+        after = _time_queries(copy_path, True, repeat)
+
+    report = pd.DataFrame({'Query': list(before), 'Before_ms': list(before.values()), 'After_ms': list(after.values())})
+    report['Speedup'] = (report['Before_ms'] / report['After_ms']).round(1)
+    report[['Before_ms', 'After_ms']] = report[['Before_ms', 'After_ms']].round(3)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate Programs/Clients/Events to the STRICT, indexed schema.")
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--check-fks', choices=['report', 'enforce'],
+                        help="List Events rows with a missing client/program, or abort the migration if there are any.")
+    parser.add_argument('--bench', action='store_true',
+                        help="Time a query set before and after migrating a copy of the database (the database is left as is).")
+    parser.add_argument('--repeat', type=int, default=20, help="Runs per query in --bench (the median is reported).")
+    parser.add_argument('--output', default=BENCH_PATH)
+    args = parser.parse_args()
+
+    if args.bench:
+        report = benchmark(args.db, args.repeat)
+        print(report.to_string(index=False))
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        report.to_csv(args.output, index=False)
+        print(f"\nBenchmark saved to {args.output}")
+    else:
+        migrate(args.db, args.check_fks)
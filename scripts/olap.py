@@ -0,0 +1,342 @@
+import argparse
+import os
+import threading
+from collections import OrderedDict
+from itertools import combinations
+
+import pandas as pd
+
+import database
+import instrumentation
+from compact_facts import compact_fact_view, read_dim_county
+
+DB_PATH = 'juvenile_justice.db'
+MEMORY_LIMIT_MB = float(os.environ.get('TJJD_CUBE_MEMORY_MB', '64'))
+
+# A data cube over the County/Year fact view. Each cuboid holds partial
+# aggregates (sums, row counts, rate sums) for one combination of the
+# grouping dimensions, so any coarser roll-up is a further sum of a finer
+# cuboid. County implies its Region (and CountyID), and Year its YearID, so
+# those travel with them instead of multiplying the lattice. Offense is not
+# a cuboid key: it unpivots the six offense sums of whatever cuboid answers
+# the query into (Offense, Count) rows.
+DIMENSIONS = ['Year', 'Region', 'County', 'Offense']
+GROUP_DIMENSIONS = ['Year', 'Region', 'County']
+# Key columns each grouping dimension brings into a cuboid
+DIMENSION_COLUMNS = {'Year': ['Year', 'YearID'], 'Region': ['Region'], 'County': ['Region', 'County', 'CountyID']}
+ATTRIBUTES = {'YearID': 'Year', 'CountyID': 'County'}
+OFFENSE_COLUMNS = ['Violent_Felony', 'Other_Felony', 'Misd', 'VOP', 'Status_Offense', 'CINS']
+SUM_MEASURES = ['Juv_Pop'] + OFFENSE_COLUMNS + ['Total_Referrals', 'Unique_Youth']
+# Rows per cell, and the sum and count of the non-NULL referral rates
+PARTIAL_COUNTS = ['Rows', 'Rate_Sum', 'Rate_N']
+# Measures derived from the partial aggregates: the number of County/Year
+# rows in a cell and the mean of their referral rates (the county's own rate
+# at County x Year grain, Agg_State_Year.Avg_Referral_Rate at Year grain)
+DERIVED_MEASURES = ['County_Count', 'Referral_Rate']
+OFFENSE_MEASURE = 'Count'
+# Offense types sort (and chart) in column order
+OFFENSE_TYPE = pd.CategoricalDtype(OFFENSE_COLUMNS, ordered=True)
+MEASURES = SUM_MEASURES + DERIVED_MEASURES + [OFFENSE_MEASURE]
+BASE_COLUMNS = ['YearID', 'Year', 'CountyID', 'County', 'Region'] + SUM_MEASURES + ['Referral_Rate']
+
+
+def _canonical(dims):
+    """A cuboid key: grouping dimensions in lattice order, with Region whenever County is there."""
+    dims = set(dims) | ({'Region'} if 'County' in dims else set())
+    return tuple(dim for dim in GROUP_DIMENSIONS if dim in dims)
+
+
+# Every distinct cuboid, finest first
+LATTICE = sorted({_canonical(combo) for size in range(len(GROUP_DIMENSIONS) + 1)
+                  for combo in combinations(GROUP_DIMENSIONS, size)}, key=len, reverse=True)
+
+
+def _key_columns(cuboid):
+    return list(dict.fromkeys(col for dim in cuboid for col in DIMENSION_COLUMNS[dim]))
+
+
+def _rollup(frame, keys):
+    """Sum partial aggregates over everything but `keys`."""
+    if not keys:
+        row = {m: frame[m].sum(min_count=1) for m in SUM_MEASURES}
+        row.update({m: frame[m].sum() for m in PARTIAL_COUNTS})
+        return pd.DataFrame([row])
+    grouped = frame.groupby(keys, sort=True, observed=True, dropna=False)
+    # min_count=1: a cell whose values are all NULL stays NULL, as SUM() does in SQL
+    result = grouped[SUM_MEASURES].sum(min_count=1)
+    result[PARTIAL_COUNTS] = grouped[PARTIAL_COUNTS].sum()
+    return result.reset_index()
+
+
+# Fact view expressions of the key columns, for the grouped SQL
+SQL_COLUMNS = {'Year': 't.Year', 'YearID': 'f.YearID', 'Region': 'c.Region', 'County': 'c.County',
+               'CountyID': 'f.CountyID'}
+
+
+def partials_sql(cuboid, filters=None):
+    """
+    SELECT (and its parameters) computing the partial aggregates of `cuboid`
+    inside SQLite: the fact view cut to `filters` ({dimension: values}) and
+    grouped by the cuboid's key columns, so only its cells are read.
+    """
+    keys = _key_columns(cuboid)
+    select = [f"{SQL_COLUMNS[col]} AS {col}" for col in keys] + \
+        [f"SUM(f.{m}) AS {m}" for m in SUM_MEASURES] + \
+        ["COUNT(*) AS Rows", "TOTAL(f.Referral_Rate) AS Rate_Sum", "COUNT(f.Referral_Rate) AS Rate_N"]
+    conditions, params = [], []
+    for dim, values in (filters or {}).items():
+        conditions.append(f"{SQL_COLUMNS[dim]} IN ({', '.join('?' for _ in values)})")
+        params += list(values)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    group_by = f"GROUP BY {', '.join(SQL_COLUMNS[col] for col in keys)}" if keys else ""
+    sql = f"""
+        SELECT {', '.join(select)}
+        FROM Fact_Referrals f
+        JOIN Dim_County c ON f.CountyID = c.CountyID
+        JOIN Dim_Time t ON f.YearID = t.YearID
+        {where} {group_by}
+    """
+    return sql, params
+
+
+# Cuboids the ETL already materializes (scripts/rollups.py), partials included
+ROLLUP_CUBOIDS = {('Year',): 'Agg_State_Year', ('Year', 'Region'): 'Agg_Region_Year'}
+
+
+def rollup_table(cuboid):
+    """The smallest rollup table holding `cuboid` or a finer cuboid it rolls up from, or None."""
+    sources = [key for key in ROLLUP_CUBOIDS if set(cuboid) <= set(key)]
+    return ROLLUP_CUBOIDS[min(sources, key=len)] if sources else None
+
+
+def rollup_partials(cuboid, rollup, dim_time, filters=None):
+    """
+    The partial aggregates of `cuboid` from its rollup table (see
+    rollup_table), with YearID from `dim_time`, cut to `filters`; None if
+    the table is missing (`rollup` None) or predates the partial columns, on
+    a database the ETL has not loaded since.
+    """
+    if rollup is None or not {'Rate_Sum', 'Rate_N'} <= set(rollup.columns):
+        return None
+    frame = rollup.rename(columns={'County_Count': 'Rows'}).merge(dim_time[['Year', 'YearID']], on='Year', how='left')
+    for dim, values in (filters or {}).items():
+        frame = frame[frame[dim].isin(values)]
+    return _rollup(frame, _key_columns(cuboid))
+
+
+def arrow_partials(table, cuboid, filters=None):
+    """
+    The partial aggregates of `cuboid` from an Arrow table of fact view rows
+    (see BASE_COLUMNS) cut to `filters`, grouped by Arrow so only the
+    cuboid's cells become a DataFrame. Same NULL handling as partials_sql.
+    """
+    import pyarrow.compute as pc
+    for dim, values in (filters or {}).items():
+        table = table.filter(pc.field(dim).isin(list(values)))
+    keys = _key_columns(cuboid)
+    grouped = table.group_by(keys).aggregate(
+        [(m, 'sum') for m in SUM_MEASURES] + [([], 'count_all'), ('Referral_Rate', 'sum'), ('Referral_Rate', 'count')]
+    )
+    names = dict({f"{m}_sum": m for m in SUM_MEASURES},
+                 count_all='Rows', Referral_Rate_sum='Rate_Sum', Referral_Rate_count='Rate_N')
+    frame = grouped.rename_columns([names.get(col, col) for col in grouped.column_names]).to_pandas()
+    frame['Rate_Sum'] = frame['Rate_Sum'].astype(float).fillna(0.0)
+    return frame[keys + SUM_MEASURES + PARTIAL_COUNTS]
+
+
+def _normalize_filters(filters):
+    return {dim: list(values) if isinstance(values, (list, tuple, set)) else [values]
+            for dim, values in (filters or {}).items()}
+
+
+def _slice(cuboid, filters):
+    """The part of `filters` on `cuboid`'s own dimensions, as a hashable (dimension, values) tuple."""
+    return tuple((dim, tuple(sorted(set(filters[dim])))) for dim in cuboid if dim in filters)
+
+
+def _covers(key, cuboid, filters):
+    """Whether the resident (cuboid, slice) `key` holds every cell of `cuboid` that `filters` selects."""
+    source, sliced = key
+    return set(cuboid) <= set(source) and \
+        all(dim in filters and set(filters[dim]) <= set(values) for dim, values in sliced)
+
+
+def _label(key):
+    cuboid, sliced = key
+    label = 'x'.join(cuboid) or 'all'
+    return label + ''.join(f"[{dim}={','.join(map(str, values))}]" for dim, values in sliced)
+
+
+class Cube:
+    """
+    Cuboids of the fact view, computed on demand and kept in an LRU bounded
+    by `memory_limit_mb` (deep memory of the frames). A query is answered
+    from the smallest resident cuboid that has every dimension it groups or
+    filters by, else from a finer one rolled up and cached, else from
+    `loader(cuboid, filters)`, which reads that cuboid's partials from its
+    rollup table or aggregates them in the storage (see rollup_partials,
+    partials_sql and arrow_partials). Loads are cut to the query's filters
+    on the cuboid's dimensions (e.g. one Year of the County x Year cuboid)
+    and cached as that slice, which then answers any query within it.
+    Thread-safe: the dashboard's sessions and prefetcher share one cube per
+    data version.
+    """
+
+    def __init__(self, loader, memory_limit_mb=MEMORY_LIMIT_MB):
+        self.loader = loader
+        self.memory_limit = int(memory_limit_mb * 1024 * 1024)
+        # (cuboid, slice) -> (frame, bytes), least recently used first; the slice is () for a whole cuboid
+        self.cuboids = OrderedDict()
+        self.stats = {'hits': 0, 'rollups': 0, 'loads': 0, 'evictions': 0}
+        self.lock = threading.RLock()
+
+    @property
+    def memory_bytes(self):
+        return sum(size for _, size in self.cuboids.values())
+
+    def _store(self, key, frame):
+        size = int(frame.memory_usage(deep=True).sum())
+        if size > self.memory_limit:
+            # Larger than the whole budget: answer from it, but do not keep it
+            return
+        self.cuboids[key] = (frame, size)
+        while self.memory_bytes > self.memory_limit:
+            evicted, _ = self.cuboids.popitem(last=False)
+            self.stats['evictions'] += 1
+            instrumentation.record('olap.evict', 0.0, cuboid=_label(evicted))
+
+    def _cuboid(self, cuboid, filters):
+        """
+        A frame of `cuboid` holding (at least) the cells `filters` selects:
+        resident, rolled up from the smallest resident superset, or loaded.
+        """
+        with self.lock:
+            sources = [key for key in self.cuboids if _covers(key, cuboid, filters)]
+            if not sources:
+                key = (cuboid, _slice(cuboid, filters))
+                with instrumentation.span('olap.load', cuboid=_label(key)) as load:
+                    frame = self.loader(cuboid, dict(key[1]))
+                    load.rows = len(frame)
+                self.stats['loads'] += 1
+                self._store(key, frame)
+                return frame
+            source = min(sources, key=lambda key: len(self.cuboids[key][0]))
+            self.cuboids.move_to_end(source)
+            parent = self.cuboids[source][0]
+            if source[0] == cuboid:
+                self.stats['hits'] += 1
+                return parent
+            key = (cuboid, source[1])
+            with instrumentation.span('olap.rollup', rows=len(parent), cuboid=_label(key), source=_label(source)):
+                frame = _rollup(parent, _key_columns(cuboid))
+            self.stats['rollups'] += 1
+            self._store(key, frame)
+            return frame
+
+    def materialize(self, cuboids=None):
+        """Precompute cuboids (default: the whole lattice, finest first so each rolls up from its parent)."""
+        for cuboid in cuboids or LATTICE:
+            self._cuboid(_canonical(cuboid), {})
+        return self
+
+    def query(self, measures, by=(), filters=None, order_by=None, ascending=False, limit=None):
+        """
+        Aggregate `measures` grouped by `by` (dimensions and their
+        attributes: Year, YearID, Region, County, CountyID, Offense) over the
+        cells matching `filters` ({dimension: value or list of values}).
+        Rows come sorted by `by`, or ranked by `order_by` (then cut to `limit`).
+        The Count measure needs Offense in `by` or `filters`; the other
+        measures cannot be combined with Offense.
+        """
+        measures, by = list(measures), list(by)
+        filters = _normalize_filters(filters)
+        unknown = [m for m in measures if m not in MEASURES] + \
+            [d for d in by + list(filters) if d not in DIMENSIONS and d not in ATTRIBUTES]
+        if unknown:
+            raise ValueError(f"Unknown measure or dimension: {', '.join(map(str, unknown))}")
+        by_offense = 'Offense' in by or 'Offense' in filters
+        if by_offense and any(m != OFFENSE_MEASURE for m in measures):
+            raise ValueError("Only the Count measure can be broken down by Offense")
+        if OFFENSE_MEASURE in measures and not by_offense:
+            raise ValueError("The Count measure needs Offense in `by` or `filters`")
+
+        cuboid = _canonical({ATTRIBUTES.get(d, d) for d in by + list(filters)} - {'Offense'})
+        frame = self._cuboid(cuboid, filters)
+        for dim, values in filters.items():
+            if dim != 'Offense':
+                frame = frame[frame[dim].isin(values)]
+        group_by = [d for d in by if d != 'Offense']
+        if group_by != _key_columns(cuboid):
+            # Filtered-on dimensions (and unrequested attributes) are summed away
+            frame = _rollup(frame, group_by)
+
+        if by_offense:
+            offenses = [o for o in OFFENSE_COLUMNS if o in filters.get('Offense', OFFENSE_COLUMNS)]
+            frame = frame.melt(id_vars=group_by, value_vars=offenses, var_name='Offense', value_name=OFFENSE_MEASURE)
+            frame['Offense'] = frame['Offense'].astype(OFFENSE_TYPE)
+        else:
+            frame = frame.assign(County_Count=frame['Rows'],
+                                 Referral_Rate=frame['Rate_Sum'] / frame['Rate_N'].where(frame['Rate_N'] > 0))
+
+        result = frame[by + measures]
+        if by:
+            result = result.sort_values(by, kind='stable')
+        if order_by is not None:
+            if order_by not in by + measures:
+                raise ValueError(f"order_by must be one of the selected columns: {order_by}")
+            result = result.sort_values(order_by, ascending=ascending, kind='stable', na_position='last')
+        if limit is not None:
+            result = result.head(int(limit))
+        return result.reset_index(drop=True)
+
+    def resident(self):
+        """Cached cuboids, least recently used first: dimensions, slice, cells and memory."""
+        with self.lock:
+            return pd.DataFrame({
+                'Cuboid': [' x '.join(cuboid) or '(all)' for cuboid, _ in self.cuboids],
+                'Slice': [', '.join(f"{dim}={','.join(map(str, values))}" for dim, values in sliced)
+                          for _, sliced in self.cuboids],
+                'Cells': [len(frame) for frame, _ in self.cuboids.values()],
+                'KB': [round(size / 1024, 1) for _, size in self.cuboids.values()],
+            })
+
+
+def sqlite_loader(db_path=DB_PATH):
+    """
+    Loader reading each cuboid from its rollup table, or else aggregating
+    it in SQLite (see partials_sql), in the compact format.
+    """
+    def load(cuboid, filters):
+        with database.read_connection(db_path) as conn:
+            frame, table = None, rollup_table(cuboid)
+            if table:
+                exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                      (table,)).fetchone()
+                rollup = pd.read_sql(f"SELECT * FROM {table}", conn) if exists else None
+                frame = rollup_partials(cuboid, rollup, pd.read_sql("SELECT Year, YearID FROM Dim_Time", conn), filters)
+            if frame is None:
+                sql, params = partials_sql(cuboid, filters)
+                frame = pd.read_sql(sql, conn, params=params)
+            return compact_fact_view(frame, read_dim_county(conn))
+    return load
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Materialize the fact view cube and run a query against it.")
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--memory-mb', type=float, default=MEMORY_LIMIT_MB, help="Memory ceiling of the cuboid cache.")
+    parser.add_argument('--measures', nargs='+', default=['Total_Referrals'])
+    parser.add_argument('--by', nargs='*', default=['Year'])
+    parser.add_argument('--filter', nargs=2, action='append', metavar=('DIMENSION', 'VALUE'), default=[],
+                        help="Restrict a dimension to a value (repeat for more values or dimensions).")
+    parser.add_argument('--order-by')
+    parser.add_argument('--limit', type=int)
+    args = parser.parse_args()
+
+    filters = {}
+    for dim, value in args.filter:
+        filters.setdefault(dim, []).append(int(value) if dim in ('Year', 'YearID', 'CountyID') else value)
+    cube = Cube(sqlite_loader(args.db), args.memory_mb).materialize()
+    print(cube.query(args.measures, args.by, filters, args.order_by, limit=args.limit).to_string(index=False))
+    print(f"\nResident cuboids ({cube.memory_bytes / 1024:,.1f} KB of {args.memory_mb:,.0f} MB):")
+    print(cube.resident().to_string(index=False))
@@ -0,0 +1,166 @@
+import pandas as pd
+
+import analytics
+
+OFFENSE_COLUMNS = ['Violent_Felony', 'Other_Felony', 'Misd', 'VOP', 'Status_Offense', 'CINS']
+# Counties read per batch by the volatility refresh
+VOLATILITY_BATCH_COUNTIES = 2_000
+
+# Small, precomputed tables the dashboard reads instead of re-aggregating the
+# fact table on every rerun. All are keyed so they can be refreshed per year
+# (state/region) or per county (volatility). The state and region rollups are
+# also the Year and Year x Region cuboids of the dashboard's OLAP cube
+# (scripts/olap.py), so they carry its partial aggregates: the sum and count
+# of the non-NULL referral rates next to the sums.
+ROLLUP_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS Agg_State_Year (
+        Year INTEGER PRIMARY KEY, County_Count INTEGER, Juv_Pop INTEGER,
+        Violent_Felony INTEGER, Other_Felony INTEGER, Misd INTEGER, VOP INTEGER,
+        Status_Offense INTEGER, CINS INTEGER, Total_Referrals INTEGER,
+        Avg_Referral_Rate REAL, Unique_Youth INTEGER, Rate_Sum REAL, Rate_N INTEGER
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Agg_Region_Year (
+        Region TEXT, Year INTEGER, County_Count INTEGER, Juv_Pop INTEGER,
+        Total_Referrals INTEGER, Unique_Youth INTEGER,
+        Violent_Felony INTEGER, Other_Felony INTEGER, Misd INTEGER, VOP INTEGER,
+        Status_Offense INTEGER, CINS INTEGER, Rate_Sum REAL, Rate_N INTEGER,
+        PRIMARY KEY (Region, Year)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Agg_County_Volatility (
+        CountyID INTEGER PRIMARY KEY, County TEXT, Region TEXT, Volatility_Score REAL
+    )
+    """,
+]
+# Columns the state and region rollups gained after their first release; a
+# database without them gets them, and a full refresh, on its next load
+ADDED_COLUMNS = {
+    'Agg_State_Year': [('Rate_Sum', 'REAL'), ('Rate_N', 'INTEGER')],
+    'Agg_Region_Year': [(col, 'INTEGER') for col in OFFENSE_COLUMNS] + [('Rate_Sum', 'REAL'), ('Rate_N', 'INTEGER')],
+}
+# Rollups no longer built: Agg_Offense_Year was Agg_State_Year's offense sums in long format
+RETIRED_TABLES = ['Agg_Offense_Year']
+
+FACT_VIEW = """
+    Fact_Referrals f
+    JOIN Dim_County c ON f.CountyID = c.CountyID
+    JOIN Dim_Time t ON f.YearID = t.YearID
+"""
+_OFFENSE_SUMS = {col: f"SUM(f.{col})" for col in OFFENSE_COLUMNS}
+_RATE_PARTIALS = {'Rate_Sum': "TOTAL(f.Referral_Rate)", 'Rate_N': "COUNT(f.Referral_Rate)"}
+# State and region rollups: GROUP BY keys, and each column's expression over the fact view
+YEAR_ROLLUPS = {
+    'Agg_State_Year': (['t.Year'], {
+        'Year': "t.Year", 'County_Count': "COUNT(*)", 'Juv_Pop': "SUM(f.Juv_Pop)", **_OFFENSE_SUMS,
+        'Total_Referrals': "SUM(f.Total_Referrals)", 'Avg_Referral_Rate': "AVG(f.Referral_Rate)",
+        'Unique_Youth': "SUM(f.Unique_Youth)", **_RATE_PARTIALS,
+    }),
+    'Agg_Region_Year': (['c.Region', 't.Year'], {
+        'Region': "c.Region", 'Year': "t.Year", 'County_Count': "COUNT(*)", 'Juv_Pop': "SUM(f.Juv_Pop)",
+        'Total_Referrals': "SUM(f.Total_Referrals)", 'Unique_Youth': "SUM(f.Unique_Youth)",
+        **_OFFENSE_SUMS, **_RATE_PARTIALS,
+    }),
+}
+
+
+def _scope(conn, name, values):
+    """Load the refresh scope into a TEMP table and return a WHERE fragment, or '1=1' for a full refresh."""
+    if values is None:
+        return "1=1"
+    conn.execute(f"DROP TABLE IF EXISTS temp.{name}")
+    conn.execute(f"CREATE TEMP TABLE {name} (Value PRIMARY KEY)")
+    conn.executemany(f"INSERT OR IGNORE INTO temp.{name} (Value) VALUES (?)", [(int(v),) for v in values])
+    return f"IN (SELECT Value FROM temp.{name})"
+
+
+def _add_missing_columns(conn):
+    """Bring older rollup tables up to ROLLUP_DDL; True if any column was added."""
+    added = False
+    for table, columns in ADDED_COLUMNS.items():
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        for name, sql_type in columns:
+            if name not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {sql_type}")
+                added = True
+    return added
+
+
+def year_rollup_sql(table, fact_where=""):
+    """
+    SELECT computing the rows of Agg_State_Year or Agg_Region_Year from the
+    fact view, with the table's column names; `fact_where` limits the years.
+    """
+    keys, columns = YEAR_ROLLUPS[table]
+    select = ", ".join(f"{expr} AS {name}" for name, expr in columns.items())
+    return f"SELECT {select} FROM {FACT_VIEW} {fact_where} GROUP BY {', '.join(keys)}"
+
+
+def _refresh_year_rollups(conn, years):
+    year_filter = _scope(conn, 'rollup_years', years)
+    where = "WHERE 1=1" if years is None else f"WHERE Year {year_filter}"
+    fact_where = "" if years is None else f"WHERE t.Year {year_filter}"
+
+    for table, (_, columns) in YEAR_ROLLUPS.items():
+        conn.execute(f"DELETE FROM {table} {where}")
+        conn.execute(f"INSERT INTO {table} ({', '.join(columns)}) {year_rollup_sql(table, fact_where)}")
+
+
+def _refresh_volatility(conn, county_ids):
+    """
+    Volatility per county, read VOLATILITY_BATCH_COUNTIES counties at a time
+    so a full refresh holds one batch of facts in memory, not the table. Every
+    batch shares the fact table's year axis, as a whole-table matrix would.
+    """
+    years = [year for (year,) in conn.execute(
+        "SELECT Year FROM Dim_Time WHERE YearID IN (SELECT DISTINCT YearID FROM Fact_Referrals) ORDER BY Year")]
+    if county_ids is None:
+        conn.execute("DELETE FROM Agg_County_Volatility")
+        county_ids = [county_id for (county_id,) in conn.execute("SELECT CountyID FROM Dim_County ORDER BY CountyID")]
+    county_ids = sorted(int(county_id) for county_id in county_ids)
+
+    for start in range(0, len(county_ids), VOLATILITY_BATCH_COUNTIES):
+        county_filter = _scope(conn, 'rollup_counties', county_ids[start:start + VOLATILITY_BATCH_COUNTIES])
+        conn.execute(f"DELETE FROM Agg_County_Volatility WHERE CountyID {county_filter}")
+        df = pd.read_sql(f"""
+            SELECT f.CountyID, c.County, c.Region, t.Year, f.Total_Referrals
+            FROM {FACT_VIEW} WHERE f.CountyID {county_filter}
+        """, conn)
+
+        # Std dev of the year-over-year % change, as on the Risk & Hotspots page
+        # (a jump from 0 referrals is an infinite change and leaves the score undefined)
+        matrix = analytics.CountyYearMatrix.from_frame(df, ['Total_Referrals'], key='CountyID', years=years)
+        volume = matrix.values['Total_Referrals']
+        volatility = pd.DataFrame({
+            'CountyID': matrix.keys, 'County': matrix.names, 'Region': matrix.regions,
+            'Volatility_Score': analytics.nan_std(analytics.yoy_change(volume, analytics.previous_year(volume)), axis=1),
+        })
+        volatility['Volatility_Score'] = volatility['Volatility_Score'].astype(object).where(
+            volatility['Volatility_Score'].notna(), None)
+        conn.executemany(
+            "INSERT INTO Agg_County_Volatility (CountyID, County, Region, Volatility_Score) VALUES (?, ?, ?, ?)",
+            volatility[['CountyID', 'County', 'Region', 'Volatility_Score']].astype(object)
+            .itertuples(index=False, name=None)
+        )
+
+
+def refresh_rollups(conn, years=None, county_ids=None):
+    """
+    Rebuild the Agg_* tables from Fact_Referrals. With no arguments every
+    rollup is rebuilt; otherwise only the given years (state and region
+    rollups) and counties (volatility) are recomputed. Runs inside the
+    caller's transaction.
+    """
+    for table in RETIRED_TABLES:
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+    for ddl in ROLLUP_DDL:
+        conn.execute(ddl)
+    if _add_missing_columns(conn):
+        years = None
+    if years is None or len(years):
+        _refresh_year_rollups(conn, years)
+    if county_ids is None or len(county_ids):
+        _refresh_volatility(conn, county_ids)
@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The scripts and the dashboard import their siblings by module name
+sys.path[:0] = [os.path.join(ROOT, 'scripts'), os.path.join(ROOT, 'dashboard')]
+# Test runs (and the loads they start in child interpreters) do not append to docs/metrics.jsonl
+os.environ['TJJD_METRICS'] = '0'
+
+
+@pytest.fixture(autouse=True)
+def repo_root(monkeypatch):
+    """Run from the repository root, where the source CSV and metadata paths resolve."""
+    monkeypatch.chdir(ROOT)
@@ -0,0 +1,47 @@
+import shutil
+
+import pandas as pd
+import pytest
+
+import data_access as dal
+import database
+import etl_pipeline
+
+SORT_KEYS = {'Agg_State_Year': ['Year'], 'Agg_Region_Year': ['Region', 'Year'], 'Agg_County_Volatility': ['CountyID']}
+
+
+@pytest.fixture
+def databases(tmp_path, monkeypatch):
+    """(loaded, shipped): an ETL-loaded database, and a copy without the rollups the ETL adds."""
+    loaded, shipped = str(tmp_path / 'loaded.db'), str(tmp_path / 'shipped.db')
+    etl_pipeline.etl_process(db_path=loaded)
+    shutil.copy(loaded, shipped)
+    conn = database.connect(shipped)
+    with conn:
+        for table in dal.ROLLUP_TABLES:
+            conn.execute(f"DROP TABLE {table}")
+    conn.close()
+    monkeypatch.setattr(dal, 'STORAGE', 'sqlite')
+    yield loaded, shipped
+    database.close_pools()
+
+
+def read_with(monkeypatch, db_path, fetch, *args):
+    monkeypatch.setattr(dal, 'DB_PATH', db_path)
+    return fetch(*args)
+
+
+@pytest.mark.parametrize('table', dal.ROLLUP_TABLES)
+def test_missing_rollups_are_computed_from_the_facts(databases, monkeypatch, table):
+    loaded, shipped = databases
+    built, computed = (read_with(monkeypatch, db, dal.fetch_rollup, table).sort_values(SORT_KEYS[table], ignore_index=True)
+                       for db in (loaded, shipped))
+    pd.testing.assert_frame_equal(computed, built, check_dtype=False, check_exact=False, rtol=1e-9)
+
+
+def test_cube_slices_without_rollups(databases, monkeypatch):
+    loaded, shipped = databases
+    for measures, by in ([['Total_Referrals', 'Referral_Rate', 'County_Count'], ['Year']],
+                         [['Total_Referrals'], ['Year', 'Region']]):
+        built, computed = (read_with(monkeypatch, db, dal.fetch_slice, measures, by) for db in (loaded, shipped))
+        pd.testing.assert_frame_equal(computed, built, check_exact=False, rtol=1e-9)
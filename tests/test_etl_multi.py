@@ -0,0 +1,73 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import etl_multi
+
+SOURCE = 'TJJD_-_County_Level_Referral_Data__FY_2013-2021.csv'
+DUPLICATED = ['ANDERSON', 'ANDREWS']
+
+
+def write_drop(directory):
+    """One file per year, plus extra.csv repeating two 2021 counties with different counts."""
+    raw = pd.read_csv(SOURCE)
+    for year, rows in raw.groupby('Calendar Year'):
+        rows.to_csv(directory / f"y{year}.csv", index=False)
+    extra = raw[(raw['Calendar Year'] == 2021) & raw['County'].isin(DUPLICATED)].copy()
+    extra['Referrals'] += 1000
+    extra.to_csv(directory / 'extra.csv', index=False)
+    return raw
+
+
+def fact_2021(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return dict(conn.execute(
+            "SELECT c.County, f.Total_Referrals FROM Fact_Referrals f "
+            "JOIN Dim_County c ON c.CountyID = f.CountyID JOIN Dim_Time t ON t.YearID = f.YearID "
+            "WHERE t.Year = 2021"
+        ).fetchall())
+
+
+def load(drop, tmp_path):
+    result = etl_multi.etl_files(str(drop), str(tmp_path / 'multi.db'), workers=2, report_path=str(tmp_path / 'report.csv'))
+    return result, pd.read_csv(tmp_path / 'report.csv').set_index('File')
+
+
+def sources_2021(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute(
+            "SELECT DISTINCT Source FROM ETL_Row_Fingerprint WHERE Year = 2021 AND County IN (?, ?)", DUPLICATED
+        ).fetchall()
+
+
+@pytest.mark.parametrize('batch_files', [1, etl_multi.BATCH_FILES], ids=['across-batches', 'same-batch'])
+def test_county_year_in_two_files_is_kept_by_the_first_path(tmp_path, monkeypatch, batch_files):
+    monkeypatch.setattr(etl_multi, 'BATCH_FILES', batch_files)
+    drop = tmp_path / 'drop'
+    drop.mkdir()
+    write_drop(drop)
+    db_path = str(tmp_path / 'multi.db')
+    extra = pd.read_csv(drop / 'extra.csv').set_index('County')['Referrals']
+
+    # extra.csv sorts before y2021.csv, so it keeps ANDERSON and ANDREWS 2021 however the workers finish
+    result, report = load(drop, tmp_path)
+    assert report.loc['extra.csv', 'Status'] == 'loaded'
+    assert report.loc['y2021.csv', 'Status'] == 'failed', report.to_string()
+    assert result['failed'] == ['y2021.csv']
+    assert 'already loaded from extra.csv' in report.loc['y2021.csv', 'Error']
+    loaded = fact_2021(db_path)
+    assert all(loaded[county] == extra[county] for county in DUPLICATED)
+    assert len(loaded) == len(extra)
+    assert sources_2021(db_path) == [('extra.csv',)]
+
+    # Only the losing file changes: extra.csv is skipped as unchanged but still holds its County/Years
+    edited = pd.read_csv(drop / 'y2021.csv')
+    edited['Referrals'] += 1
+    edited.to_csv(drop / 'y2021.csv', index=False)
+    result, report = load(drop, tmp_path)
+    assert report.loc['extra.csv', 'Status'] == 'unchanged'
+    assert result['failed'] == ['y2021.csv']
+    assert 'already loaded from extra.csv' in report.loc['y2021.csv', 'Error']
+    assert all(fact_2021(db_path)[county] == extra[county] for county in DUPLICATED)
+    assert sources_2021(db_path) == [('extra.csv',)]
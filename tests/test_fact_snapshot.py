@@ -0,0 +1,24 @@
+import pandas as pd
+
+import database
+import etl_pipeline
+import fact_snapshot
+
+
+def test_snapshot_of_another_database_is_rebuilt(tmp_path):
+    full_db, small_db = str(tmp_path / 'full.db'), str(tmp_path / 'small.db')
+    source = str(tmp_path / 'small.csv')
+    raw = pd.read_csv(etl_pipeline.SOURCE_CSV)
+    raw[raw['Calendar Year'] == 2021].to_csv(source, index=False)
+    etl_pipeline.etl_process(db_path=full_db)
+    etl_pipeline.etl_process(source, small_db)
+    snapshot = str(tmp_path / 'fact_view.arrow')
+
+    try:
+        # Both databases are at their first ETL run
+        fact_snapshot.write_snapshot(full_db, snapshot)
+        assert fact_snapshot.open_snapshot(small_db, snapshot, rebuild=False) is None
+        assert fact_snapshot.open_snapshot(small_db, snapshot).num_rows == (raw['Calendar Year'] == 2021).sum()
+        assert fact_snapshot.stored_key(snapshot) == fact_snapshot.snapshot_key(small_db)
+    finally:
+        database.close_pools()
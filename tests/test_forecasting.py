@@ -0,0 +1,9 @@
+import pandas as pd
+
+import forecasting
+
+
+def test_no_models_project_to_an_empty_frame():
+    models = pd.DataFrame(columns=forecasting.MODEL_COLUMNS)
+    projected = forecasting.project(models, [2022, 2023])
+    assert projected.empty and list(projected.columns) == forecasting.PROJECTION_COLUMNS
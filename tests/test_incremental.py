@@ -0,0 +1,99 @@
+import os
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import database
+import etl_pipeline
+import run_checks
+
+ROLLUP_KEYS = {'Agg_State_Year': ['Year'], 'Agg_Region_Year': ['Region', 'Year'], 'Agg_County_Volatility': ['CountyID']}
+FACT_VIEW_SQL = """
+    SELECT c.County, t.Year, f.* FROM Fact_Referrals f
+    JOIN Dim_County c ON f.CountyID = c.CountyID JOIN Dim_Time t ON f.YearID = t.YearID
+    ORDER BY c.County, t.Year
+"""
+
+
+def edit_extract(path):
+    """
+    Change the extract the way a resubmission does: inflate one county-year
+    (offense sum and YoY rules on it and the next year), break another's
+    Unique Youth rule, and add a year.
+    """
+    raw = pd.read_csv(path)
+    harris = (raw['County'] == 'HARRIS') & (raw['Calendar Year'] == 2019)
+    raw.loc[harris, 'Referrals'] *= 3
+    anderson = (raw['County'] == 'ANDERSON') & (raw['Calendar Year'] == 2021)
+    raw.loc[anderson, 'Youth Referred'] = raw.loc[anderson, 'Referrals'] + 5
+    new_year = raw[raw['Calendar Year'] == 2021].head(20).assign(**{'Calendar Year': 2022})
+    pd.concat([raw, new_year], ignore_index=True).to_csv(path, index=False)
+
+
+@pytest.fixture
+def databases(tmp_path):
+    """(incremental, full): one db loaded in full then incrementally with the edit, one loaded in full after it."""
+    name = os.path.basename(etl_pipeline.SOURCE_CSV)
+    incremental_dir, full_dir = tmp_path / 'incremental', tmp_path / 'full'
+    incremental_dir.mkdir()
+    full_dir.mkdir()
+    incremental_source, full_source = str(incremental_dir / name), str(full_dir / name)
+    pd.read_csv(etl_pipeline.SOURCE_CSV).to_csv(incremental_source, index=False)
+
+    incremental_db, full_db = str(incremental_dir / 'tjjd.db'), str(full_dir / 'tjjd.db')
+    etl_pipeline.etl_process(incremental_source, incremental_db)
+    yield incremental_source, incremental_db, full_source, full_db
+    database.close_pools()
+
+
+def read(db_path, sql):
+    conn = sqlite3.connect(db_path)
+    try:
+        return pd.read_sql(sql, conn)
+    finally:
+        conn.close()
+
+
+def load_edit(databases):
+    incremental_source, incremental_db, full_source, full_db = databases
+    edit_extract(incremental_source)
+    stats = etl_pipeline.etl_incremental(incremental_source, incremental_db)
+    pd.read_csv(incremental_source).to_csv(full_source, index=False)
+    etl_pipeline.etl_process(full_source, full_db)
+    return stats
+
+
+def test_incremental_load_matches_full_load(databases):
+    stats = load_edit(databases)
+    _, incremental_db, _, full_db = databases
+    assert stats['inserted'] == 20 and stats['updated'] == 2
+
+    pd.testing.assert_frame_equal(read(incremental_db, FACT_VIEW_SQL).drop(columns=['CountyID', 'YearID']),
+                                  read(full_db, FACT_VIEW_SQL).drop(columns=['CountyID', 'YearID']))
+    for table, keys in ROLLUP_KEYS.items():
+        # Surrogate keys follow load order, so compare on names
+        incremental, full = (read(db, f"SELECT * FROM {table}").sort_values(keys, ignore_index=True)
+                             for db in (incremental_db, full_db))
+        if table == 'Agg_County_Volatility':
+            incremental, full = (frame.drop(columns='CountyID').sort_values('County', ignore_index=True)
+                                 for frame in (incremental, full))
+        pd.testing.assert_frame_equal(incremental, full, check_exact=False, rtol=1e-9)
+
+
+@pytest.mark.parametrize('backend', ['sql', 'pandas'])
+def test_incremental_audit_matches_full_audit(databases, tmp_path, backend):
+    incremental_source, incremental_db, full_source, full_db = databases
+    run_checks.run_checks(incremental_db, str(tmp_path / 'before'), backend=backend)
+    load_edit(databases)
+
+    run_checks.run_checks(incremental_db, str(tmp_path / 'incremental'), backend=backend, incremental=True)
+    run_checks.run_checks(full_db, str(tmp_path / 'full'), backend=backend)
+
+    reports = [pd.read_csv(tmp_path / run / 'data_quality_report.csv') for run in ('before', 'incremental', 'full')]
+    pd.testing.assert_frame_equal(reports[1], reports[2])
+    # The edit must have changed what the audit finds, or the comparison proves nothing
+    assert not reports[0].equals(reports[1])
+
+    issues_sql = "SELECT Rule, Partition_Key, Record_Key, Failed_Rows FROM DQ_Issues ORDER BY Rule, Partition_Key, Record_Key"
+    pd.testing.assert_frame_equal(read(incremental_db, issues_sql), read(full_db, issues_sql))
@@ -0,0 +1,157 @@
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+import database
+import etl_pipeline
+import olap
+import rollups
+
+FACT_VIEW_SQL = """
+    SELECT t.YearID, t.Year, c.CountyID, c.County, c.Region, f.Juv_Pop,
+           f.Violent_Felony, f.Other_Felony, f.Misd, f.VOP, f.Status_Offense, f.CINS,
+           f.Total_Referrals, f.Unique_Youth, f.Referral_Rate
+    FROM Fact_Referrals f
+    JOIN Dim_County c ON f.CountyID = c.CountyID
+    JOIN Dim_Time t ON f.YearID = t.YearID
+"""
+
+# (measures, by, filters): every slice shape the dashboard pages ask for
+QUERIES = [
+    (['Total_Referrals', 'Referral_Rate', 'Violent_Felony', 'Unique_Youth', 'County_Count'], ['Year'], {}),
+    (['Total_Referrals'], ['Region'], {'Year': [2021]}),
+    (['Juv_Pop', 'CINS', 'Referral_Rate', 'County_Count'], ['Region'], {}),
+    (['Total_Referrals', 'Referral_Rate'], ['County'], {'Year': [2013]}),
+    (['Misd'], ['Year'], {'Region': ['Alamo']}),
+    (['Total_Referrals'], ['Year'], {'County': ['HARRIS']}),
+    (['Count'], ['Year', 'Offense'], {'Offense': ['Violent_Felony', 'Misd', 'CINS']}),
+    (['Total_Referrals', 'Referral_Rate', 'County_Count'], [], {}),
+]
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'olap.db')
+    etl_pipeline.etl_process(db_path=path)
+    yield path
+    database.close_pools()
+
+
+def read_sql(db_path, sql, params=()):
+    conn = database.connect(db_path, read_only=True)
+    try:
+        return pd.read_sql(sql, conn, params=params)
+    finally:
+        conn.close()
+
+
+def read_facts(db_path):
+    return read_sql(db_path, FACT_VIEW_SQL)
+
+
+def expected(facts, measures, by, filters):
+    """The slice computed straight from the fact view rows with pandas."""
+    for dim, values in filters.items():
+        if dim != 'Offense':
+            facts = facts[facts[dim].isin(values)]
+    if 'Offense' in filters:
+        long = facts.melt(id_vars=['Year'], value_vars=filters['Offense'], var_name='Offense', value_name='Count')
+        result = long.groupby(['Year', 'Offense'], sort=False)['Count'].sum().reset_index()
+        result['Offense'] = pd.Categorical(result['Offense'], olap.OFFENSE_COLUMNS, ordered=True)
+        return result.sort_values(['Year', 'Offense'], ignore_index=True)
+    grouped = facts.assign(_all=0).groupby(by or ['_all'])
+    result = pd.DataFrame({m: grouped[m].sum(min_count=1) for m in measures if m in olap.SUM_MEASURES})
+    result['County_Count'] = grouped.size()
+    result['Referral_Rate'] = grouped['Referral_Rate'].mean()
+    result = result.reset_index()[by + measures]
+    return result.sort_values(by, ignore_index=True) if by else result
+
+
+def loaders(db_path, facts):
+    """Each way the cube can be fed: rollups or grouped SQL, grouped SQL only, and Arrow."""
+    def sql_only(cuboid, filters):
+        return read_sql(db_path, *olap.partials_sql(cuboid, filters))
+
+    table = pa.Table.from_pandas(facts, preserve_index=False)
+    return {
+        'sqlite': olap.sqlite_loader(db_path),
+        'sql_only': sql_only,
+        'arrow': lambda cuboid, filters: olap.arrow_partials(table, cuboid, filters),
+    }
+
+
+def assert_slice_equal(actual, wanted):
+    pd.testing.assert_frame_equal(actual.reset_index(drop=True), wanted.reset_index(drop=True),
+                                  check_dtype=False, check_categorical=False, check_exact=False, rtol=1e-9)
+
+
+@pytest.mark.parametrize('loader', ['sqlite', 'sql_only', 'arrow'])
+def test_cube_answers_match_pandas(db_path, loader):
+    facts = read_facts(db_path)
+    load = loaders(db_path, facts)[loader]
+    shared = olap.Cube(load)
+    for measures, by, filters in QUERIES:
+        wanted = expected(facts, measures, by, filters)
+        # From a cold cube (a storage load) and from one holding earlier slices (roll-ups)
+        assert_slice_equal(olap.Cube(load).query(measures, by, filters), wanted)
+        assert_slice_equal(shared.query(measures, by, filters), wanted)
+    assert shared.stats['rollups'] > 0
+
+
+def test_filtered_load_reads_only_its_slice(db_path):
+    facts = read_facts(db_path)
+    cube = olap.Cube(olap.sqlite_loader(db_path))
+
+    top = cube.query(['Total_Referrals'], ['County'], {'Year': 2021}, order_by='Total_Referrals', limit=5)
+    assert cube.stats['loads'] == 1
+    resident = cube.resident()
+    assert resident[['Cuboid', 'Slice']].values.tolist() == [['Year x Region x County', 'Year=2021']]
+    assert resident['Cells'].iloc[0] == (facts['Year'] == 2021).sum()
+    assert top['Total_Referrals'].tolist() == \
+        facts[facts['Year'] == 2021].nlargest(5, 'Total_Referrals')['Total_Referrals'].tolist()
+
+    # Coarser slices of the same year roll up from it; another year is a new load
+    cube.query(['Total_Referrals'], ['Region'], {'Year': 2021})
+    assert (cube.stats['loads'], cube.stats['rollups']) == (1, 1)
+    cube.query(['Total_Referrals'], ['County'], {'Year': 2020})
+    assert cube.stats['loads'] == 2
+
+
+@pytest.mark.parametrize('missing', ['columns', 'table'])
+def test_rollups_without_partial_columns_fall_back_to_the_facts(db_path, missing):
+    facts = read_facts(db_path)
+    conn = database.connect(db_path)
+    if missing == 'table':
+        # The shipped database predates the rollups
+        conn.execute("DROP TABLE Agg_State_Year")
+    else:
+        for column in ('Rate_Sum', 'Rate_N'):
+            conn.execute(f"ALTER TABLE Agg_State_Year DROP COLUMN {column}")
+    conn.close()
+    measures, by, filters = QUERIES[0]
+    assert_slice_equal(olap.Cube(olap.sqlite_loader(db_path)).query(measures, by, filters),
+                       expected(facts, measures, by, filters))
+
+
+def test_rollup_tables_from_before_the_cube_are_migrated(db_path):
+    conn = database.connect(db_path)
+    with conn:
+        conn.execute("DROP TABLE Agg_State_Year")
+        conn.execute("DROP TABLE Agg_Region_Year")
+        conn.execute("""CREATE TABLE Agg_State_Year (
+            Year INTEGER PRIMARY KEY, County_Count INTEGER, Juv_Pop INTEGER,
+            Violent_Felony INTEGER, Other_Felony INTEGER, Misd INTEGER, VOP INTEGER,
+            Status_Offense INTEGER, CINS INTEGER, Total_Referrals INTEGER,
+            Avg_Referral_Rate REAL, Unique_Youth INTEGER)""")
+        conn.execute("""CREATE TABLE Agg_Region_Year (
+            Region TEXT, Year INTEGER, County_Count INTEGER, Juv_Pop INTEGER,
+            Total_Referrals INTEGER, Unique_Youth INTEGER, PRIMARY KEY (Region, Year))""")
+        conn.execute("CREATE TABLE Agg_Offense_Year (Year INTEGER, Offense_Type TEXT, Count INTEGER)")
+        # An incremental refresh of one year rebuilds every year once the columns are added
+        rollups.refresh_rollups(conn, years=[2021], county_ids=[])
+    tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    unfilled = conn.execute("SELECT COUNT(*) FROM Agg_Region_Year WHERE Rate_N IS NULL OR CINS IS NULL").fetchone()[0]
+    years = conn.execute("SELECT COUNT(DISTINCT Year) FROM Agg_Region_Year").fetchone()[0]
+    conn.close()
+    assert 'Agg_Offense_Year' not in tables
+    assert unfilled == 0 and years == read_facts(db_path)['Year'].nunique()
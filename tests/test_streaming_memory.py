@@ -0,0 +1,44 @@
+import json
+import os
+import subprocess
+import sys
+
+import bench_etl_memory
+
+# The streaming load (staging, swap and rollup refresh) and the forecast
+# refit that follows it must hold one chunk or one batch in memory, not the
+# extract: their peak RSS may wobble between runs but must not grow with
+# the input.
+SCALES = [25, 200]
+BUDGET_MB = 128
+TOLERANCE_MB = 30
+
+REFIT_CODE = """
+import json, resource, sys
+sys.path.insert(0, {scripts!r})
+import forecasting
+forecasting.refresh_models({db!r})
+print('RESULT ' + json.dumps(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+"""
+
+
+def test_stream_load_peak_rss_is_flat():
+    report = bench_etl_memory.bench(SCALES, BUDGET_MB)
+    peaks = report['Peak_RSS_MB']
+    assert peaks.max() - peaks.min() < TOLERANCE_MB, report.to_string(index=False)
+
+
+def test_forecast_refit_peak_rss_is_flat(tmp_path):
+    peaks = {}
+    for scale in SCALES:
+        source, db_path = str(tmp_path / f"x{scale}.csv"), str(tmp_path / f"x{scale}.db")
+        bench_etl_memory.write_scaled_extract(source, scale)
+        bench_etl_memory.run_load(source, db_path, BUDGET_MB)
+        code = REFIT_CODE.format(scripts=bench_etl_memory.SCRIPTS_DIR, db=db_path)
+        # Without the memory map: mapped file pages are capped by mmap_size and would count as RSS
+        env = dict(os.environ, TJJD_SQLITE_MMAP_MB='0')
+        out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                             env=env).stdout
+        peaks[scale] = json.loads(next(line for line in out.splitlines() if line.startswith('RESULT '))[7:])
+        os.remove(source)
+    assert max(peaks.values()) - min(peaks.values()) < TOLERANCE_MB, peaks